@@ -1,6 +1,8 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from flask import Blueprint, request, jsonify
-from core.common import client, CHARACTERS
+from core.common import client, async_client, CHARACTERS
+
+CHAT_MODEL = "gpt-4o-mini"
 
 chat_bp = Blueprint("chat", __name__)
 chat_sessions: Dict[str, List[Dict[str, str]]] = {}
@@ -8,15 +10,57 @@ chat_sessions: Dict[str, List[Dict[str, str]]] = {}
 @chat_bp.route("/api/chat", methods=["POST"])
 def chat_with_characters():
     data = request.get_json() or {}
+    error, session_date, messages = build_chat_messages(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        response = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            temperature=0.8,
+            max_tokens=400
+        )
+        reply = response.choices[0].message.content or ""
+        chat_sessions[session_date].append({"role": "assistant", "content": reply})
+    except Exception as e:
+        reply = f"[OpenAI Error] {str(e)}"
+
+    return jsonify({"reply": reply})
+
+
+async def chat_with_characters_async(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """/api/chat 의 asyncio 버전 (ASGI 모드, asgi.py) - (응답 본문, 상태 코드)"""
+    error, session_date, messages = build_chat_messages(data)
+    if error:
+        return {"error": error}, 400
+
+    try:
+        response = await async_client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            temperature=0.8,
+            max_tokens=400
+        )
+        reply = response.choices[0].message.content or ""
+        chat_sessions[session_date].append({"role": "assistant", "content": reply})
+    except Exception as e:
+        reply = f"[OpenAI Error] {str(e)}"
+
+    return {"reply": reply}, 200
+
+
+def build_chat_messages(data: Dict[str, Any]) -> Tuple[Optional[str], str, List[Dict[str, str]]]:
+    """요청 본문 검증 + 대화 기록에 사용자 메시지 추가 + 프롬프트 구성. (오류 메시지, 세션 키, messages)"""
     user_input = (data.get("message") or "").strip()
     active_emotions = data.get("characters") or []
     session_date = data.get("date", "default")
     diary_content = data.get("diary_content") or None
 
     if not user_input:
-        return jsonify({"error": "message 필드가 비어 있습니다."}), 400
+        return "message 필드가 비어 있습니다.", session_date, []
     if not active_emotions:
-        return jsonify({"error": "characters 필드가 필요합니다."}), 400
+        return "characters 필드가 필요합니다.", session_date, []
 
     if session_date not in chat_sessions:
         chat_sessions[session_date] = []
@@ -87,19 +131,4 @@ def chat_with_characters():
         "초록이(사랑): \"좋게 생각하자. 너가 좋아하는 것들을 떠올려 봐.\""
     )
     messages.append({"role": "user", "content": prompt})
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.8,
-            max_tokens=400
-        )
-        reply = response.choices[0].message.content or ""
-        chat_sessions[session_date].append({"role": "assistant", "content": reply})
-    except Exception as e:
-        reply = f"[OpenAI Error] {str(e)}"
-
-    return jsonify({"reply": reply})
-
-
+    return None, session_date, messages
@@ -4,20 +4,19 @@ from flask import Blueprint, request, jsonify, session
 from datetime import datetime, timedelta
 from db import (
     get_all_diaries,
+    get_diaries_page,
     get_diaries_by_date,
+    get_diaries_in_range,
     get_diary_by_id,
+    get_emotion_stats,
+    get_emotion_trend,
     save_diary,
-    delete_diary,
-    delete_plaza_conversation_by_date,
-    delete_diary_by_date,
-    get_tree_state,
-    save_tree_state,
-    get_well_state,
-    save_well_state,
+    delete_diary_cascade,
+    replace_diary_cascade,
     save_plaza_conversation,
     get_plaza_conversation_by_date,
     save_letter,
-    delete_letters_by_date_and_type,
+    DIARY_PAGE_DEFAULT_LIMIT,
 )
 from .middleware import get_current_user_id
 from services.letter_generator import generate_letter_with_gpt
@@ -115,7 +114,7 @@ def generate_letter_for_high_emotion(emotion_scores_raw, diary_content, diary_da
 _HAS_SIMILARITY = False
 try:
     # 절대 경로로 services 모듈 import
-    from services.diary_similarity import find_similar_diaries_separated, find_similar_diaries, find_similar_diaries_by_text, load_model
+    from services.diary_similarity import find_similar_diaries_separated, find_similar_diaries, find_similar_diaries_by_text, load_model, update_diary_embedding, forget_diary_embeddings
     _HAS_SIMILARITY = True
     print("[diary.py] 유사 일기 검색 모듈 로드 성공")
     # 서버 시작 시 모델 미리 로드 시도
@@ -135,15 +134,83 @@ except Exception as e:
 
 diary_bp = Blueprint("diary", __name__)
 
+# 유사 일기 검색에서 한 번에 돌려줄 수 있는 최대 개수
+SIMILAR_TOP_K_MAX = 20
+
+
+def _refresh_diary_embedding(diary_id, content, user_id):
+    """저장된 일기의 유사도 검색용 임베딩 갱신 (내용이 바뀐 경우에만 계산, 실패해도 저장은 성공 처리)"""
+    if _HAS_SIMILARITY:
+        update_diary_embedding(diary_id, content, user_id)
+
+
+def _forget_diary_embeddings(diary_ids, user_id):
+    """삭제된 일기를 유사도 검색 인덱스에서 제거"""
+    if _HAS_SIMILARITY:
+        forget_diary_embeddings(user_id, diary_ids)
+
 
 @diary_bp.route("/api/diaries", methods=["GET"])
 def list_diaries():
+    """
+    일기 목록
+
+    - ?date=YYYY-MM-DD : 해당 날짜 일기 (배열)
+    - ?limit=&cursor= : 최신순 커서 페이지네이션 ({"items": [...], "next": 커서})
+    - 파라미터 없음 또는 ?all=1 : 전체 일기 배열 (기존 동작, 하위 호환용)
+    - ?fields=summary : 본문(content) 없이 id, date, title, emotion_scores 만 반환
+    """
     user_id = get_current_user_id()
+    fields = _parse_fields()
     date = request.args.get("date")
     if date:
-        diaries = get_diaries_by_date(date, user_id)
-    else:
-        diaries = get_all_diaries(user_id)
+        diaries = get_diaries_by_date(date, user_id, fields=fields)
+        return jsonify(diaries)
+
+    wants_all = request.args.get("all", "").lower() in ("1", "true", "yes")
+    paginated = "limit" in request.args or "cursor" in request.args
+    if wants_all or not paginated:
+        diaries = get_all_diaries(user_id, fields=fields)
+        return jsonify(diaries)
+
+    if not user_id:
+        return jsonify({"error": "로그인이 필요합니다."}), 401
+    limit = request.args.get("limit", DIARY_PAGE_DEFAULT_LIMIT, type=int)
+    cursor = request.args.get("cursor") or None
+    try:
+        page = get_diaries_page(user_id, limit=limit, cursor=cursor, fields=fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+
+def _parse_fields(default: str = "full") -> str:
+    """?fields=summary|full (그 외 값은 기본값)"""
+    fields = (request.args.get("fields") or default).lower()
+    return fields if fields in ("summary", "full") else default
+
+
+@diary_bp.route("/api/diaries/range", methods=["GET"])
+def list_diaries_in_range():
+    """캘린더용 기간 조회: ?from=YYYY-MM-DD&to=YYYY-MM-DD (기본 요약 필드)"""
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({"error": "로그인이 필요합니다."}), 401
+
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
+    if not date_from or not date_to:
+        return jsonify({"error": "from, to 날짜가 필요합니다."}), 400
+    try:
+        start = datetime.strptime(date_from, "%Y-%m-%d").date()
+        end = datetime.strptime(date_to, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "날짜 형식은 YYYY-MM-DD 입니다."}), 400
+    if start > end:
+        return jsonify({"error": "from 이 to 보다 늦을 수 없습니다."}), 400
+
+    # date 컬럼은 TEXT 비교이므로 2024-1-5 같은 입력도 0 채운 형식으로 맞춰서 넘김
+    diaries = get_diaries_in_range(user_id, start.isoformat(), end.isoformat(), fields=_parse_fields("summary"))
     return jsonify(diaries)
 
 @diary_bp.route("/api/diaries/<diary_id>", methods=["GET"])
@@ -165,6 +232,8 @@ def create_diary_endpoint():
         return jsonify({"error": "요청 데이터가 없습니다."}), 400
     
     if save_diary(data, user_id):
+        _refresh_diary_embedding(data.get('id'), data.get('content'), user_id)
+        
         # 일기 저장 성공 후 감정 점수 확인하여 편지 생성
         emotion_scores_raw = data.get('emotion_scores', {})
         diary_content = data.get('content', '')
@@ -181,65 +250,18 @@ def delete_diary_endpoint(diary_id):
     if not user_id:
         return jsonify({"error": "로그인이 필요합니다."}), 401
     
-    # 삭제 전에 일기 정보 가져오기 (감정 점수 및 날짜 확인용)
-    diary = get_diary_by_id(diary_id)
-    if diary and diary.get("user_id") == user_id:
-        date = diary.get("date")
-        emotion_scores = diary.get("emotion_scores", {})
-        
-        # 일기 삭제
-        if delete_diary(diary_id, user_id):
-            # 일기 삭제 성공 시 관련 데이터 삭제 및 되돌리기
-            if date:
-                # 1. 해당 날짜의 광장 대화 삭제
-                delete_plaza_conversation_by_date(date, user_id)
-                
-                # 2. 해당 날짜에 생성된 편지 삭제 (일기로 인해 생성된 감정 편지)
-                delete_letters_by_date_and_type(date, "emotion_high", user_id)
-                
-                # 3. 행복 나무 상태 되돌리기 (긍정 감정 제거)
-                # 행복 나무를 자라게 하는 감정: 기쁨, 사랑
-                positive_score = (emotion_scores.get("기쁨", 0) or 0) + (emotion_scores.get("사랑", 0) or 0)
-                if positive_score > 0:
-                    state = get_tree_state(user_id)
-                    new_growth = max(0, state.get("growth", 0) - positive_score)
-                    stage_thresholds = [0, 40, 100, 220, 380, 600]
-                    new_stage = state.get("stage", 0)
-                    for i in range(len(stage_thresholds) - 1, -1, -1):
-                        if new_growth >= stage_thresholds[i]:
-                            new_stage = i
-                            break
-                    save_tree_state(
-                        {
-                            "growth": new_growth,
-                            "stage": new_stage,
-                            "lastFruitDate": state.get("lastFruitDate"),
-                        },
-                        user_id
-                    )
-                
-                # 4. 스트레스 우물 상태 되돌리기 (부정 감정 제거)
-                # 스트레스 우물을 차오르게 하는 감정: 슬픔, 분노, 두려움
-                negative_score = (
-                    (emotion_scores.get("분노", 0) or 0)
-                    + (emotion_scores.get("슬픔", 0) or 0)
-                    + (emotion_scores.get("두려움", 0) or 0)
-                )
-                if negative_score > 0:
-                    state = get_well_state(user_id)
-                    new_water_level = max(0, state.get("waterLevel", 0) - negative_score)
-                    is_overflowing = new_water_level >= 500
-                    save_well_state(
-                        {
-                            "waterLevel": new_water_level,
-                            "isOverflowing": is_overflowing,
-                            "lastOverflowDate": state.get("lastOverflowDate"),
-                        },
-                        user_id
-                    )
-            
-            return jsonify({"success": True, "message": "일기와 관련된 모든 데이터가 삭제되었습니다."})
+    # 일기 삭제 + 광장 대화/감정 편지 삭제 + 나무/우물 되돌리기를 한 트랜잭션으로 처리
+    try:
+        result = delete_diary_cascade(diary_id, user_id)
+    except Exception as e:
+        print(f"일기 삭제 오류: {e}")
+        import traceback
+        traceback.print_exc()
+        result = None
     
+    if result is not None:
+        _forget_diary_embeddings([diary_id], user_id)
+        return jsonify({"success": True, "message": "일기와 관련된 모든 데이터가 삭제되었습니다."})
     return jsonify({"error": "일기 삭제에 실패했습니다."}), 500
 
 
@@ -251,60 +273,30 @@ def replace_diary():
     
     data = request.get_json() or {}
     date = data.get("date")
-    old_emotion_scores = data.get("old_emotion_scores", {})
     new_diary_data = data.get("new_diary")
     if not date or not new_diary_data:
         return jsonify({"error": "날짜와 새 일기 데이터가 필요합니다."}), 400
 
-    old_positive_score = (old_emotion_scores.get("기쁨", 0) or 0) + (
-        old_emotion_scores.get("사랑", 0) or 0
-    )
-    # 스트레스 우물을 차오르게 하는 감정: 슬픔, 분노, 두려움
-    old_negative_score = (
-        (old_emotion_scores.get("분노", 0) or 0)
-        + (old_emotion_scores.get("슬픔", 0) or 0)
-        + (old_emotion_scores.get("두려움", 0) or 0)
-    )
-    if old_positive_score > 0:
-        state = get_tree_state(user_id)
-        new_growth = max(0, state.get("growth", 0) - old_positive_score)
-        stage_thresholds = [0, 40, 100, 220, 380, 600]
-        new_stage = state.get("stage", 0)
-        for i in range(len(stage_thresholds) - 1, -1, -1):
-            if new_growth >= stage_thresholds[i]:
-                new_stage = i
-                break
-        save_tree_state(
-            {
-                "growth": new_growth,
-                "stage": new_stage,
-                "lastFruitDate": state.get("lastFruitDate"),
-            },
-            user_id
-        )
-    if old_negative_score > 0:
-        state = get_well_state(user_id)
-        new_water_level = max(0, state.get("waterLevel", 0) - old_negative_score)
-        is_overflowing = new_water_level >= 500
-        save_well_state(
-            {
-                "waterLevel": new_water_level,
-                "isOverflowing": is_overflowing,
-                "lastOverflowDate": state.get("lastOverflowDate"),
-            },
-            user_id
-        )
-    delete_plaza_conversation_by_date(date, user_id)
-    delete_diary_by_date(date, user_id)
-    if save_diary(new_diary_data, user_id):
-        # 일기 수정 후에도 감정 점수 확인하여 편지 생성
-        emotion_scores_raw = new_diary_data.get('emotion_scores', {})
-        diary_content = new_diary_data.get('content', '')
-        diary_date = date
-        generate_letter_for_high_emotion(emotion_scores_raw, diary_content, diary_date, user_id)
-        
-        return jsonify({"success": True, "message": "일기가 덮어씌워졌습니다."})
-    return jsonify({"error": "일기 저장에 실패했습니다."}), 500
+    # 기존 일기 삭제 + 나무/우물 되돌리기 + 광장 대화 삭제 + 새 일기 저장을 한 트랜잭션으로 처리
+    # (되돌릴 감정 점수는 old_emotion_scores 대신 실제로 삭제된 일기에서 계산)
+    try:
+        replaced = replace_diary_cascade(date, new_diary_data, user_id)
+    except Exception as e:
+        print(f"일기 덮어쓰기 오류: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": "일기 저장에 실패했습니다."}), 500
+
+    _forget_diary_embeddings([diary_id for diary_id in replaced["deleted_ids"] if diary_id != replaced["id"]], user_id)
+    _refresh_diary_embedding(replaced["id"], new_diary_data.get('content'), user_id)
+
+    # 일기 수정 후에도 감정 점수 확인하여 편지 생성
+    emotion_scores_raw = new_diary_data.get('emotion_scores', {})
+    diary_content = new_diary_data.get('content', '')
+    diary_date = date
+    generate_letter_for_high_emotion(emotion_scores_raw, diary_content, diary_date, user_id)
+    
+    return jsonify({"success": True, "message": "일기가 덮어씌워졌습니다."})
 
 
 @diary_bp.route("/api/stats/office", methods=["GET"])
@@ -312,25 +304,26 @@ def get_office_stats():
     """
     마을사무소에서 보여줄 감정 통계.
 
-    - 전체 일기의 emotion_scores를 합산하여 Top 3 감정 및 비중 계산
-    - 행복 나무 / 스트레스 우물 상태를 기반으로 기여도 요약
+    - 로그인한 사용자 일기의 emotion_scores를 합산하여 Top 3 감정 및 비중 계산
+      (?scope=global 이면 전체 사용자 기준)
+    - 최근 7일 일기 기준 행복 나무 / 스트레스 우물 기여도 요약
+    - 집계는 모두 PostgreSQL 에서 쿼리 한 번으로 수행
     """
-    diaries = get_all_diaries()
+    scope = (request.args.get("scope") or "user").lower()
+    if scope == "global":
+        user_id = None
+    else:
+        user_id = get_current_user_id()
+        if not user_id:
+            return jsonify({"error": "로그인이 필요합니다."}), 401
 
-    # 감정 점수 합산 (일기 emotion_scores 기준, 전체 기준 Top3)
-    emotion_keys = ["기쁨", "사랑", "놀람", "두려움", "분노", "부끄러움", "슬픔"]
-    emotion_totals = {k: 0 for k in emotion_keys}
+    # 행복 나무 / 스트레스 우물 기여도 요약 (최근 7일 기준)
+    today = datetime.now().date()
+    week_start = today - timedelta(days=6)
 
-    for diary in diaries:
-        scores = diary.get("emotion_scores") or {}
-        for key in emotion_keys:
-            value = scores.get(key, 0) or 0
-            try:
-                emotion_totals[key] += float(value)
-            except (TypeError, ValueError):
-                # 숫자가 아닌 값이 들어와도 서비스가 죽지 않도록 방어
-                continue
+    stats = get_emotion_stats(user_id, week_start.isoformat(), today.isoformat())
 
+    emotion_totals = stats["totals"]
     total_emotion_score = sum(emotion_totals.values())
 
     sorted_emotions = sorted(
@@ -349,43 +342,8 @@ def get_office_stats():
             }
         )
 
-    # 행복 나무 / 스트레스 우물 기여도 요약 (최근 7일 기준)
-    today = datetime.now().date()
-    week_start = today - timedelta(days=6)
-
-    weekly_tree_value = 0.0  # 긍정 기여 (기쁨 + 사랑)
-    weekly_well_value = 0.0  # 부정 기여 (분노 + 슬픔 + 두려움)
-
-    for diary in diaries:
-        diary_date_str = diary.get("date")
-        if not diary_date_str:
-            continue
-        try:
-            diary_date = datetime.strptime(diary_date_str, "%Y-%m-%d").date()
-        except Exception:
-            # 날짜 포맷이 이상해도 서비스 중단 방지
-            continue
-
-        if not (week_start <= diary_date <= today):
-            continue
-
-        scores = diary.get("emotion_scores") or {}
-
-        def safe_float(v):
-            try:
-                return float(v or 0)
-            except (TypeError, ValueError):
-                return 0.0
-
-        # 행복 나무를 자라게 하는 감정: 사랑, 기쁨
-        pos = safe_float(scores.get("기쁨")) + safe_float(scores.get("사랑"))
-        # 스트레스 우물을 차오르게 하는 감정: 슬픔, 분노, 두려움
-        neg = safe_float(scores.get("분노")) + safe_float(scores.get("슬픔")) + safe_float(
-            scores.get("두려움")
-        )
-
-        weekly_tree_value += pos
-        weekly_well_value += neg
+    weekly_tree_value = stats["tree_value"]  # 긍정 기여 (기쁨 + 사랑)
+    weekly_well_value = stats["well_value"]  # 부정 기여 (분노 + 슬픔 + 두려움)
 
     total_tree_well = weekly_tree_value + weekly_well_value
     tree_ratio = (weekly_tree_value / total_tree_well) if total_tree_well > 0 else 0
@@ -410,6 +368,28 @@ def get_office_stats():
     )
 
 
+@diary_bp.route("/api/stats/trend", methods=["GET"])
+def get_emotion_trend_stats():
+    """기간별 감정 추이: ?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|week|month"""
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({"error": "로그인이 필요합니다."}), 401
+
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
+    granularity = (request.args.get("granularity") or "day").lower()
+    if not date_from or not date_to:
+        return jsonify({"error": "from, to 날짜가 필요합니다."}), 400
+    try:
+        # date 컬럼은 TEXT 비교이므로 0 채운 형식으로 맞춰서 넘김
+        start = datetime.strptime(date_from, "%Y-%m-%d").date()
+        end = datetime.strptime(date_to, "%Y-%m-%d").date()
+        trend = get_emotion_trend(user_id, start.isoformat(), end.isoformat(), granularity)
+    except ValueError as e:
+        return jsonify({"error": f"잘못된 요청입니다: {e}"}), 400
+    return jsonify({"granularity": granularity, "trend": trend})
+
+
 @diary_bp.route("/api/plaza/conversations/<date>", methods=["GET"])
 def get_plaza_conversation(date):
     """특정 날짜의 광장 대화 가져오기"""
@@ -506,14 +486,21 @@ def get_similar_diaries(diary_id):
     
     limit = request.args.get("limit", 5, type=int)
     min_similarity = request.args.get("min_similarity", 0.2, type=float)  # 기본값을 0.3에서 0.2로 낮춤
+    # 상위 몇 개를 돌려줄지 (text_similar_list / emotion_similar_list), hybrid_weight 가 있으면 가중 합산 순위도 반환
+    top_k = min(max(request.args.get("top_k", 1, type=int), 1), SIMILAR_TOP_K_MAX)
+    emotion_top_k = min(max(request.args.get("emotion_top_k", top_k, type=int), 1), SIMILAR_TOP_K_MAX)
+    hybrid_weight = request.args.get("hybrid_weight", type=float)
     
     try:
-        print(f"[유사일기검색] 일기 ID: {diary_id}, user_id: {user_id}, min_similarity: {min_similarity}")
+        print(f"[유사일기검색] 일기 ID: {diary_id}, user_id: {user_id}, min_similarity: {min_similarity}, top_k: {top_k}/{emotion_top_k}")
         result = find_similar_diaries_separated(
             target_diary_id=diary_id,
             user_id=user_id,
             min_text_similarity=min_similarity,
-            min_emotion_similarity=min_similarity
+            min_emotion_similarity=min_similarity,
+            text_top_k=top_k,
+            emotion_top_k=emotion_top_k,
+            hybrid_weight=hybrid_weight,
         )
         print(f"[유사일기검색] 결과: {type(result)}")
         
@@ -526,11 +513,16 @@ def get_similar_diaries(diary_id):
                 "hint": "sentence-transformers가 설치되지 않았을 수 있습니다. pip install sentence-transformers로 설치해주세요."
             }), 503
         
-        return jsonify({
+        response = {
             "success": True,
             "text_similar": result.get("text_similar"),
-            "emotion_similar": result.get("emotion_similar")
-        })
+            "emotion_similar": result.get("emotion_similar"),
+            "text_similar_list": result.get("text_similar_list", []),
+            "emotion_similar_list": result.get("emotion_similar_list", []),
+        }
+        if "hybrid_similar_list" in result:
+            response["hybrid_similar_list"] = result["hybrid_similar_list"]
+        return jsonify(response)
     except Exception as e:
         print(f"❌ [유사일기검색] 오류: {e}")
         import traceback
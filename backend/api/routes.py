@@ -1,13 +1,25 @@
 import os
 import sys
-from flask import Blueprint, jsonify, request
+import json
+import time
+from typing import Any, Dict, Iterator
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
 # Ensure backend root on sys.path for absolute-style imports (core/, services/)
 sys.path.append(os.path.dirname(__file__) + "/..")
 
-from core.common import ml_predict  # type: ignore
-from services.emotion_gpt import analyze_emotions_with_gpt
-from services.conversation import generate_dialogue_with_gpt
+from core.common import ml_predict, ml_batcher_stats  # type: ignore
+from services.emotion_gpt import analyze_emotions_with_gpt, get_gpt_cache_stats
+from services.emotion_cascade import CASCADE_ENABLED, analyze_emotions_cascade, get_cascade_stats
+from services.emotion_hybrid import analyze_emotions_hybrid, get_hybrid_stats
+from services.combined_analysis import COMBINED_ENABLED, analyze_with_dialogue_combined, get_combined_stats
+from services.conversation import generate_dialogue_with_gpt, stream_dialogue_with_gpt
+from services.dialogue_stream import DialogueStreamParser
+from services.model_client import get_client_stats as model_server_stats
+from services.model_registry import get_registry_stats as model_registry_stats
+from services.inference_cache import get_cache_stats as inference_cache_stats
+from core.llm_resilience import get_resilience_stats as openai_resilience_stats
+from db import get_pool_stats
 from .chat import chat_bp
 from .diary import diary_bp
 from .tree import tree_bp
@@ -30,19 +42,58 @@ def health():
         "environment": os.environ.get("ENVIRONMENT", "development")
     }), 200
 
+@api_bp.route("/health/db")
+def health_db():
+    """커넥션 풀 상태 (워커 프로세스 단위)"""
+    return jsonify({"pool": get_pool_stats()}), 200
+
+@api_bp.route("/health/ml")
+def health_ml():
+    """ML 모델 로드 상태 / 추론 캐시 / 마이크로 배칭 / 공유 모델 서버 연결 상태 (워커 프로세스 단위)"""
+    if ml_batcher_stats is None:
+        return jsonify({"error": "딥러닝 분석 모듈이 로드되지 않았습니다."}), 500
+    return jsonify({
+        "models": model_registry_stats(),
+        "cache": inference_cache_stats(),
+        "batcher": ml_batcher_stats(),
+        "model_server": model_server_stats(),
+    }), 200
+
+@api_bp.route("/health/gpt")
+def health_gpt():
+    """GPT 감정 분석 캐시 hit / miss + OpenAI 서킷 브레이커 / 재시도 예산 + cascade / hybrid / combined 통계 (워커 프로세스 단위)"""
+    return jsonify({
+        "cache": get_gpt_cache_stats(),
+        "openai": openai_resilience_stats(),
+        "cascade": get_cascade_stats(),
+        "hybrid": get_hybrid_stats(),
+        "combined": get_combined_stats(),
+    }), 200
+
+def _analyze_emotions(text: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """/analyze 감정 분석 - EMOTION_CASCADE_ENABLED 면 로컬 모델 먼저 (services/emotion_cascade.py)"""
+    if CASCADE_ENABLED:
+        return analyze_emotions_cascade(text, meta=meta)
+    return analyze_emotions_with_gpt(text, meta=meta)
+
 @api_bp.route("/analyze", methods=["POST"])
 def analyze():
     data = request.get_json() or {}
     diary_text = (data.get("content") or "").strip()
     if not diary_text:
         return jsonify({"error": "content 필드가 비어 있습니다."}), 400
-    emo_result = analyze_emotions_with_gpt(diary_text)
+    meta = {}
+    if COMBINED_ENABLED and not CASCADE_ENABLED:
+        # 감정 + 대화를 GPT 한 번 호출로 (services/combined_analysis.py)
+        emo_result, dialogue = analyze_with_dialogue_combined(diary_text, meta=meta)
+        return jsonify({"emotion_result": emo_result, "openai_dialogue": dialogue, "meta": meta})
+    emo_result = _analyze_emotions(diary_text, meta)
     dialogue = generate_dialogue_with_gpt(
         diary_text, 
         emo_result.get("top_emotions", []),
         emo_result.get("emotion_scores", {})
     )
-    return jsonify({"emotion_result": emo_result, "openai_dialogue": dialogue})
+    return jsonify({"emotion_result": emo_result, "openai_dialogue": dialogue, "meta": meta})
 
 @api_bp.route("/analyze2", methods=["POST"])
 def analyze_v2():
@@ -54,42 +105,135 @@ def analyze_v2():
     if mode == "ml":
         if ml_predict is None:
             return jsonify({"error": "딥러닝 분석 모듈이 로드되지 않았습니다."}), 500
-        ml_out = ml_predict(text)
-        model_type = ml_out.get("model_type", "unknown")
-        
-        # 모델 타입에 따라 source 구분
-        if model_type == "transformers":
-            source = "transformers-ml"
-        elif model_type == "heuristic":
-            source = "heuristic-ml"
-        else:
-            source = "unknown-ml"
-        
+        return jsonify(_ml_analysis(text))
+    elif mode == "combined":
+        meta = {"source": "gpt", "persisted": False}
+        emo_result, dialogue = analyze_with_dialogue_combined(text, meta=meta)
         return jsonify({
-            "mode": "ml",
-            "result": {"label": ml_out.get("label", "기쁨"), "scores": ml_out.get("scores", {})},
-            "meta": {
-                "source": source,
-                "model_type": model_type,
-                "persisted": False
-            }
+            "mode": mode,
+            "emotion_result": emo_result,
+            "openai_dialogue": dialogue,
+            "meta": meta
         })
-    elif mode == "gpt":
-        emo_result = analyze_emotions_with_gpt(text)
+    elif mode in ("gpt", "cascade", "hybrid"):
+        meta = {"source": "gpt", "persisted": False}
+        if mode == "hybrid":
+            emo_result = analyze_emotions_hybrid(text, meta=meta, deadline_ms=data.get("deadline_ms"))
+        else:
+            analyze = analyze_emotions_with_gpt if mode == "gpt" else analyze_emotions_cascade
+            emo_result = analyze(text, meta=meta)
         dialogue = generate_dialogue_with_gpt(
             text, 
             emo_result.get("top_emotions", []),
             emo_result.get("emotion_scores", {})
         )
         return jsonify({
-            "mode": "gpt",
+            "mode": mode,
             "emotion_result": emo_result,
             "openai_dialogue": dialogue,
-            "meta": {"source": "gpt", "persisted": False}
+            "meta": meta
         })
     else:
         return jsonify({"error": "invalid mode"}), 400
 
+def _ml_analysis(text: str) -> Dict[str, Any]:
+    """/analyze2 mode=ml 응답 본문"""
+    ml_out = ml_predict(text)
+    model_type = ml_out.get("model_type", "unknown")
+    
+    # 모델 타입에 따라 source 구분
+    if model_type == "transformers":
+        source = "transformers-ml"
+    elif model_type == "heuristic":
+        source = "heuristic-ml"
+    else:
+        source = "unknown-ml"
+    
+    return {
+        "mode": "ml",
+        "result": {"label": ml_out.get("label", "기쁨"), "scores": ml_out.get("scores", {})},
+        "meta": {
+            "source": source,
+            "model_type": model_type,
+            "persisted": False
+        }
+    }
+
+# =========================================
+# SSE 스트리밍 (/analyze/stream, /analyze2/stream)
+# =========================================
+# event: emotion  → 감정 분석 결과 (준비되는 즉시)
+# event: dialogue → 대사 한 줄씩 {"index", "line": {"캐릭터", "감정", "대사"}}
+# event: done     → 전체 대화 원문 (openai_dialogue, 기존 응답과 같은 문자열) + 단계별 시간(meta)
+# event: error    → 대화 생성 실패 (이후 done 으로 종료)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_response(events: Iterator[str]) -> Response:
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _gpt_analysis_events(text: str, meta: Dict[str, Any], emotion_payload: Dict[str, Any],
+                         analyze=analyze_emotions_with_gpt) -> Iterator[str]:
+    started = time.perf_counter()
+    emo_result = analyze(text, meta=meta)
+    meta["emotion_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    yield _sse("emotion", {**emotion_payload, "emotion_result": emo_result, "meta": meta})
+    
+    parser = DialogueStreamParser()
+    index = 0
+    try:
+        for delta in stream_dialogue_with_gpt(text, emo_result.get("top_emotions", []), emo_result.get("emotion_scores", {})):
+            for line in parser.feed(delta):
+                if index == 0:
+                    meta["first_line_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                yield _sse("dialogue", {"index": index, "line": line})
+                index += 1
+        dialogue = parser.text
+    except Exception as e:
+        dialogue = f"[OpenAI Error] {str(e)}"
+        yield _sse("error", {"error": str(e)})
+    
+    meta["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    yield _sse("done", {"openai_dialogue": dialogue, "lines": index, "meta": meta})
+
+@api_bp.route("/analyze/stream", methods=["POST"])
+def analyze_stream():
+    """/analyze 의 SSE 버전 - 감정 결과를 먼저 보내고 대사를 생성되는 대로 한 줄씩 보냄"""
+    data = request.get_json() or {}
+    diary_text = (data.get("content") or "").strip()
+    if not diary_text:
+        return jsonify({"error": "content 필드가 비어 있습니다."}), 400
+    analyze = analyze_emotions_cascade if CASCADE_ENABLED else analyze_emotions_with_gpt
+    return _sse_response(_gpt_analysis_events(diary_text, {}, {}, analyze))
+
+@api_bp.route("/analyze2/stream", methods=["POST"])
+def analyze_v2_stream():
+    """/analyze2 의 SSE 버전 (mode=ml 은 대화 생성이 없으므로 emotion 후 바로 done)"""
+    data = request.get_json() or {}
+    text = (data.get("content") or "").strip()
+    mode = data.get("mode", "gpt")
+    if not text:
+        return jsonify({"error": "content 필드가 비어 있습니다."}), 400
+    if mode == "ml":
+        if ml_predict is None:
+            return jsonify({"error": "딥러닝 분석 모듈이 로드되지 않았습니다."}), 500
+        def ml_events() -> Iterator[str]:
+            result = _ml_analysis(text)
+            yield _sse("emotion", result)
+            yield _sse("done", {"lines": 0, "meta": result["meta"]})
+        return _sse_response(ml_events())
+    elif mode in ("gpt", "cascade"):
+        meta = {"source": "gpt", "persisted": False, "stream": True}
+        analyze = analyze_emotions_with_gpt if mode == "gpt" else analyze_emotions_cascade
+        return _sse_response(_gpt_analysis_events(text, meta, {"mode": mode}, analyze))
+    else:
+        return jsonify({"error": "invalid mode"}), 400
+
 def register_all(app):
     app.register_blueprint(api_bp, url_prefix="")
     app.register_blueprint(chat_bp, url_prefix="")
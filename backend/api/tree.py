@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, session
-from db import get_tree_state, save_tree_state, get_happy_fruit_count, save_happy_fruit_count
+from db import get_tree_state, save_tree_state, add_tree_growth, get_happy_fruit_count, save_happy_fruit_count
 from .middleware import get_current_user_id
 
 tree_bp = Blueprint("tree", __name__)
@@ -37,22 +37,13 @@ def update_fruits():
 def subtract_tree_growth():
     user_id = get_current_user_id() or 0
     data = request.get_json() or {}
-    subtract_amount = data.get("amount", 0)
-    state = get_tree_state(user_id)
-    new_growth = max(0, state.get("growth", 0) - subtract_amount)
-    stage_thresholds = [0, 40, 100, 220, 380, 600]
-    new_stage = state.get("stage", 0)
-    for i in range(len(stage_thresholds) - 1, -1, -1):
-        if new_growth >= stage_thresholds[i]:
-            new_stage = i
-            break
-    new_state = {
-        "growth": new_growth,
-        "stage": new_stage,
-        "lastFruitDate": state.get("lastFruitDate")
-    }
-    if save_tree_state(new_state, user_id):
-        return jsonify({"success": True, "growth": new_growth, "stage": new_stage})
-    return jsonify({"error": "나무 상태 업데이트에 실패했습니다."}), 500
-
-
+    try:
+        subtract_amount = float(data.get("amount", 0) or 0)
+    except (TypeError, ValueError):
+        return jsonify({"error": "amount는 숫자여야 합니다."}), 400
+    try:
+        state = add_tree_growth(-subtract_amount, user_id)
+    except Exception as e:
+        print(f"나무 상태 업데이트 오류: {e}")
+        return jsonify({"error": "나무 상태 업데이트에 실패했습니다."}), 500
+    return jsonify({"success": True, "growth": state["growth"], "stage": state["stage"]})
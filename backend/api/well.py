@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, session
-from db import get_well_state, save_well_state
+from db import get_well_state, save_well_state, add_well_water
 from .middleware import get_current_user_id
 
 well_bp = Blueprint("well", __name__)
@@ -22,17 +22,13 @@ def update_well():
 def subtract_well_water():
     user_id = get_current_user_id() or 0
     data = request.get_json() or {}
-    subtract_amount = data.get("amount", 0)
-    state = get_well_state(user_id)
-    new_water_level = max(0, state.get("waterLevel", 0) - subtract_amount)
-    is_overflowing = new_water_level >= 500
-    new_state = {
-        "waterLevel": new_water_level,
-        "isOverflowing": is_overflowing,
-        "lastOverflowDate": state.get("lastOverflowDate")
-    }
-    if save_well_state(new_state, user_id):
-        return jsonify({"success": True, "waterLevel": new_water_level, "isOverflowing": is_overflowing})
-    return jsonify({"error": "우물 상태 업데이트에 실패했습니다."}), 500
-
-
+    try:
+        subtract_amount = float(data.get("amount", 0) or 0)
+    except (TypeError, ValueError):
+        return jsonify({"error": "amount는 숫자여야 합니다."}), 400
+    try:
+        state = add_well_water(-subtract_amount, user_id)
+    except Exception as e:
+        print(f"우물 상태 업데이트 오류: {e}")
+        return jsonify({"error": "우물 상태 업데이트에 실패했습니다."}), 500
+    return jsonify({"success": True, "waterLevel": state["waterLevel"], "isOverflowing": state["isOverflowing"]})
@@ -1,7 +1,8 @@
 import os, sys
 from flask import Flask
 from flask_cors import CORS  # type: ignore
-from db import init_db
+import click
+from db import init_db, close_db, rebuild_daily_emotion_rollup
 
 # Ensure backend path for api package imports
 sys.path.append(os.path.dirname(__file__))
@@ -79,8 +80,24 @@ except Exception as e:
     # 앱은 계속 실행되도록 하되, DB 연결이 안 될 수 있음을 로그에 기록
     print("⚠️  데이터베이스 연결 없이 앱을 시작합니다. 일부 기능이 작동하지 않을 수 있습니다.")
 
+# 요청 종료 시 커넥션 풀로 연결 반납
+app.teardown_appcontext(close_db)
+
 register_all(app)
 
+# 모델 미리 로드 (MODEL_WARMUP=true) - 추론 워밍업은 gunicorn 워커에서 (gunicorn.conf.py post_worker_init)
+from services import model_registry  # noqa: E402
+if model_registry.WARMUP_ENABLED:
+    model_registry.warmup(run_inference=False)
+
+
+@app.cli.command("rebuild-rollup")
+@click.option("--user-id", type=int, default=None, help="특정 사용자만 다시 계산 (기본: 전체)")
+def rebuild_rollup_command(user_id):
+    """일별 감정 집계(daily_emotion_rollup)를 diaries로부터 다시 계산"""
+    rows = rebuild_daily_emotion_rollup(user_id)
+    print(f"✅ daily_emotion_rollup 재계산 완료: {rows}개 (user_id={user_id if user_id is not None else '전체'})")
+
 if __name__ == "__main__":
     app.run(debug=True)
 
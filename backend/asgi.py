@@ -0,0 +1,234 @@
+"""
+ASGI 진입점 - GPT 호출을 asyncio 로 처리하는 서버 모드
+
+gunicorn sync/스레드 워커에서는 /analyze, /api/chat, 편지 생성 요청이 OpenAI 응답을 기다리는 동안
+워커 스레드를 계속 잡고 있어서, 느린 GPT 호출 몇 개가 나머지 CRUD 요청까지 막음
+
+- GPT 를 호출하는 엔드포인트는 이벤트 루프 위에서 AsyncOpenAI 로 await
+  → 응답을 기다리는 동안 스레드를 쓰지 않으므로 워커 하나가 수백 개의 GPT 호출을 동시에 기다릴 수 있음
+- 나머지 요청(일기/나무/우물/인증 등 DB 위주)은 그대로 Flask 앱이 처리 (a2wsgi 스레드 풀, ASGI_WSGI_THREADS)
+- DB 캐시 조회, ML 추론처럼 블로킹 작업은 asyncio.to_thread 로 실행
+
+실행:
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers 2
+    (pip install uvicorn a2wsgi)
+"""
+import os
+import json
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from a2wsgi import WSGIMiddleware  # type: ignore
+
+from app import app as flask_app, allowed_origins
+from core.common import async_client, ml_predict
+from services.emotion_gpt import analyze_emotions_with_gpt_async
+from services.emotion_cascade import CASCADE_ENABLED, analyze_emotions_cascade_async
+from services.emotion_hybrid import analyze_emotions_hybrid_async
+from services.combined_analysis import COMBINED_ENABLED, analyze_with_dialogue_combined_async
+from services.conversation import generate_dialogue_with_gpt_async
+from services.letter_generator import generate_letter_with_gpt_async
+from services import model_registry
+from api.chat import chat_with_characters_async
+from api.routes import _ml_analysis
+
+# Flask 앱을 실행하는 스레드 수 (워커 프로세스당) - GPT 요청은 여기서 스레드를 쓰지 않음
+WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", "8"))
+
+_wsgi = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Tuple[Dict[str, Any], int]]]
+
+
+# =========================================
+# GPT 엔드포인트 (api/routes.py, api/chat.py, api/letters.py 의 asyncio 버전)
+# =========================================
+
+async def _analyze(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    diary_text = (data.get("content") or "").strip()
+    if not diary_text:
+        return {"error": "content 필드가 비어 있습니다."}, 400
+    meta: Dict[str, Any] = {}
+    if COMBINED_ENABLED and not CASCADE_ENABLED:
+        emo_result, dialogue = await analyze_with_dialogue_combined_async(diary_text, meta=meta)
+        return {"emotion_result": emo_result, "openai_dialogue": dialogue, "meta": meta}, 200
+    analyze = analyze_emotions_cascade_async if CASCADE_ENABLED else analyze_emotions_with_gpt_async
+    emo_result = await analyze(diary_text, meta=meta)
+    dialogue = await generate_dialogue_with_gpt_async(
+        diary_text,
+        emo_result.get("top_emotions", []),
+        emo_result.get("emotion_scores", {})
+    )
+    return {"emotion_result": emo_result, "openai_dialogue": dialogue, "meta": meta}, 200
+
+
+async def _analyze_v2(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    text = (data.get("content") or "").strip()
+    mode = data.get("mode", "gpt")
+    if not text:
+        return {"error": "content 필드가 비어 있습니다."}, 400
+    if mode == "ml":
+        if ml_predict is None:
+            return {"error": "딥러닝 분석 모듈이 로드되지 않았습니다."}, 500
+        return await asyncio.to_thread(_ml_analysis, text), 200
+    elif mode == "combined":
+        meta = {"source": "gpt", "persisted": False}
+        emo_result, dialogue = await analyze_with_dialogue_combined_async(text, meta=meta)
+        return {"mode": mode, "emotion_result": emo_result, "openai_dialogue": dialogue, "meta": meta}, 200
+    elif mode in ("gpt", "cascade", "hybrid"):
+        meta: Dict[str, Any] = {"source": "gpt", "persisted": False}
+        if mode == "hybrid":
+            emo_result = await analyze_emotions_hybrid_async(text, meta=meta, deadline_ms=data.get("deadline_ms"))
+        else:
+            analyze = analyze_emotions_with_gpt_async if mode == "gpt" else analyze_emotions_cascade_async
+            emo_result = await analyze(text, meta=meta)
+        dialogue = await generate_dialogue_with_gpt_async(
+            text,
+            emo_result.get("top_emotions", []),
+            emo_result.get("emotion_scores", {})
+        )
+        return {
+            "mode": mode,
+            "emotion_result": emo_result,
+            "openai_dialogue": dialogue,
+            "meta": meta
+        }, 200
+    else:
+        return {"error": "invalid mode"}, 400
+
+
+async def _generate_letter(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    letter_type = data.get("type")
+    if not letter_type:
+        return {"error": "type 필드가 필요합니다."}, 400
+    letter = await generate_letter_with_gpt_async(
+        letter_type=letter_type,
+        emotion_scores=data.get("emotion_scores", {}),
+        fruit_count=data.get("fruit_count"),
+        diary_text=data.get("diary_text", "")
+    )
+    return letter, 200
+
+
+async def _health_async(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    return {"asgi": get_asgi_stats()}, 200
+
+
+_ROUTES: Dict[Tuple[str, str], Handler] = {
+    ("POST", "/analyze"): _analyze,
+    ("POST", "/analyze2"): _analyze_v2,
+    ("POST", "/api/chat"): chat_with_characters_async,
+    ("POST", "/api/letters/generate"): _generate_letter,
+    ("GET", "/health/async"): _health_async,
+}
+
+
+# =========================================
+# 통계 (워커 프로세스 단위) → GET /health/async
+# =========================================
+_stats: Dict[str, Any] = {"requests": 0, "errors": 0, "in_flight": 0, "peak_in_flight": 0, "routes": {}}
+
+
+def get_asgi_stats() -> Dict[str, Any]:
+    """asyncio 로 처리한 요청 수 / 동시에 대기 중인 요청 수 (최대값 포함)"""
+    stats = dict(_stats)
+    stats["routes"] = {path: dict(route) for path, route in _stats["routes"].items()}
+    stats["wsgi_threads"] = WSGI_THREADS
+    return stats
+
+
+# =========================================
+# ASGI 앱
+# =========================================
+
+def _cors_headers(scope: Dict[str, Any]) -> List[Tuple[bytes, bytes]]:
+    """app.py 의 flask-cors 설정과 같은 응답 헤더 (preflight OPTIONS 는 Flask 가 처리)"""
+    origin = None
+    for name, value in scope.get("headers", []):
+        if name == b"origin":
+            origin = value.decode("latin-1")
+            break
+    if not origin or origin not in allowed_origins:
+        return []
+    return [
+        (b"access-control-allow-origin", origin.encode("latin-1")),
+        (b"access-control-allow-credentials", b"true"),
+        (b"access-control-expose-headers", b"Set-Cookie"),
+        (b"vary", b"Origin"),
+    ]
+
+
+async def _read_json(scope: Dict[str, Any], receive) -> Optional[Dict[str, Any]]:
+    """요청 본문 JSON (Flask 의 request.get_json() or {} 와 같이 비어 있으면 {}), 잘못된 JSON 이면 None"""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    body = b"".join(chunks)
+    if not body:
+        return {}
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else {}
+
+
+async def _send_json(scope: Dict[str, Any], send, payload: Dict[str, Any], status: int) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("ascii")),
+    ] + _cors_headers(scope)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # uvicorn 워커에는 gunicorn post_worker_init 이 없으므로 여기서 워밍업
+            if model_registry.WARMUP_ENABLED:
+                await asyncio.to_thread(model_registry.warmup)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_client.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    handler = _ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+    if handler is None:
+        await _wsgi(scope, receive, send)
+        return
+
+    data = await _read_json(scope, receive)
+    if data is None:
+        await _send_json(scope, send, {"error": "요청 본문이 올바른 JSON 이 아닙니다."}, 400)
+        return
+
+    route = _stats["routes"].setdefault(scope["path"], {"requests": 0, "total_ms": 0.0})
+    _stats["requests"] += 1
+    _stats["in_flight"] += 1
+    _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+    started = time.perf_counter()
+    try:
+        payload, status = await handler(data)
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"❌ [ASGI] {scope['path']} 처리 실패: {e}")
+        payload, status = {"error": str(e)}, 500
+    finally:
+        _stats["in_flight"] -= 1
+        route["requests"] += 1
+        route["total_ms"] = round(route["total_ms"] + (time.perf_counter() - started) * 1000, 1)
+    await _send_json(scope, send, payload, status)
@@ -2,11 +2,16 @@ import os
 import json
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from core.llm_resilience import ResilientClient  # noqa: E402
+
+# 타임아웃 / 재시도 / 서킷 브레이커는 core/llm_resilience.py 가 처리 (SDK 자체 재시도는 끔)
+client = ResilientClient(OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0))
+# ASGI 모드(asgi.py)에서 이벤트 루프 위에서 await 하는 클라이언트 - 호출 대기 중에 워커 스레드를 잡지 않음
+async_client = ResilientClient(AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0))
 
 def load_characters() -> Dict[str, Any]:
     # common.py가 core/ 하위로 이동했으므로 상위 디렉터리에서 characters.json을 찾음
@@ -21,10 +26,11 @@ CHARACTERS = load_characters()
 
 EMOTION_KEYS = ["기쁨", "사랑", "놀람", "두려움", "분노", "부끄러움", "슬픔"]
 
-# ML 감정 분석 (있으면 사용)
+# ML 감정 분석 (있으면 사용) - 동시 요청은 마이크로 배칭으로 묶어서 추론
 try:
-    from services.emotion_ml import predict as ml_predict  # type: ignore
+    from services.ml_batcher import predict as ml_predict, get_batcher_stats as ml_batcher_stats  # type: ignore
 except Exception:
     ml_predict = None  # type: ignore
+    ml_batcher_stats = None  # type: ignore
 
 
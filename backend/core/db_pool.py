@@ -0,0 +1,249 @@
+"""
+PostgreSQL 커넥션 풀
+
+- 프로세스(gunicorn 워커)마다 독립적인 풀을 lazy 생성 (fork 이후 부모 연결 재사용 방지)
+- 대여 시 liveness 체크 (오래 쉬던 연결은 SELECT 1 로 확인 후 재사용)
+- min/max 크기 제한, 고갈 시 timeout 동안 대기
+- 대여/생성/폐기/고갈 통계 제공
+"""
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from psycopg2 import extensions as pg_ext
+
+
+class PoolExhaustedError(RuntimeError):
+    """풀의 모든 연결이 사용 중이고 대기 시간 안에 반납되지 않은 경우"""
+
+
+class ConnectionPool:
+    """스레드 안전한 psycopg2 커넥션 풀"""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        minconn: int = 1,
+        maxconn: int = 5,
+        timeout: float = 10.0,
+        ping_after: float = 30.0,
+        max_idle: float = 300.0,
+    ):
+        if maxconn < 1:
+            raise ValueError("maxconn은 1 이상이어야 합니다.")
+        self._connect = connect
+        self.minconn = max(0, min(minconn, maxconn))
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.max_idle = max_idle
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._pid = os.getpid()
+        self._idle: List[Tuple[Any, float]] = []
+        self._in_use = 0
+        self._prefilled = False
+        # fork 이후 부모 프로세스에서 넘어온 연결 (close 하면 부모 세션이 끊기므로 참조만 유지)
+        self._inherited: List[Any] = []
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, float]:
+        return {
+            "checkouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "pings": 0,
+            "ping_failures": 0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "wait_time_ms_total": 0.0,
+            "wait_time_ms_max": 0.0,
+        }
+
+    # -----------------------------------------
+    # 내부 헬퍼
+    # -----------------------------------------
+
+    def _check_fork(self):
+        """gunicorn 등에서 fork 된 경우 풀 상태를 새 프로세스 기준으로 초기화 (lock 보유 상태에서 호출)"""
+        pid = os.getpid()
+        if pid == self._pid:
+            return
+        self._inherited.extend(conn for conn, _ in self._idle)
+        self._idle = []
+        self._in_use = 0
+        self._prefilled = False
+        self._pid = pid
+        self._stats = self._empty_stats()
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn, idle_seconds: float) -> bool:
+        if conn.closed:
+            return False
+        if idle_seconds < self.ping_after:
+            return True
+        # ping 은 잠금 밖에서, 통계만 잠금 안에서 (다른 스레드의 카운터 갱신과 경합하지 않도록)
+        with self._cond:
+            self._stats["pings"] += 1
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["ping_failures"] += 1
+            return False
+
+    def _prefill(self):
+        """프로세스당 최초 1회 minconn 개수만큼 연결을 미리 생성"""
+        created = []
+        for _ in range(self.minconn):
+            try:
+                created.append(self._connect())
+            except Exception as e:
+                print(f"⚠️  커넥션 풀 예열 실패: {e}")
+                break
+        now = time.monotonic()
+        with self._cond:
+            for conn in created:
+                if len(self._idle) + self._in_use < self.maxconn:
+                    self._idle.append((conn, now))
+                    self._stats["created"] += 1
+                else:
+                    self._close_quietly(conn)
+            self._cond.notify_all()
+
+    # -----------------------------------------
+    # 공개 API
+    # -----------------------------------------
+
+    def getconn(self, timeout: Optional[float] = None):
+        """연결 대여. 풀이 가득 차 있으면 timeout 동안 반납을 기다림"""
+        timeout = self.timeout if timeout is None else timeout
+
+        with self._cond:
+            self._check_fork()
+            need_prefill = not self._prefilled
+            self._prefilled = True
+        if need_prefill and self.minconn > 0:
+            self._prefill()
+
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            conn = None
+            idle_seconds = 0.0
+            with self._cond:
+                self._check_fork()
+                while True:
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        idle_seconds = time.monotonic() - last_used
+                        self._in_use += 1
+                        break
+                    if self._in_use < self.maxconn:
+                        self._in_use += 1
+                        break
+                    if not waited:
+                        waited = True
+                        self._stats["exhausted"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolExhaustedError(
+                            f"커넥션 풀 고갈: {self.maxconn}개 모두 사용 중 ({timeout:.1f}초 대기)"
+                        )
+                    self._cond.wait(remaining)
+
+                if waited:
+                    wait_ms = (time.monotonic() - started) * 1000
+                    self._stats["wait_time_ms_total"] += wait_ms
+                    self._stats["wait_time_ms_max"] = max(self._stats["wait_time_ms_max"], wait_ms)
+
+            if conn is not None:
+                if self._is_alive(conn, idle_seconds):
+                    with self._cond:
+                        self._stats["checkouts"] += 1
+                    return conn
+                # 죽은 연결 → 폐기 후 새로 생성
+                self._close_quietly(conn)
+                with self._cond:
+                    self._stats["discarded"] += 1
+
+            try:
+                # 재시도 로직은 connect 함수(get_db의 연결 생성부)에 포함되어 있음
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["created"] += 1
+                self._stats["checkouts"] += 1
+            return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """연결 반납. 진행 중인 트랜잭션은 롤백하고, 깨진 연결은 폐기"""
+        with self._cond:
+            if os.getpid() != self._pid:
+                # 다른 프로세스에서 빌린 연결 → 이 풀과 무관
+                return
+
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != pg_ext.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        now = time.monotonic()
+        with self._cond:
+            self._in_use = max(0, self._in_use - 1)
+            if discard or conn.closed:
+                self._stats["discarded"] += 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, now))
+                # minconn 을 넘는 오래된 유휴 연결 정리
+                while len(self._idle) > self.minconn and now - self._idle[0][1] > self.max_idle:
+                    old, _ = self._idle.pop(0)
+                    self._stats["discarded"] += 1
+                    self._close_quietly(old)
+            self._cond.notify()
+
+    def closeall(self):
+        """유휴 연결을 모두 닫음 (대여 중인 연결은 반납 시 정리)"""
+        with self._cond:
+            self._check_fork()
+            idle, self._idle = self._idle, []
+            self._prefilled = False
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """풀 상태 및 고갈 통계"""
+        with self._cond:
+            self._check_fork()
+            result: Dict[str, Any] = dict(self._stats)
+            result.update({
+                "pid": self._pid,
+                "min": self.minconn,
+                "max": self.maxconn,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "size": len(self._idle) + self._in_use,
+            })
+        return result
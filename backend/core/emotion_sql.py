@@ -0,0 +1,49 @@
+"""
+감정 점수 관련 SQL 조각
+
+db.py 와 core/migrations.py 가 같은 식을 쓰도록 한 곳에 모아 둠
+(core.common 은 OpenAI 클라이언트를 만들기 때문에 DB 계층에서 import 하지 않음)
+"""
+from typing import List
+
+EMOTION_KEYS = ["기쁨", "사랑", "놀람", "두려움", "분노", "부끄러움", "슬픔"]
+TREE_EMOTIONS = ["기쁨", "사랑"]  # 행복 나무를 자라게 하는 감정
+WELL_EMOTIONS = ["분노", "슬픔", "두려움"]  # 스트레스 우물을 차오르게 하는 감정
+
+# daily_emotion_rollup 컬럼명 (EMOTION_KEYS 순서)
+ROLLUP_COLUMNS = ["joy", "love", "surprise", "fear", "anger", "shame", "sadness"]
+EMOTION_TO_COLUMN = dict(zip(EMOTION_KEYS, ROLLUP_COLUMNS))
+
+
+def emotion_score_sql(emotion: str, column: str = "emotion_scores") -> str:
+    """
+    diaries.emotion_scores JSONB 에서 감정 점수를 float 로 꺼내는 SQL 식
+    숫자(또는 숫자 문자열)가 아니면 0 - 잘못된 값이 있어도 쿼리가 실패하지 않도록
+    """
+    # 감정 키는 고정 상수라 SQL 에 직접 넣어도 안전
+    path = f"{column} -> 'emotion_scores' -> '{emotion}'"
+    return (
+        f"CASE WHEN jsonb_typeof({path}) = 'number' THEN ({path})::text::float "
+        f"WHEN jsonb_typeof({path}) = 'string' AND ({path} #>> '{{}}') ~ '^\\s*-?[0-9]+(\\.[0-9]+)?\\s*$' "
+        f"THEN ({path} #>> '{{}}')::float "
+        f"ELSE 0 END"
+    )
+
+
+def emotion_score_columns_sql(column: str = "emotion_scores") -> List[str]:
+    """EMOTION_KEYS 순서의 감정 점수 식 목록"""
+    return [emotion_score_sql(emo, column) for emo in EMOTION_KEYS]
+
+
+def rollup_rebuild_sql(where: str = "") -> str:
+    """diaries 를 (user_id, date) 로 집계해 daily_emotion_rollup 에 채우는 INSERT ... SELECT"""
+    sums = ",\n            ".join(f"SUM({expr})" for expr in emotion_score_columns_sql())
+    return f"""
+        INSERT INTO daily_emotion_rollup (user_id, date, {", ".join(ROLLUP_COLUMNS)}, diary_count, updated_at)
+        SELECT user_id, date,
+            {sums},
+            COUNT(*), NOW()
+        FROM diaries
+        {where}
+        GROUP BY user_id, date
+    """
@@ -0,0 +1,407 @@
+"""
+OpenAI 클라이언트 보호 계층 (호출별 타임아웃 / 지터 재시도 + 재시도 예산 / 서킷 브레이커)
+
+core.common 의 client / async_client 를 감싸서, 호출하는 쪽은 그대로 client.chat.completions.create(...) 사용
+
+- 타임아웃: 호출마다 OPENAI_TIMEOUT 초 (호출하는 쪽에서 timeout= 을 넘기면 그 값)
+- 재시도: 타임아웃 / 연결 오류 / 429 / 5xx 만 OPENAI_MAX_RETRIES 번까지, full jitter 지수 백오프
+  재시도는 프로세스 전체 예산 안에서만 - 최근 WINDOW 초 동안 재시도 수 ≤ max(MIN, 요청 수 × RATIO)
+  (OpenAI 장애 때 모든 요청이 재시도해서 부하와 대기 시간을 몇 배로 키우지 않도록)
+- 서킷 브레이커: 연속 실패 OPENAI_BREAKER_FAILURES 번이면 open → COOLDOWN 초 동안은 호출하지 않고
+  바로 CircuitOpenError (호출하는 쪽의 기본값/대체 경로로 즉시 넘어감), 이후 요청 하나만 보내 보고(half-open)
+  성공하면 closed, 실패하면 다시 open
+- stream=True 는 스트림을 끝까지 읽었을 때 성공, 읽다가 난 오류는 실패로 기록 (중간 오류는 재시도하지 않음)
+- 상태 / 통계 → GET /health/gpt 의 "openai"
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+import openai
+
+TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "30"))
+MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.environ.get("OPENAI_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.environ.get("OPENAI_RETRY_MAX_DELAY", "4"))
+RETRY_BUDGET_RATIO = float(os.environ.get("OPENAI_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN = int(os.environ.get("OPENAI_RETRY_BUDGET_MIN", "5"))
+RETRY_BUDGET_WINDOW = float(os.environ.get("OPENAI_RETRY_BUDGET_WINDOW", "60"))
+BREAKER_FAILURES = int(os.environ.get("OPENAI_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("OPENAI_BREAKER_COOLDOWN", "30"))
+
+# 일시적인 장애로 보고 재시도 + 브레이커 실패로 세는 오류 (APITimeoutError 는 APIConnectionError 의 하위 클래스)
+_TRANSIENT_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+class CircuitOpenError(Exception):
+    """브레이커가 열려 있어서 OpenAI 를 호출하지 않음"""
+
+
+# =========================================
+# 서킷 브레이커
+# =========================================
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._stats = {"opened": 0, "short_circuited": 0}
+
+    def allow(self) -> bool:
+        """이번 호출을 보내도 되는지 (open 이 끝났으면 half-open 으로 바꾸고 요청 하나만 허용)"""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    self._stats["short_circuited"] += 1
+                    return False
+                self._state = "half_open"
+            if self._probe_in_flight:
+                self._stats["short_circuited"] += 1
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def is_open(self) -> bool:
+        """지금 호출하면 바로 거절되는지 (상태는 바꾸지 않음)"""
+        with self._lock:
+            if self._state == "open":
+                return time.monotonic() - self._opened_at < self.cooldown
+            return self._state == "half_open" and self._probe_in_flight
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != "closed":
+                print("✅ [OpenAI] 서킷 브레이커 closed (호출 성공)")
+            self._state = "closed"
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if self._state == "half_open" or (
+                self._state == "closed" and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._stats["opened"] += 1
+                print(f"⚠️ [OpenAI] 서킷 브레이커 open (연속 실패 {self._consecutive_failures}번, {self.cooldown:.0f}초 동안 호출 중단)")
+
+    def release(self) -> None:
+        """장애와 관계없는 오류(잘못된 요청 등)로 끝난 호출 - half-open 시험 요청만 반납"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = None
+            if self._state == "open":
+                retry_in = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "cooldown_s": self.cooldown,
+                "retry_in_s": round(retry_in, 1) if retry_in is not None else None,
+                **self._stats,
+            }
+
+
+# =========================================
+# 재시도 예산
+# =========================================
+
+class RetryBudget:
+    """최근 window 초 동안의 재시도 수를 max(min_retries, 요청 수 × ratio) 이하로 제한"""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_retries: int = RETRY_BUDGET_MIN,
+                 window: float = RETRY_BUDGET_WINDOW):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    def _prune(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            if len(self._retries) >= max(self.min_retries, len(self._requests) * self.ratio):
+                return False
+            self._retries.append(now)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                "window_s": self.window,
+                "requests": len(self._requests),
+                "retries": len(self._retries),
+                "limit": max(self.min_retries, int(len(self._requests) * self.ratio)),
+            }
+
+
+breaker = CircuitBreaker()
+retry_budget = RetryBudget()
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "successes": 0, "failures": 0, "timeouts": 0, "retries": 0, "retries_denied": 0, "rejected": 0}
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _backoff(attempt: int) -> float:
+    """full jitter: 0 ~ min(MAX, BASE × 2^attempt) 사이 임의 시간"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def _before_attempt() -> None:
+    if not breaker.allow():
+        _count("rejected")
+        raise CircuitOpenError("OpenAI 서킷 브레이커가 열려 있어 호출하지 않았습니다.")
+
+
+def _after_failure(e: Exception, attempt: int) -> Optional[float]:
+    """실패한 시도 기록 → 다시 시도할 거면 대기 시간, 아니면 None"""
+    if not isinstance(e, _TRANSIENT_ERRORS):
+        breaker.release()
+        return None
+    breaker.record_failure()
+    _count("timeouts" if isinstance(e, openai.APITimeoutError) else "failures")
+    if attempt >= MAX_RETRIES:
+        return None
+    if breaker.is_open():
+        # 이번 실패로 브레이커가 열림 - 다음 시도는 어차피 CircuitOpenError 이므로
+        # 예산과 대기 시간을 쓰지 않고 원래 오류를 그대로 올림
+        return None
+    if not retry_budget.try_acquire():
+        _count("retries_denied")
+        return None
+    _count("retries")
+    return _backoff(attempt)
+
+
+def _after_success() -> None:
+    breaker.record_success()
+    _count("successes")
+
+
+def _after_stream_error(e: BaseException) -> None:
+    """
+    스트림을 읽다가 난 오류 기록 - 요청 자체가 잘못된 경우(4xx)와 KeyboardInterrupt 등은 시험 요청만 반납,
+    그 밖의 오류(연결 끊김, 타임아웃, 스트림 중 서버 오류 이벤트)는 실패
+    """
+    if not isinstance(e, Exception) or (
+        isinstance(e, openai.APIStatusError) and not isinstance(e, _TRANSIENT_ERRORS)
+    ):
+        breaker.release()
+        return
+    breaker.record_failure()
+    _count("timeouts" if isinstance(e, openai.APITimeoutError) else "failures")
+
+
+def _prepare(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    kwargs.setdefault("timeout", TIMEOUT)
+    _count("calls")
+    retry_budget.record_request()
+    return kwargs
+
+
+# =========================================
+# 클라이언트 래퍼 (client.chat.completions.create 경로 유지)
+# =========================================
+
+class _StreamGuard:
+    """
+    stream=True 응답 공통 - 연결이 열린 것만으로는 성공이 아니므로 결과를 스트림이 끝날 때 한 번만 기록
+    끝까지 읽으면 성공, 읽다가 오류가 나면 _after_stream_error, 다 읽기 전에 닫으면(클라이언트 연결 끊김) 반납
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._settled = False
+
+    def _settle(self, error: Optional[BaseException] = None, completed: bool = False) -> None:
+        if self._settled:
+            return
+        self._settled = True
+        if completed:
+            _after_success()
+        elif error is not None:
+            _after_stream_error(error)
+        else:
+            breaker.release()
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+class _GuardedStream(_StreamGuard):
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._stream)
+        except StopIteration:
+            self._settle(completed=True)
+            raise
+        except BaseException as e:
+            self._settle(e)
+            raise
+
+    def close(self) -> None:
+        self._settle()
+        self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class _AsyncGuardedStream(_StreamGuard):
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._settle(completed=True)
+            raise
+        except BaseException as e:
+            self._settle(e)
+            raise
+
+    async def close(self) -> None:
+        self._settle()
+        await self._stream.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+class _Completions:
+    def __init__(self, create: Callable[..., Any]):
+        self._create = create
+
+    def create(self, **kwargs):
+        kwargs = _prepare(kwargs)
+        attempt = 0
+        while True:
+            _before_attempt()
+            try:
+                result = self._create(**kwargs)
+            except Exception as e:
+                delay = _after_failure(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # KeyboardInterrupt 등 결과를 모르고 끝난 시도 - half-open 시험 요청만 반납
+                breaker.release()
+                raise
+            if kwargs.get("stream"):
+                return _GuardedStream(result)
+            _after_success()
+            return result
+
+
+class _AsyncCompletions:
+    def __init__(self, create: Callable[..., Any]):
+        self._create = create
+
+    async def create(self, **kwargs):
+        kwargs = _prepare(kwargs)
+        attempt = 0
+        while True:
+            _before_attempt()
+            try:
+                result = await self._create(**kwargs)
+            except Exception as e:
+                delay = _after_failure(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # 태스크 취소(asyncio.CancelledError) 등 결과를 모르고 끝난 시도 - half-open 시험 요청만 반납
+                # (반납하지 않으면 브레이커가 half-open 에서 다시는 시험 요청을 보내지 않음)
+                breaker.release()
+                raise
+            if kwargs.get("stream"):
+                return _AsyncGuardedStream(result)
+            _after_success()
+            return result
+
+
+class _Chat:
+    def __init__(self, completions):
+        self.completions = completions
+
+
+class ResilientClient:
+    """OpenAI / AsyncOpenAI 래퍼 - chat.completions.create 만 보호하고 나머지 속성은 원래 클라이언트로 전달"""
+
+    def __init__(self, raw_client):
+        self._raw = raw_client
+        create = raw_client.chat.completions.create
+        is_async = isinstance(raw_client, openai.AsyncOpenAI)
+        self.chat = _Chat(_AsyncCompletions(create) if is_async else _Completions(create))
+
+    def __getattr__(self, name: str):
+        return getattr(self._raw, name)
+
+
+def is_open() -> bool:
+    """브레이커가 열려 있어서 지금 GPT 를 호출해도 바로 거절되는지"""
+    return breaker.is_open()
+
+
+def get_resilience_stats() -> Dict[str, Any]:
+    """현재 워커 프로세스의 브레이커 상태 / 재시도 예산 / 호출 통계"""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    stats.update({
+        "breaker": breaker.stats(),
+        "retry_budget": retry_budget.stats(),
+        "timeout_s": TIMEOUT,
+        "max_retries": MAX_RETRIES,
+    })
+    return stats
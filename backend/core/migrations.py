@@ -0,0 +1,318 @@
+"""
+버전 기반 스키마 마이그레이션
+
+- 적용된 버전은 schema_migrations 테이블에 기록
+- 이미 최신이면 DDL 없이 바로 반환 (워커가 뜰 때마다 CREATE TABLE 을 날리지 않음)
+- 여러 gunicorn 워커가 동시에 시작해도 advisory lock 으로 한 프로세스만 적용
+- concurrent=True 인 마이그레이션은 autocommit 으로 실행 (CREATE INDEX CONCURRENTLY 는
+  트랜잭션 안에서 실행할 수 없음) → 운영 테이블에 쓰기 잠금을 걸지 않음
+
+새 마이그레이션은 MIGRATIONS 끝에 version 을 1 올려서 추가하세요. 이미 배포된 항목은 수정하지 마세요.
+"""
+import re
+import time
+from typing import Any, Dict, List
+
+from core.emotion_sql import ROLLUP_COLUMNS, rollup_rebuild_sql
+
+# pg_advisory_lock 키 (임의의 고정값)
+MIGRATION_LOCK_KEY = 724_310_001
+LOCK_WAIT_SECONDS = 300
+
+MIGRATIONS: List[Dict[str, Any]] = [
+    {
+        "version": 1,
+        "name": "기본 테이블",
+        "concurrent": False,
+        "statements": [
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                username VARCHAR(255) UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                name VARCHAR(255),
+                created_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS diaries (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                date TEXT NOT NULL,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                emotion_scores JSONB,
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS plaza_conversations (
+                date TEXT NOT NULL,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                conversation JSONB,
+                emotion_scores JSONB,
+                saved_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                PRIMARY KEY(date, user_id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS tree_state (
+                user_id INTEGER PRIMARY KEY REFERENCES users(id),
+                growth INTEGER NOT NULL DEFAULT 0,
+                stage INTEGER NOT NULL DEFAULT 0,
+                last_updated TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS well_state (
+                user_id INTEGER PRIMARY KEY REFERENCES users(id),
+                water_level INTEGER NOT NULL DEFAULT 0,
+                is_overflowing BOOLEAN NOT NULL DEFAULT FALSE,
+                last_overflow_date TEXT,
+                last_updated TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS letters (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                from_character TEXT NOT NULL,
+                type TEXT NOT NULL,
+                date TEXT NOT NULL,
+                is_read BOOLEAN NOT NULL DEFAULT FALSE,
+                created_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS happy_fruits (
+                user_id INTEGER PRIMARY KEY REFERENCES users(id),
+                count INTEGER NOT NULL DEFAULT 0,
+                last_updated TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+        ],
+    },
+    {
+        "version": 2,
+        "name": "조회 경로 인덱스",
+        "concurrent": True,
+        "statements": [
+            # diaries WHERE user_id = %s AND date = %s
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_diaries_user_date ON diaries (user_id, date)",
+            # diaries WHERE user_id = %s ORDER BY created_at DESC (id 는 동률 정렬용)
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_diaries_user_created ON diaries (user_id, created_at DESC, id DESC)",
+            # letters WHERE user_id = %s ORDER BY created_at DESC
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_letters_user_created ON letters (user_id, created_at DESC)",
+            # letters WHERE user_id = %s AND is_read = FALSE (안 읽은 편지만 담는 부분 인덱스)
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_letters_user_unread ON letters (user_id) WHERE is_read = FALSE",
+            # letters WHERE date = %s AND type = %s AND user_id = %s
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_letters_user_date_type ON letters (user_id, date, type)",
+            # plaza_conversations WHERE user_id = %s ORDER BY saved_at DESC
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_plaza_user_saved ON plaza_conversations (user_id, saved_at DESC)",
+        ],
+    },
+    {
+        "version": 3,
+        "name": "일별 감정 집계 테이블",
+        "concurrent": False,
+        "statements": [
+            f"""
+            CREATE TABLE IF NOT EXISTS daily_emotion_rollup (
+                user_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                {", ".join(f"{col} DOUBLE PRECISION NOT NULL DEFAULT 0" for col in ROLLUP_COLUMNS)},
+                diary_count INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (user_id, date)
+            )
+            """,
+            # 기존 일기로 초기 백필 (테이블이 새로 생길 때 한 번)
+            "DELETE FROM daily_emotion_rollup",
+            rollup_rebuild_sql(),
+        ],
+    },
+    {
+        "version": 4,
+        "name": "일기 임베딩 저장소",
+        "concurrent": False,
+        "statements": [
+            # vector 는 float32 little-endian 바이트 (dim * 4 bytes)
+            # 일기가 삭제되면 임베딩도 함께 삭제 (ON DELETE CASCADE)
+            """
+            CREATE TABLE IF NOT EXISTS diary_embeddings (
+                diary_id TEXT PRIMARY KEY REFERENCES diaries(id) ON DELETE CASCADE,
+                user_id INTEGER NOT NULL,
+                model_name TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                vector BYTEA NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_diary_embeddings_user_model ON diary_embeddings (user_id, model_name, model_version)",
+        ],
+    },
+    {
+        "version": 5,
+        "name": "GPT 감정 분석 캐시",
+        "concurrent": False,
+        "statements": [
+            # 같은 일기 내용 + 모델 + 프롬프트 버전이면 GPT 를 다시 호출하지 않고 저장된 결과 사용
+            # 사용자와 무관하게 내용으로만 키를 만듦 (결과는 일기 내용만으로 결정됨)
+            """
+            CREATE TABLE IF NOT EXISTS gpt_analysis_cache (
+                content_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                result JSONB NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                expires_at TIMESTAMP NOT NULL,
+                last_hit_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (content_hash, model, prompt_version)
+            )
+            """,
+            # 크기 초과 시 오래 안 쓴 항목부터 삭제, 만료 항목 삭제
+            "CREATE INDEX IF NOT EXISTS idx_gpt_analysis_cache_last_hit ON gpt_analysis_cache (last_hit_at)",
+            "CREATE INDEX IF NOT EXISTS idx_gpt_analysis_cache_expires ON gpt_analysis_cache (expires_at)",
+        ],
+    },
+]
+
+LATEST_VERSION = MIGRATIONS[-1]["version"]
+
+
+def _current_version(cur) -> int:
+    cur.execute("SELECT to_regclass('public.schema_migrations') AS tbl")
+    row = cur.fetchone()
+    if not row or not _first(row):
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations")
+    return int(_first(cur.fetchone()) or 0)
+
+
+def _first(row):
+    """RealDictCursor / 일반 cursor 모두 지원"""
+    if isinstance(row, dict):
+        return next(iter(row.values()), None)
+    return row[0]
+
+
+def _acquire_lock(cur) -> bool:
+    """다른 워커가 마이그레이션 중이면 끝날 때까지 대기 (autocommit 상태에서 호출)"""
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while True:
+        cur.execute("SELECT pg_try_advisory_lock(%s) AS locked", (MIGRATION_LOCK_KEY,))
+        if _first(cur.fetchone()):
+            return True
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.5)
+
+
+_CREATE_INDEX_RE = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?\"?(\w+)\"?",
+    re.IGNORECASE,
+)
+
+
+def _index_names(statements: List[str]) -> List[str]:
+    """마이그레이션 문장들이 만드는 인덱스 이름"""
+    return [m.group(1) for stmt in statements for m in [_CREATE_INDEX_RE.search(stmt)] if m]
+
+
+def _drop_invalid_indexes(cur, names: List[str]):
+    """
+    실패한 CREATE INDEX CONCURRENTLY 가 남긴 INVALID 인덱스 정리 (IF NOT EXISTS 가 건너뛰지 않도록)
+    이 마이그레이션이 만드는 인덱스만 - 다른 세션이 지금 CONCURRENTLY 로 만들고 있거나
+    마이그레이션과 관계없는 인덱스는 건드리지 않음
+    """
+    if not names:
+        return
+    cur.execute("""
+        SELECT c.relname AS name
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND NOT i.indisvalid AND c.relname = ANY(%s)
+    """, (names,))
+    for row in cur.fetchall():
+        name = _first(row)
+        print(f"⚠️  INVALID 인덱스 제거 후 재생성: {name}")
+        cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def _apply(conn, migration: Dict[str, Any]):
+    version = migration["version"]
+    print(f"🔧 마이그레이션 v{version} 적용 중: {migration['name']}")
+    started = time.monotonic()
+
+    if migration.get("concurrent"):
+        conn.autocommit = True
+        cur = conn.cursor()
+        _drop_invalid_indexes(cur, _index_names(migration["statements"]))
+        for stmt in migration["statements"]:
+            cur.execute(stmt)
+        cur.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s) ON CONFLICT (version) DO NOTHING",
+            (version, migration["name"]),
+        )
+    else:
+        conn.autocommit = False
+        cur = conn.cursor()
+        try:
+            for stmt in migration["statements"]:
+                cur.execute(stmt)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s) ON CONFLICT (version) DO NOTHING",
+                (version, migration["name"]),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.autocommit = True
+
+    print(f"✅ 마이그레이션 v{version} 완료 ({time.monotonic() - started:.2f}s)")
+
+
+def run_migrations(conn) -> int:
+    """
+    미적용 마이그레이션을 순서대로 적용하고 최종 스키마 버전을 반환
+
+    conn 은 풀에 속하지 않은 전용 연결이어야 함 (autocommit 을 바꾸므로)
+    """
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    current = _current_version(cur)
+    if current >= LATEST_VERSION:
+        print(f"✅ 스키마 최신 상태 (v{current}) - 마이그레이션 생략")
+        return current
+
+    if not _acquire_lock(cur):
+        raise RuntimeError("마이그레이션 잠금을 얻지 못했습니다. 다른 프로세스가 오래 실행 중입니다.")
+
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """)
+        # 잠금을 기다리는 동안 다른 워커가 적용했을 수 있으므로 다시 확인
+        current = _current_version(cur)
+        for migration in MIGRATIONS:
+            if migration["version"] > current:
+                _apply(conn, migration)
+                current = migration["version"]
+        return current
+    finally:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
@@ -5,12 +5,26 @@ SQLite 제거 / 간결 / 안정성 개선
 """
 import os
 import json
+import base64
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import errors as pg_errors
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 import hashlib
+from contextlib import contextmanager
+from flask import g, has_app_context
+from core.db_pool import ConnectionPool
+from core.migrations import run_migrations
+from core.emotion_sql import (
+    EMOTION_KEYS,
+    TREE_EMOTIONS,
+    WELL_EMOTIONS,
+    ROLLUP_COLUMNS,
+    EMOTION_TO_COLUMN,
+    emotion_score_columns_sql,
+    rollup_rebuild_sql,
+)
 
 # =========================================
 # PostgreSQL 연결 준비
@@ -60,11 +74,8 @@ if DATABASE_URL:
     host_info = DATABASE_URL.split('@')[1].split('/')[0] if '@' in DATABASE_URL else '***'
     print(f"🔍 DATABASE_URL 설정됨: {url_preview}@{host_info.split(':')[0] if ':' in host_info else '***'}:{host_info.split(':')[1] if ':' in host_info else '***'}")
 
-def get_db():
-    """PostgreSQL 연결 객체 반환 (재시도 로직 포함)"""
-    if not DATABASE_URL:
-        raise RuntimeError("DATABASE_URL이 설정되지 않았습니다.")
-    
+def _open_connection():
+    """PostgreSQL 새 연결 생성 (재시도 로직 포함) - 커넥션 풀이 연결을 만들 때 사용"""
     import time
     max_retries = 3
     retry_delay = 1  # 초
@@ -109,6 +120,98 @@ def get_db():
                 print(f"🔍 연결 시도한 DATABASE_URL: {DATABASE_URL.split('@')[0] if '@' in DATABASE_URL else 'N/A'}@***")
                 raise
 
+# =========================================
+# 커넥션 풀
+# =========================================
+# gunicorn 워커마다 풀이 따로 생기므로 전체 연결 수는 (워커 수 × DB_POOL_MAX)
+# Postgres max_connections 보다 작게 유지할 것
+
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "5"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))  # 풀 고갈 시 대기 시간 (초)
+DB_POOL_PING_AFTER = float(os.environ.get("DB_POOL_PING_AFTER", "30"))  # 이 시간 이상 쉰 연결은 대여 전 SELECT 1
+
+_pool = ConnectionPool(
+    _open_connection,
+    minconn=DB_POOL_MIN,
+    maxconn=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    ping_after=DB_POOL_PING_AFTER,
+)
+
+
+class PooledConnection:
+    """풀에서 대여한 연결. close()는 실제로 닫지 않고 풀에 반납"""
+
+    def __init__(self, pool: ConnectionPool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self):
+        return 1 if self._released else self._conn.closed
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool.putconn(self._conn)
+
+
+def get_db():
+    """PostgreSQL 연결 객체 반환 (커넥션 풀에서 대여, close() 시 반납)"""
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL이 설정되지 않았습니다.")
+
+    conn = PooledConnection(_pool, _pool.getconn())
+
+    # 요청 처리 중에 대여한 연결은 요청 종료 시 반드시 반납되도록 기록
+    # (예외 경로에서 close()가 호출되지 않아도 누수되지 않음)
+    if has_app_context():
+        if "_db_conns" not in g:
+            g._db_conns = []
+        g._db_conns.append(conn)
+    return conn
+
+
+@contextmanager
+def transaction():
+    """
+    연결 하나, 트랜잭션 하나로 여러 쿼리를 실행하는 단위 작업 (unit of work)
+    
+        with transaction() as cur:
+            cur.execute(...)
+            cur.execute(...)
+    
+    블록이 정상 종료되면 commit, 예외가 나면 rollback 후 예외를 다시 던짐
+    """
+    conn = get_db()
+    try:
+        cur = conn.cursor()
+        yield cur
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def close_db(exc=None):
+    """요청 종료 시 반납되지 않은 연결을 풀에 돌려줌 (app.teardown_appcontext 에 등록)"""
+    conns = g.pop("_db_conns", None) if has_app_context() else None
+    for conn in conns or []:
+        conn.close()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """현재 프로세스의 커넥션 풀 상태 및 고갈 통계"""
+    return _pool.stats()
+
 # =========================================
 # 날짜 파싱 안전 함수
 # =========================================
@@ -129,117 +232,26 @@ def parse_datetime(value):
 # =========================================
 
 def init_db():
+    """스키마 마이그레이션 적용 (이미 최신이면 DDL 없이 종료)"""
     if not DATABASE_URL:
         raise RuntimeError("❌ DATABASE_URL 환경변수가 없습니다. Railway/Render에서 반드시 설정하세요.")
     
     try:
-        conn = get_db()
+        # 마이그레이션은 autocommit 을 바꾸므로 풀이 아닌 전용 연결 사용
+        conn = _open_connection()
     except Exception as e:
         print(f"❌ PostgreSQL 연결 실패: {e}")
         raise RuntimeError(f"PostgreSQL 연결에 실패했습니다: {e}")
     
-    cur = conn.cursor()
-    
     print("🔌 PostgreSQL 데이터베이스 연결 중...")
     
-    # Users
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            username VARCHAR(255) UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            name VARCHAR(255),
-            created_at TIMESTAMP NOT NULL DEFAULT NOW()
-        )
-    """)
-    
-    # Diaries
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS diaries (
-            id TEXT PRIMARY KEY,
-            user_id INTEGER NOT NULL REFERENCES users(id),
-            date TEXT NOT NULL,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            emotion_scores JSONB,
-            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
-            updated_at TIMESTAMP
-        )
-    """)
-    
-    # Plaza
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS plaza_conversations (
-            date TEXT NOT NULL,
-            user_id INTEGER NOT NULL REFERENCES users(id),
-            conversation JSONB,
-            emotion_scores JSONB,
-            saved_at TIMESTAMP NOT NULL DEFAULT NOW(),
-            PRIMARY KEY(date, user_id)
-        )
-    """)
-    
-    # Tree
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS tree_state (
-            user_id INTEGER PRIMARY KEY REFERENCES users(id),
-            growth INTEGER NOT NULL DEFAULT 0,
-            stage INTEGER NOT NULL DEFAULT 0,
-            last_updated TIMESTAMP NOT NULL DEFAULT NOW()
-        )
-    """)
-    
-    # Well
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS well_state (
-            user_id INTEGER PRIMARY KEY REFERENCES users(id),
-            water_level INTEGER NOT NULL DEFAULT 0,
-            is_overflowing BOOLEAN NOT NULL DEFAULT FALSE,
-            last_overflow_date TEXT,
-            last_updated TIMESTAMP NOT NULL DEFAULT NOW()
-        )
-    """)
-    
-    # Letters
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS letters (
-            id TEXT PRIMARY KEY,
-            user_id INTEGER NOT NULL REFERENCES users(id),
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            from_character TEXT NOT NULL,
-            type TEXT NOT NULL,
-            date TEXT NOT NULL,
-            is_read BOOLEAN NOT NULL DEFAULT FALSE,
-            created_at TIMESTAMP NOT NULL DEFAULT NOW()
-        )
-    """)
-    
-    # Happy fruits
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS happy_fruits (
-            user_id INTEGER PRIMARY KEY REFERENCES users(id),
-            count INTEGER NOT NULL DEFAULT 0,
-            last_updated TIMESTAMP NOT NULL DEFAULT NOW()
-        )
-    """)
-    
-    conn.commit()
-    
-    # 테이블 생성 확인
-    cur.execute("""
-        SELECT table_name 
-        FROM information_schema.tables 
-        WHERE table_schema = 'public'
-        ORDER BY table_name
-    """)
-    tables = [row['table_name'] for row in cur.fetchall()]
-    print(f"📊 생성된 테이블: {', '.join(tables) if tables else '(없음)'}")
-    
-    conn.close()
+    try:
+        version = run_migrations(conn)
+    finally:
+        conn.close()
     
     db_info = DATABASE_URL.split('@')[1] if '@' in DATABASE_URL else '(PostgreSQL)'
-    print(f"✅ PostgreSQL 데이터베이스 초기화 완료: {db_info}")
+    print(f"✅ PostgreSQL 데이터베이스 초기화 완료 (스키마 v{version}): {db_info}")
 
 # =========================================
 # User Functions
@@ -302,107 +314,268 @@ def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
 # Diary Functions
 # =========================================
 
+# 일기 행의 감정 점수 식 (SELECT / RETURNING 에서 e0 ~ e6 으로 사용)
+_SCORE_COLUMNS = ", ".join(f"{expr} AS e{i}" for i, expr in enumerate(emotion_score_columns_sql()))
+
+def _rollup_apply_row(cur, row, sign: int):
+    """
+    daily_emotion_rollup 에 일기 한 건의 점수를 더하거나(sign=1) 뺌(sign=-1)
+    row 는 user_id, date, e0 ~ e6 을 가진 diaries 행 (_SCORE_COLUMNS 로 조회)
+    호출한 쪽의 트랜잭션 안에서 실행됨
+    """
+    deltas = [sign * float(row[f"e{i}"] or 0) for i in range(len(ROLLUP_COLUMNS))]
+    columns = ", ".join(ROLLUP_COLUMNS)
+    placeholders = ", ".join(["%s"] * len(ROLLUP_COLUMNS))
+    updates = ",\n            ".join(f"{col} = daily_emotion_rollup.{col} + EXCLUDED.{col}" for col in ROLLUP_COLUMNS)
+    cur.execute(f"""
+        INSERT INTO daily_emotion_rollup (user_id, date, {columns}, diary_count, updated_at)
+        VALUES (%s, %s, {placeholders}, %s, NOW())
+        ON CONFLICT (user_id, date) DO UPDATE SET
+            {updates},
+            diary_count = daily_emotion_rollup.diary_count + EXCLUDED.diary_count,
+            updated_at = NOW()
+        RETURNING diary_count
+    """, (row["user_id"], row["date"], *deltas, sign))
+    remaining = cur.fetchone()["diary_count"]
+    if remaining <= 0:
+        cur.execute("DELETE FROM daily_emotion_rollup WHERE user_id = %s AND date = %s",
+                    (row["user_id"], row["date"]))
+
+def rebuild_daily_emotion_rollup(user_id: Optional[int] = None) -> int:
+    """
+    daily_emotion_rollup 을 diaries 로부터 다시 계산 (백필 / 드리프트 복구용)
+    user_id 가 None 이면 전체 사용자. 다시 만든 (user_id, date) 행 수를 반환
+    
+    다시 계산하는 동안 일기 저장/삭제가 집계에 더하고 빼는 값(_rollup_apply_row)이 섞이지 않도록
+    테이블을 SHARE ROW EXCLUSIVE 로 잠금 (그동안 집계 갱신은 커밋까지 대기, 조회는 그대로 가능)
+    """
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute("LOCK TABLE daily_emotion_rollup IN SHARE ROW EXCLUSIVE MODE")
+    if user_id is not None:
+        cur.execute("DELETE FROM daily_emotion_rollup WHERE user_id = %s", (user_id,))
+        cur.execute(rollup_rebuild_sql("WHERE user_id = %s"), (user_id,))
+    else:
+        cur.execute("DELETE FROM daily_emotion_rollup")
+        cur.execute(rollup_rebuild_sql())
+    rebuilt = cur.rowcount
+    conn.commit()
+    conn.close()
+    return rebuilt
+
+def _upsert_diary(cur, diary: Dict[str, Any], user_id: int) -> str:
+    """일기 INSERT/UPDATE + 일별 감정 집계 갱신 (호출한 쪽 트랜잭션 안에서 실행). 일기 id 반환"""
+    diary_id = diary.get("id") or str(int(datetime.now().timestamp() * 1000))
+    emotion_data = {
+        "emotion_scores": diary.get("emotion_scores", {}),
+        "emotion_polarity": diary.get("emotion_polarity", {})
+    }
+    
+    # 같은 id 를 동시에 저장할 때 집계가 두 번 반영되지 않도록 id 단위 잠금
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (diary_id,))
+    cur.execute(f"SELECT user_id, date, {_SCORE_COLUMNS} FROM diaries WHERE id = %s FOR UPDATE", (diary_id,))
+    old_row = cur.fetchone()
+    
+    cur.execute(f"""
+        INSERT INTO diaries (id, user_id, date, title, content, emotion_scores, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, NOW(), NOW())
+        ON CONFLICT (id) DO UPDATE SET
+            user_id = EXCLUDED.user_id,
+            date = EXCLUDED.date,
+            title = EXCLUDED.title,
+            content = EXCLUDED.content,
+            emotion_scores = EXCLUDED.emotion_scores,
+            updated_at = NOW()
+        RETURNING user_id, date, {_SCORE_COLUMNS}
+    """, (
+        diary_id,
+        user_id,
+        diary.get("date"),
+        diary.get("title"),
+        diary.get("content"),
+        json.dumps(emotion_data, ensure_ascii=False),
+    ))
+    new_row = cur.fetchone()
+    
+    # 일별 감정 집계 갱신 (같은 트랜잭션)
+    if old_row:
+        _rollup_apply_row(cur, old_row, sign=-1)
+    _rollup_apply_row(cur, new_row, sign=1)
+    return diary_id
+
 def save_diary(diary: Dict[str, Any], user_id: int = None) -> bool:
     """일기 저장 (user_id가 None이면 0 사용)"""
     if user_id is None:
         user_id = 0
     
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        
-        diary_id = diary.get("id") or str(int(datetime.now().timestamp() * 1000))
-        emotion_data = {
-            "emotion_scores": diary.get("emotion_scores", {}),
-            "emotion_polarity": diary.get("emotion_polarity", {})
-        }
-        
-        cur.execute("""
-            INSERT INTO diaries (id, user_id, date, title, content, emotion_scores, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, %s, %s, NOW(), NOW())
-            ON CONFLICT (id) DO UPDATE SET
-                user_id = EXCLUDED.user_id,
-                date = EXCLUDED.date,
-                title = EXCLUDED.title,
-                content = EXCLUDED.content,
-                emotion_scores = EXCLUDED.emotion_scores,
-                updated_at = NOW()
-        """, (
-            diary_id,
-            user_id,
-            diary.get("date"),
-            diary.get("title"),
-            diary.get("content"),
-            json.dumps(emotion_data, ensure_ascii=False),
-        ))
-        
-        conn.commit()
-        conn.close()
+        with transaction() as cur:
+            _upsert_diary(cur, diary, user_id)
         return True
     except Exception as e:
         print("일기 저장 실패:", e)
         return False
 
-def get_all_diaries(user_id: int = None) -> List[Dict[str, Any]]:
-    """모든 일기 가져오기 (user_id가 있으면 필터링)"""
+def _row_to_diary(row) -> Dict[str, Any]:
+    """diaries 행 → API 응답용 dict (emotion_scores JSONB 펼치기 + createdAt)"""
+    diary = dict(row)
+    data = diary.get("emotion_scores") or {}
+    diary["emotion_scores"] = data.get("emotion_scores", {})
+    diary["emotion_polarity"] = data.get("emotion_polarity", {})
+    
+    # ISO 형식으로 변환
+    if 'created_at' in diary and diary['created_at']:
+        if isinstance(diary['created_at'], datetime):
+            diary['createdAt'] = diary['created_at'].isoformat()
+        else:
+            diary['createdAt'] = str(diary['created_at'])
+    
+    return diary
+
+# fields="summary" 일 때 읽는 컬럼 (content 와 polarity 를 빼고 감정 점수만 JSONB 에서 꺼냄)
+DIARY_SUMMARY_COLUMNS = "id, user_id, date, title, emotion_scores -> 'emotion_scores' AS emotion_scores, created_at"
+# fields="search" (유사 일기 ANN 검색): 요약 컬럼 + 본문이 비어 있는지만 (본문은 상위 결과만 get_diary_contents 로)
+DIARY_SEARCH_COLUMNS = DIARY_SUMMARY_COLUMNS + ", COALESCE(content, '') ~ '[^[:space:]]' AS has_content"
+
+def _diary_columns(fields: str) -> str:
+    if fields == "summary":
+        return DIARY_SUMMARY_COLUMNS
+    if fields == "search":
+        return DIARY_SEARCH_COLUMNS
+    return "*"
+
+def _row_to_diary_summary(row) -> Dict[str, Any]:
+    """요약 컬럼 행 → dict (id, date, title, emotion_scores, createdAt)"""
+    diary = dict(row)
+    diary["emotion_scores"] = diary.get("emotion_scores") or {}
+    if diary.get('created_at'):
+        if isinstance(diary['created_at'], datetime):
+            diary['createdAt'] = diary['created_at'].isoformat()
+        else:
+            diary['createdAt'] = str(diary['created_at'])
+    return diary
+
+def _rows_to_diaries(rows, fields: str) -> List[Dict[str, Any]]:
+    convert = _row_to_diary_summary if fields in ("summary", "search") else _row_to_diary
+    return [convert(row) for row in rows]
+
+def get_all_diaries(user_id: int = None, fields: str = "full") -> List[Dict[str, Any]]:
+    """모든 일기 가져오기 (user_id가 있으면 필터링, fields="summary"면 본문 제외)"""
     conn = get_db()
     cur = conn.cursor()
+    columns = _diary_columns(fields)
     
     if user_id is not None:
-        cur.execute("SELECT * FROM diaries WHERE user_id = %s ORDER BY created_at DESC", (user_id,))
+        cur.execute(f"SELECT {columns} FROM diaries WHERE user_id = %s ORDER BY created_at DESC", (user_id,))
     else:
-        cur.execute("SELECT * FROM diaries ORDER BY created_at DESC")
+        cur.execute(f"SELECT {columns} FROM diaries ORDER BY created_at DESC")
     
     rows = cur.fetchall()
     conn.close()
     
-    result = []
-    for row in rows:
-        diary = dict(row)
-        data = diary.get("emotion_scores") or {}
-        diary["emotion_scores"] = data.get("emotion_scores", {})
-        diary["emotion_polarity"] = data.get("emotion_polarity", {})
-        
-        # ISO 형식으로 변환
-        if 'created_at' in diary and diary['created_at']:
-            if isinstance(diary['created_at'], datetime):
-                diary['createdAt'] = diary['created_at'].isoformat()
-            else:
-                diary['createdAt'] = str(diary['created_at'])
-        
-        result.append(diary)
-    return result
+    return _rows_to_diaries(rows, fields)
+
+# 커서 기반 페이지네이션 (created_at DESC, id DESC)
+DIARY_PAGE_DEFAULT_LIMIT = 20
+DIARY_PAGE_MAX_LIMIT = 100
 
-def get_diaries_by_date(date: str, user_id: int = None) -> List[Dict[str, Any]]:
-    """특정 날짜의 일기 가져오기 (user_id가 있으면 필터링)"""
+def encode_diary_cursor(created_at: datetime, diary_id: str) -> str:
+    """(created_at, id) → 불투명 커서 문자열"""
+    raw = json.dumps([created_at.isoformat(), diary_id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_diary_cursor(cursor: str):
+    """커서 문자열 → (created_at, id). 형식이 잘못되면 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, diary_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        return datetime.fromisoformat(created_at), str(diary_id)
+    except Exception:
+        raise ValueError("잘못된 cursor 입니다.")
+
+def get_diaries_page(
+    user_id: int,
+    limit: int = DIARY_PAGE_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    fields: str = "full"
+) -> Dict[str, Any]:
+    """
+    사용자의 일기를 최신순으로 limit 개씩 가져오기 (keyset pagination)
+    
+    Returns:
+        {"items": [...], "next": 다음 페이지 커서 (마지막 페이지면 None)}
+    """
+    limit = max(1, min(int(limit), DIARY_PAGE_MAX_LIMIT))
+    columns = _diary_columns(fields)
+    
     conn = get_db()
     cur = conn.cursor()
     
+    # limit + 1 개를 읽어서 다음 페이지 존재 여부 판단
+    if cursor:
+        created_at, diary_id = decode_diary_cursor(cursor)
+        cur.execute(f"""
+            SELECT {columns} FROM diaries
+            WHERE user_id = %s AND (created_at, id) < (%s, %s)
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        """, (user_id, created_at, diary_id, limit + 1))
+    else:
+        cur.execute(f"""
+            SELECT {columns} FROM diaries
+            WHERE user_id = %s
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        """, (user_id, limit + 1))
+    
+    rows = cur.fetchall()
+    conn.close()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_diary_cursor(last["created_at"], last["id"])
+    
+    return {"items": _rows_to_diaries(rows, fields), "next": next_cursor}
+
+def get_diaries_by_date(date: str, user_id: int = None, fields: str = "full") -> List[Dict[str, Any]]:
+    """특정 날짜의 일기 가져오기 (user_id가 있으면 필터링, fields="summary"면 본문 제외)"""
+    conn = get_db()
+    cur = conn.cursor()
+    columns = _diary_columns(fields)
+    
     if user_id is not None:
-        cur.execute("SELECT * FROM diaries WHERE user_id = %s AND date = %s ORDER BY created_at DESC",
+        cur.execute(f"SELECT {columns} FROM diaries WHERE user_id = %s AND date = %s ORDER BY created_at DESC",
                     (user_id, date))
     else:
-        cur.execute("SELECT * FROM diaries WHERE date = %s ORDER BY created_at DESC", (date,))
+        cur.execute(f"SELECT {columns} FROM diaries WHERE date = %s ORDER BY created_at DESC", (date,))
     
     rows = cur.fetchall()
     conn.close()
     
-    result = []
-    for row in rows:
-        diary = dict(row)
-        data = diary.get("emotion_scores") or {}
-        diary["emotion_scores"] = data.get("emotion_scores", {})
-        diary["emotion_polarity"] = data.get("emotion_polarity", {})
-        
-        # ISO 형식으로 변환
-        if 'created_at' in diary and diary['created_at']:
-            if isinstance(diary['created_at'], datetime):
-                diary['createdAt'] = diary['created_at'].isoformat()
-            else:
-                diary['createdAt'] = str(diary['created_at'])
-        
-        result.append(diary)
-    return result
+    return _rows_to_diaries(rows, fields)
+
+def get_diaries_in_range(user_id: int, date_from: str, date_to: str, fields: str = "summary") -> List[Dict[str, Any]]:
+    """
+    기간 내 일기 가져오기 (캘린더용, 날짜 오름차순)
+    
+    date 는 'YYYY-MM-DD' 문자열이라 문자열 범위 비교 = 날짜 범위 비교이고,
+    idx_diaries_user_date (user_id, date) 범위 스캔으로 처리됨
+    """
+    conn = get_db()
+    cur = conn.cursor()
+    columns = _diary_columns(fields)
+    cur.execute(f"""
+        SELECT {columns} FROM diaries
+        WHERE user_id = %s AND date BETWEEN %s AND %s
+        ORDER BY date, created_at
+    """, (user_id, date_from, date_to))
+    rows = cur.fetchall()
+    conn.close()
+    
+    return _rows_to_diaries(rows, fields)
 
 def get_diary_by_id(diary_id: str) -> Optional[Dict[str, Any]]:
     conn = get_db()
@@ -414,29 +587,35 @@ def get_diary_by_id(diary_id: str) -> Optional[Dict[str, Any]]:
     if not row:
         return None
     
-    diary = dict(row)
-    data = diary.get("emotion_scores") or {}
-    diary["emotion_scores"] = data.get("emotion_scores", {})
-    diary["emotion_polarity"] = data.get("emotion_polarity", {})
-    
-    # ISO 형식으로 변환
-    if 'created_at' in diary and diary['created_at']:
-        if isinstance(diary['created_at'], datetime):
-            diary['createdAt'] = diary['created_at'].isoformat()
-        else:
-            diary['createdAt'] = str(diary['created_at'])
-    
-    return diary
+    return _row_to_diary(row)
+
+def get_diary_contents(user_id: int, diary_ids: List[str]) -> Dict[str, str]:
+    """지정한 일기들의 본문만 조회 {diary_id: content} (유사 일기 검색의 상위 결과용)"""
+    if not diary_ids:
+        return {}
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT id, content FROM diaries WHERE user_id = %s AND id = ANY(%s)",
+        (user_id, list(diary_ids)),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return {row["id"]: row["content"] or "" for row in rows}
 
 def delete_diary(diary_id: str, user_id: int = None) -> bool:
     """일기 삭제 (user_id가 있으면 해당 사용자의 일기만 삭제)"""
     conn = get_db()
     cur = conn.cursor()
     if user_id is not None:
-        cur.execute("DELETE FROM diaries WHERE id = %s AND user_id = %s", (diary_id, user_id))
+        cur.execute(f"DELETE FROM diaries WHERE id = %s AND user_id = %s RETURNING user_id, date, {_SCORE_COLUMNS}",
+                    (diary_id, user_id))
     else:
-        cur.execute("DELETE FROM diaries WHERE id = %s", (diary_id,))
-    deleted_count = cur.rowcount
+        cur.execute(f"DELETE FROM diaries WHERE id = %s RETURNING user_id, date, {_SCORE_COLUMNS}", (diary_id,))
+    deleted_rows = cur.fetchall()
+    deleted_count = len(deleted_rows)
+    for row in deleted_rows:
+        _rollup_apply_row(cur, row, sign=-1)
     conn.commit()
     conn.close()
     return deleted_count > 0
@@ -446,14 +625,113 @@ def delete_diary_by_date(date: str, user_id: int = None) -> bool:
     conn = get_db()
     cur = conn.cursor()
     if user_id is not None:
-        cur.execute("DELETE FROM diaries WHERE date = %s AND user_id = %s", (date, user_id))
+        cur.execute(f"DELETE FROM diaries WHERE date = %s AND user_id = %s RETURNING user_id, date, {_SCORE_COLUMNS}",
+                    (date, user_id))
     else:
-        cur.execute("DELETE FROM diaries WHERE date = %s", (date,))
-    deleted_count = cur.rowcount
+        cur.execute(f"DELETE FROM diaries WHERE date = %s RETURNING user_id, date, {_SCORE_COLUMNS}", (date,))
+    deleted_rows = cur.fetchall()
+    deleted_count = len(deleted_rows)
+    for row in deleted_rows:
+        _rollup_apply_row(cur, row, sign=-1)
     conn.commit()
     conn.close()
     return deleted_count > 0
 
+# =========================================
+# Stats Functions
+# =========================================
+
+# 날짜 문자열이 실제로 있는 YYYY-MM-DD 날짜인지 (date 컬럼은 TEXT)
+# 2024-02-30 처럼 형식만 맞는 값도 걸러야 주 단위 추이의 date::date 변환이 실패하지 않음
+# (CASE 로 형식 검사를 먼저 해서 그 달 1일로의 변환은 항상 성공)
+_VALID_DATE_SQL = (
+    "CASE WHEN date ~ '^[1-9][0-9]{3}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$' "
+    "THEN substr(date, 9, 2) <= to_char((substr(date, 1, 7) || '-01')::date + interval '1 month - 1 day', 'DD') "
+    "ELSE false END"
+)
+
+def get_emotion_stats(user_id: Optional[int], week_start: str, week_end: str) -> Dict[str, Any]:
+    """
+    감정 점수 합계 + 기간 내 나무/우물 기여도를 daily_emotion_rollup 에서 쿼리 한 번으로 집계
+    (일기 수가 아니라 일기를 쓴 날 수에 비례)
+    
+    Args:
+        user_id: 사용자 ID (None 이면 전체 사용자)
+        week_start, week_end: 기여도 집계 기간 ('YYYY-MM-DD', 양끝 포함)
+    
+    Returns:
+        {"totals": {감정: 합계}, "tree_value": float, "well_value": float}
+    """
+    total_columns = ", ".join(
+        f"COALESCE(SUM({col}), 0) AS total_{i}" for i, col in enumerate(ROLLUP_COLUMNS)
+    )
+    tree_expr = " + ".join(EMOTION_TO_COLUMN[emo] for emo in TREE_EMOTIONS)
+    well_expr = " + ".join(EMOTION_TO_COLUMN[emo] for emo in WELL_EMOTIONS)
+    in_week = f"{_VALID_DATE_SQL} AND date BETWEEN %s AND %s"
+    
+    where = "WHERE user_id = %s" if user_id is not None else ""
+    params: List[Any] = [week_start, week_end, week_start, week_end]
+    if user_id is not None:
+        params.append(user_id)
+    
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT {total_columns},
+            COALESCE(SUM({tree_expr}) FILTER (WHERE {in_week}), 0) AS tree_value,
+            COALESCE(SUM({well_expr}) FILTER (WHERE {in_week}), 0) AS well_value
+        FROM daily_emotion_rollup
+        {where}
+    """, params)
+    row = cur.fetchone()
+    conn.close()
+    
+    return {
+        "totals": {emo: float(row[f"total_{i}"]) for i, emo in enumerate(EMOTION_KEYS)},
+        "tree_value": float(row["tree_value"]),
+        "well_value": float(row["well_value"]),
+    }
+
+_TREND_BUCKETS = {
+    "day": "date",
+    "week": "to_char(date_trunc('week', date::date), 'YYYY-MM-DD')",
+    "month": "substr(date, 1, 7)",
+}
+
+def get_emotion_trend(user_id: int, date_from: str, date_to: str, granularity: str = "day") -> List[Dict[str, Any]]:
+    """
+    기간 내 감정 추이 (일/주/월 단위 합계) - daily_emotion_rollup 에서 읽음
+    
+    Returns:
+        [{"period": "2024-01-01", "scores": {감정: 합계}, "diaryCount": n}, ...]
+        week 의 period 는 그 주 월요일, month 는 'YYYY-MM'
+    """
+    bucket = _TREND_BUCKETS.get(granularity)
+    if bucket is None:
+        raise ValueError(f"지원하지 않는 granularity: {granularity}")
+    sums = ", ".join(f"SUM({col}) AS {col}" for col in ROLLUP_COLUMNS)
+    
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT {bucket} AS period, {sums}, SUM(diary_count) AS diary_count
+        FROM daily_emotion_rollup
+        WHERE user_id = %s AND {_VALID_DATE_SQL} AND date BETWEEN %s AND %s
+        GROUP BY period
+        ORDER BY period
+    """, (user_id, date_from, date_to))
+    rows = cur.fetchall()
+    conn.close()
+    
+    return [
+        {
+            "period": row["period"],
+            "scores": {emo: float(row[EMOTION_TO_COLUMN[emo]] or 0) for emo in EMOTION_KEYS},
+            "diaryCount": int(row["diary_count"] or 0),
+        }
+        for row in rows
+    ]
+
 # =========================================
 # Plaza Functions
 # =========================================
@@ -595,14 +873,29 @@ def delete_plaza_conversation_by_date(date: str, user_id: int = None) -> bool:
 
 STAGES = [0, 40, 100, 220, 380, 600]
 
+def _tree_stage_sql(growth_expr: str) -> str:
+    """growth 식 → 단계(0~5) SQL 식 (STAGES 기준)"""
+    cases = " ".join(
+        f"WHEN {growth_expr} >= {threshold} THEN {stage}"
+        for stage, threshold in reversed(list(enumerate(STAGES)))
+        if threshold > 0
+    )
+    return f"(CASE {cases} ELSE 0 END)"
+
+def _iso(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) if value else value
+
 def get_tree_state(user_id: int = None):
-    """행복 나무 상태 가져오기"""
+    """행복 나무 상태 가져오기 (단계는 growth 로부터 SQL 에서 계산, 읽기 전용)"""
     if user_id is None:
         user_id = 0
     
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM tree_state WHERE user_id = %s", (user_id,))
+    cur.execute(f"SELECT growth, {_tree_stage_sql('growth')} AS stage, last_updated FROM tree_state WHERE user_id = %s",
+                (user_id,))
     row = cur.fetchone()
     conn.close()
     
@@ -610,21 +903,36 @@ def get_tree_state(user_id: int = None):
         save_tree_state({"growth": 0, "stage": 0}, user_id)
         return {"growth": 0, "stage": 0}
     
-    state = dict(row)
-    growth = int(state["growth"])
-    new_stage = max(i for i, v in enumerate(STAGES) if growth >= v)
-    
-    if new_stage != state["stage"]:
-        save_tree_state({"growth": growth, "stage": new_stage}, user_id)
-    
-    # ISO 형식으로 변환
-    if 'last_updated' in state and state['last_updated']:
-        if isinstance(state['last_updated'], datetime):
-            state['last_updated'] = state['last_updated'].isoformat()
-        else:
-            state['last_updated'] = str(state['last_updated'])
+    return {"growth": int(row["growth"]), "stage": int(row["stage"]), "last_updated": _iso(row["last_updated"])}
+
+def _apply_tree_delta(cur, user_id: int, delta: float) -> Dict[str, Any]:
+    """growth 에 delta 를 더함 (0 미만 불가, 단계 재계산) - 단일 UPDATE 라 동시 요청에도 유실 없음"""
+    # growth 는 INTEGER - 정수로 한 번 변환한 값으로 growth 와 stage 를 함께 계산 (39.6 → growth 40, stage 도 40 기준)
+    initial = "GREATEST(0, (%(delta)s)::int)"
+    updated = "GREATEST(0, (tree_state.growth + %(delta)s)::int)"
+    cur.execute(f"""
+        INSERT INTO tree_state (user_id, growth, stage, last_updated)
+        VALUES (%(user_id)s, {initial}, {_tree_stage_sql(initial)}, NOW())
+        ON CONFLICT (user_id) DO UPDATE SET
+            growth = {updated},
+            stage = {_tree_stage_sql(updated)},
+            last_updated = NOW()
+        RETURNING growth, stage, last_updated
+    """, {"user_id": user_id, "delta": delta})
+    row = cur.fetchone()
+    return {"growth": int(row["growth"]), "stage": int(row["stage"]), "last_updated": _iso(row["last_updated"])}
+
+def add_tree_growth(delta: float, user_id: int = None) -> Dict[str, Any]:
+    """행복 나무 growth 증감 (음수면 감소). 갱신된 상태 반환"""
+    if user_id is None:
+        user_id = 0
     
-    return {"growth": growth, "stage": new_stage, "last_updated": state.get('last_updated')}
+    conn = get_db()
+    cur = conn.cursor()
+    state = _apply_tree_delta(cur, user_id, delta)
+    conn.commit()
+    conn.close()
+    return state
 
 def save_tree_state(state: Dict[str, Any], user_id: int = None):
     """행복 나무 상태 저장"""
@@ -731,6 +1039,42 @@ def get_well_state(user_id: int = None):
     
     return result
 
+WELL_OVERFLOW_LEVEL = 500
+
+def _apply_well_delta(cur, user_id: int, delta: float) -> Dict[str, Any]:
+    """water_level 에 delta 를 더함 (0 미만 불가, 넘침 여부 재계산) - 단일 UPDATE"""
+    # water_level 은 INTEGER - 정수로 한 번 변환한 값으로 water_level 과 넘침 여부를 함께 계산
+    initial = "GREATEST(0, (%(delta)s)::int)"
+    updated = "GREATEST(0, (well_state.water_level + %(delta)s)::int)"
+    cur.execute(f"""
+        INSERT INTO well_state (user_id, water_level, is_overflowing, last_updated)
+        VALUES (%(user_id)s, {initial}, {initial} >= %(overflow)s, NOW())
+        ON CONFLICT (user_id) DO UPDATE SET
+            water_level = {updated},
+            is_overflowing = {updated} >= %(overflow)s,
+            last_updated = NOW()
+        RETURNING water_level, is_overflowing, last_overflow_date, last_updated
+    """, {"user_id": user_id, "delta": delta, "overflow": WELL_OVERFLOW_LEVEL})
+    row = cur.fetchone()
+    return {
+        "waterLevel": row["water_level"],
+        "isOverflowing": row["is_overflowing"],
+        "lastOverflowDate": row["last_overflow_date"],
+        "last_updated": _iso(row["last_updated"]),
+    }
+
+def add_well_water(delta: float, user_id: int = None) -> Dict[str, Any]:
+    """스트레스 우물 수위 증감 (음수면 감소). 갱신된 상태 반환"""
+    if user_id is None:
+        user_id = 0
+    
+    conn = get_db()
+    cur = conn.cursor()
+    state = _apply_well_delta(cur, user_id, delta)
+    conn.commit()
+    conn.close()
+    return state
+
 def save_well_state(state: Dict[str, Any], user_id: int = None):
     """스트레스 우물 상태 저장"""
     if user_id is None:
@@ -869,3 +1213,215 @@ def get_unread_letter_count(user_id: int = None):
     row = cur.fetchone()
     conn.close()
     return row["count"] if row else 0
+
+# =========================================
+# Diary Embeddings Functions
+# =========================================
+# 유사 일기 검색용 문장 임베딩 (float32 바이트). 벡터 변환은 services/diary_similarity 에서 담당
+
+def save_diary_embedding(diary_id: str, user_id: int, model_name: str, model_version: str,
+                         content_hash: str, dim: int, vector: bytes) -> bool:
+    """일기 임베딩 저장 (있으면 덮어씀). 그 사이 일기가 삭제되었으면 False"""
+    try:
+        with transaction() as cur:
+            cur.execute("""
+                INSERT INTO diary_embeddings (diary_id, user_id, model_name, model_version, dim, content_hash, vector, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+                ON CONFLICT (diary_id) DO UPDATE SET
+                    user_id = EXCLUDED.user_id,
+                    model_name = EXCLUDED.model_name,
+                    model_version = EXCLUDED.model_version,
+                    dim = EXCLUDED.dim,
+                    content_hash = EXCLUDED.content_hash,
+                    vector = EXCLUDED.vector,
+                    updated_at = NOW()
+            """, (diary_id, user_id, model_name, model_version, dim, content_hash, psycopg2.Binary(vector)))
+        return True
+    except pg_errors.ForeignKeyViolation:
+        return False
+
+def get_diary_embeddings(user_id: int, model_name: str, model_version: str,
+                         diary_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    사용자의 일기 임베딩을 한 번에 조회 (같은 모델/버전만)
+    반환: {diary_id: {"content_hash", "dim", "vector"(bytes)}}
+    """
+    conn = get_db()
+    cur = conn.cursor()
+    query = """
+        SELECT diary_id, content_hash, dim, vector FROM diary_embeddings
+        WHERE user_id = %s AND model_name = %s AND model_version = %s
+    """
+    params: List[Any] = [user_id, model_name, model_version]
+    if diary_ids is not None:
+        if not diary_ids:
+            conn.close()
+            return {}
+        query += " AND diary_id = ANY(%s)"
+        params.append(list(diary_ids))
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    conn.close()
+    return {
+        row["diary_id"]: {"content_hash": row["content_hash"], "dim": row["dim"], "vector": bytes(row["vector"])}
+        for row in rows
+    }
+
+# =========================================
+# GPT Analysis Cache Functions
+# =========================================
+# 같은 일기 내용의 GPT 감정 분석 결과 재사용 (키/TTL 정책은 services/emotion_gpt 에서 담당)
+
+def get_gpt_analysis_cache(content_hash: str, model: str, prompt_version: str,
+                           touch_after_seconds: float = 300) -> Optional[Dict[str, Any]]:
+    """
+    만료되지 않은 캐시 결과 조회 - 읽기는 SELECT 만 (같은 항목을 동시에 조회해도 행 잠금 대기 없음)
+    hit_count / last_hit_at 은 마지막 갱신이 touch_after_seconds 초보다 오래됐을 때만 따로 갱신 (실패해도 무시)
+    → hit_count 는 그 간격마다 한 번씩만 늘어나는 근사값
+    반환: {"result", "created_at", "hit_count"} 또는 None
+    """
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT result, created_at, hit_count,
+               last_hit_at < NOW() - make_interval(secs => %s) AS stale
+        FROM gpt_analysis_cache
+        WHERE content_hash = %s AND model = %s AND prompt_version = %s AND expires_at > NOW()
+    """, (touch_after_seconds, content_hash, model, prompt_version))
+    row = cur.fetchone()
+    conn.close()
+    if not row:
+        return None
+    hit_count = row["hit_count"]
+    if row["stale"]:
+        try:
+            with transaction() as cur:
+                # 다른 워커가 방금 갱신했으면 (last_hit_at 조건) 건너뜀
+                cur.execute("""
+                    UPDATE gpt_analysis_cache
+                    SET hit_count = hit_count + 1, last_hit_at = NOW()
+                    WHERE content_hash = %s AND model = %s AND prompt_version = %s
+                      AND last_hit_at < NOW() - make_interval(secs => %s)
+                """, (content_hash, model, prompt_version, touch_after_seconds))
+                hit_count += cur.rowcount
+        except Exception as e:
+            print(f"⚠️ [GPT 캐시] hit 기록 실패 (무시): {e}")
+    result = row["result"]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return {"result": result, "created_at": row["created_at"], "hit_count": hit_count}
+
+def save_gpt_analysis_cache(content_hash: str, model: str, prompt_version: str,
+                            result: Dict[str, Any], ttl_seconds: int) -> None:
+    """GPT 분석 결과 저장 (있으면 덮어쓰고 만료 시간 갱신)"""
+    with transaction() as cur:
+        cur.execute("""
+            INSERT INTO gpt_analysis_cache (content_hash, model, prompt_version, result, created_at, expires_at, last_hit_at, hit_count)
+            VALUES (%s, %s, %s, %s, NOW(), NOW() + %s * INTERVAL '1 second', NOW(), 0)
+            ON CONFLICT (content_hash, model, prompt_version) DO UPDATE SET
+                result = EXCLUDED.result,
+                created_at = NOW(),
+                expires_at = EXCLUDED.expires_at,
+                last_hit_at = NOW()
+        """, (content_hash, model, prompt_version, json.dumps(result, ensure_ascii=False), ttl_seconds))
+
+def prune_gpt_analysis_cache(max_entries: int) -> int:
+    """만료된 항목 + 최대 개수를 넘는 오래 안 쓴 항목 삭제. 삭제한 개수 반환"""
+    with transaction() as cur:
+        cur.execute("DELETE FROM gpt_analysis_cache WHERE expires_at <= NOW()")
+        deleted = cur.rowcount
+        cur.execute("""
+            DELETE FROM gpt_analysis_cache WHERE ctid IN (
+                SELECT ctid FROM gpt_analysis_cache
+                ORDER BY last_hit_at DESC
+                OFFSET %s
+            )
+        """, (max_entries,))
+        deleted += cur.rowcount
+    return deleted
+
+def get_gpt_analysis_cache_stats() -> Dict[str, Any]:
+    """캐시 항목 수 / 누적 hit 수 (전체 프로세스 공용)"""
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT COUNT(*) AS entries, COALESCE(SUM(hit_count), 0) AS hits,
+               COUNT(*) FILTER (WHERE expires_at <= NOW()) AS expired
+        FROM gpt_analysis_cache
+    """)
+    row = cur.fetchone()
+    conn.close()
+    return {"entries": int(row["entries"]), "hits": int(row["hits"]), "expired": int(row["expired"])}
+
+# =========================================
+# Unit of Work (일기 삭제/교체 연쇄 처리)
+# =========================================
+
+def _tree_well_deltas(rows) -> Dict[str, float]:
+    """삭제된 일기 행(e0 ~ e6)들로부터 나무/우물에서 빼야 할 양 계산"""
+    positive = sum(float(row[f"e{EMOTION_KEYS.index(emo)}"] or 0) for row in rows for emo in TREE_EMOTIONS)
+    negative = sum(float(row[f"e{EMOTION_KEYS.index(emo)}"] or 0) for row in rows for emo in WELL_EMOTIONS)
+    return {"tree": positive, "well": negative}
+
+def _revert_tree_well(cur, user_id: int, rows) -> Dict[str, Any]:
+    """삭제된 일기의 긍정 감정은 나무에서, 부정 감정은 우물에서 되돌림"""
+    deltas = _tree_well_deltas(rows)
+    result: Dict[str, Any] = {"tree": None, "well": None}
+    if deltas["tree"] > 0:
+        result["tree"] = _apply_tree_delta(cur, user_id, -deltas["tree"])
+    if deltas["well"] > 0:
+        result["well"] = _apply_well_delta(cur, user_id, -deltas["well"])
+    return result
+
+def delete_diary_cascade(diary_id: str, user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    일기 삭제 + 관련 데이터 정리를 한 트랜잭션에서 처리
+    
+    1. 일기 삭제 (+ 일별 감정 집계 차감)
+    2. 같은 날짜의 광장 대화 삭제
+    3. 같은 날짜에 생성된 감정 편지(emotion_high) 삭제
+    4. 행복 나무 / 스트레스 우물 되돌리기
+    
+    중간에 실패하면 전부 롤백. 해당 사용자의 일기가 없으면 None
+    """
+    with transaction() as cur:
+        cur.execute(f"DELETE FROM diaries WHERE id = %s AND user_id = %s RETURNING user_id, date, {_SCORE_COLUMNS}",
+                    (diary_id, user_id))
+        rows = cur.fetchall()
+        if not rows:
+            return None
+        for row in rows:
+            _rollup_apply_row(cur, row, sign=-1)
+        
+        date = rows[0]["date"]
+        result: Dict[str, Any] = {"date": date, "tree": None, "well": None}
+        if date:
+            cur.execute("DELETE FROM plaza_conversations WHERE date = %s AND user_id = %s", (date, user_id))
+            cur.execute("DELETE FROM letters WHERE date = %s AND type = %s AND user_id = %s",
+                        (date, "emotion_high", user_id))
+            result.update(_revert_tree_well(cur, user_id, rows))
+        return result
+
+def replace_diary_cascade(date: str, new_diary: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    """
+    날짜의 일기를 새 일기로 교체 - 한 트랜잭션에서 처리
+    
+    1. 해당 날짜의 기존 일기 삭제 (+ 일별 감정 집계 차감)
+    2. 기존 일기의 감정만큼 행복 나무 / 스트레스 우물 되돌리기
+    3. 해당 날짜의 광장 대화 삭제
+    4. 새 일기 저장
+    
+    중간에 실패하면 전부 롤백 (예외 전달)
+    """
+    with transaction() as cur:
+        cur.execute(f"DELETE FROM diaries WHERE date = %s AND user_id = %s RETURNING id, user_id, date, {_SCORE_COLUMNS}",
+                    (date, user_id))
+        rows = cur.fetchall()
+        for row in rows:
+            _rollup_apply_row(cur, row, sign=-1)
+        result: Dict[str, Any] = _revert_tree_well(cur, user_id, rows)
+        result["deleted_ids"] = [row["id"] for row in rows]
+        cur.execute("DELETE FROM plaza_conversations WHERE date = %s AND user_id = %s", (date, user_id))
+        result["id"] = _upsert_diary(cur, new_diary, user_id)
+        result["replaced"] = len(rows)
+        return result
@@ -0,0 +1,32 @@
+"""
+gunicorn 설정 (Procfile / railway.json 의 명령행 옵션과 같이 적용됨)
+
+GUNICORN_PRELOAD=true 이면 마스터에서 앱(+ MODEL_WARMUP=true 면 모델)을 한 번 로드한 뒤 워커를 fork
+→ 모델 가중치 페이지를 워커들이 copy-on-write 로 공유
+"""
+import gc
+import os
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+if preload_app:
+    # 마스터에서 로드하는 동안 GC 가 객체를 옮기거나 건드리지 않도록 끄고, fork 직전에 freeze
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # 지금까지 만든 객체를 GC 대상에서 빼서, 워커의 GC 가 refcount/헤더를 써서 공유 페이지를 복사하지 않도록
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+
+
+def post_worker_init(worker):
+    # 워커가 앱을 로드한 뒤, 트래픽을 받기 전에 모델 추론을 한 번 실행 (preload 면 로드는 이미 마스터에서 끝남)
+    from services import model_registry
+    if model_registry.WARMUP_ENABLED:
+        model_registry.warmup()
@@ -0,0 +1,462 @@
+"""
+감정 분석 + 와글와글 광장 대화를 GPT 한 번 호출로 생성 (combined 모드)
+
+기존 /analyze 는 analyze_emotions_with_gpt → generate_dialogue_with_gpt 를 차례로 호출해서
+일기 하나에 OpenAI 왕복 두 번 + 일기 본문/지침이 든 프롬프트 두 벌을 보냄
+
+- 한 번의 호출로 감정 점수 + 놀람/부끄러움 극성 + 대화를 함께 받음 (response_format=json_object)
+  대화 참여 규칙은 같은 응답의 감정 점수를 기준으로 (0보다 크면 반드시 참여, 0이면 반응만)
+- 응답은 validate_combined 로 스키마 검사 → 통과하면 점수는 analyze_emotions_with_gpt 와 같은 후처리(_build_result),
+  대화는 기존 openai_dialogue 와 같은 <BEGIN_JSON> {"dialogue": [...]} <END_JSON> 문자열로 반환
+- 파싱/스키마 검사 실패, 호출 실패, 서킷 브레이커 open → 기존 두 번 호출 경로로 대체 (meta["combined"] 에 이유 기록)
+- 감정 결과는 GPT 캐시에 별도 prompt_version(COMBINED_PROMPT_VERSION)으로 저장
+  → 같은 일기를 다시 분석하면 대화 호출 한 번만
+
+ANALYZE_COMBINED_ENABLED=true 이면 /analyze 도 combined 사용 (EMOTION_CASCADE_ENABLED 가 우선),
+/analyze2 는 mode=combined, 통계 → GET /health/gpt 의 "combined"
+
+기존 흐름과 지연 시간 / 토큰 사용량 비교 (캐시를 거치지 않고 실제 OpenAI 를 호출함):
+    python -m services.combined_analysis [--runs 3] [--file diaries.txt]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import statistics
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.common import client, async_client, CHARACTERS, EMOTION_KEYS
+from core import llm_resilience
+from core.llm_resilience import CircuitOpenError
+from services.emotion_gpt import (
+    GPT_MODEL, POLARITY_GUIDE, analyze_emotions_with_gpt, analyze_emotions_with_gpt_async,
+    content_hash, extract_json, _build_result, _cache_lookup, _cache_store, _postprocess,
+    _completion_kwargs as _emotion_completion_kwargs,
+)
+from services.conversation import (
+    DIALOGUE_MODEL, DIALOGUE_RULES, DIALOGUE_SYSTEM_PROMPT, build_dialogue_messages,
+    generate_dialogue_with_gpt, generate_dialogue_with_gpt_async,
+)
+
+COMBINED_ENABLED = os.environ.get("ANALYZE_COMBINED_ENABLED", "false").lower() in ("1", "true", "yes")
+# 감정 분석(0.1)과 대화 생성(0.8) 사이 값 - 점수는 조금 흔들리지만 대사가 딱딱해지지 않도록
+COMBINED_TEMPERATURE = float(os.environ.get("ANALYZE_COMBINED_TEMPERATURE", "0.6"))
+COMBINED_MAX_TOKENS = int(os.environ.get("ANALYZE_COMBINED_MAX_TOKENS", "1200"))
+# 감정 분석만 하는 프롬프트와 점수 분포가 다를 수 있으므로 캐시는 따로 (프롬프트를 바꾸면 올리기)
+COMBINED_PROMPT_VERSION = "combined-1"
+
+# 스키마 검사 - 대사 수 (프롬프트는 5~8개를 요구하지만 조금 벗어나도 그대로 사용)
+MIN_LINES = 3
+MAX_LINES = 12
+_POLARITY_VALUES = ("positive", "negative", None)
+_CHARACTER_NAMES = {CHARACTERS[emo]["name"] for emo in EMOTION_KEYS if emo in CHARACTERS}
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "requests": 0,
+    "combined": 0,
+    "cache_hits": 0,
+    "fallbacks": {"circuit_open": 0, "gpt_error": 0, "invalid_schema": 0},
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "total_ms": 0.0,
+}
+
+
+# =========================================
+# 프롬프트 / 스키마 검사
+# =========================================
+
+def _character_descriptions() -> str:
+    lines = []
+    for emotion in EMOTION_KEYS:
+        if emotion not in CHARACTERS:
+            continue
+        char_info = CHARACTERS[emotion]
+        speech_hints = ", ".join(char_info.get("speech_hints", []))
+        lines.append(
+            f"- {char_info['name']}({emotion}): {char_info.get('style', '')}\n"
+            f"  말투 특징: {speech_hints}"
+        )
+    return "\n".join(lines)
+
+
+def _combined_kwargs(diary_text: str) -> Dict[str, Any]:
+    """감정 + 대화 chat.completions.create 인자 (동기 / 비동기 클라이언트, 벤치마크 공용)"""
+    prompt = (
+        "다음 일기를 읽고 (1) 감정 분석과 (2) 사용자의 마음속 감정 주민들이 나누는 '내면 대화'를 한 번에 JSON 으로 출력하세요.\n\n"
+        "📊 1단계 - 감정 분석\n\n"
+        "7가지 감정(기쁨, 사랑, 놀람, 두려움, 분노, 부끄러움, 슬픔)을 0~100 정수로 분석하세요.\n\n"
+        f"{POLARITY_GUIDE}\n\n"
+        "💬 2단계 - 내면 대화\n\n"
+        f"{DIALOGUE_RULES}"
+        "📌 역할 규칙 (중요!)\n\n"
+        "- 1단계에서 0보다 큰 점수를 준 감정의 주민은 반드시 대화에 참여하고, 자신의 감정을 1인칭('나')으로 구체적으로 표현합니다.\n"
+        "  * 안 좋은 예: \"정말 행복했겠네\" / 좋은 예: \"정말 행복했어!\"\n"
+        "  * 제 3자적 설명·분석·요약 금지입니다.\n"
+        "- 0점인 감정의 주민은 대화 흐름상 자연스러울 때만 참여하고, 자신의 감정을 표현하지 않고 다른 주민에게 반응만 합니다 (위로, 동조, 반박, 격려 등).\n"
+        "- 각 주민은 자신의 감정 특성에 맞지 않는 말을 하면 안 됩니다.\n\n"
+        "🧩 각 주민의 감정별 역할과 말투\n\n"
+        f"{_character_descriptions()}\n\n"
+        "📘 일기:\n\n"
+        f"{diary_text}\n\n"
+        "출력 JSON 형식 (다른 텍스트 금지):\n"
+        "{\n"
+        "  \"emotion_scores\": {\"기쁨\": 0, \"사랑\": 0, \"놀람\": 0, \"두려움\": 0, \"분노\": 0, \"부끄러움\": 0, \"슬픔\": 0},\n"
+        "  \"emotion_polarity\": {\"놀람\": null, \"부끄러움\": null},\n"
+        "  \"dialogue\": [\n"
+        "    {\"캐릭터\": \"주민 이름\", \"감정\": \"감정명\", \"대사\": \"내용\"},\n"
+        "    ...\n"
+        "  ]\n"
+        "}\n"
+        "emotion_polarity는 반드시 \"positive\", \"negative\", 또는 null 중 하나로 설정하세요."
+    )
+    return {
+        "model": GPT_MODEL,
+        "messages": [
+            {"role": "system", "content": DIALOGUE_SYSTEM_PROMPT + " 감정 분석 결과와 대화를 JSON 으로만 출력한다."},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": COMBINED_TEMPERATURE,
+        "max_tokens": COMBINED_MAX_TOKENS,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_combined(parsed: Any) -> List[str]:
+    """한 번 호출 응답(JSON) 스키마 검사 → 문제 목록 (비어 있으면 통과)"""
+    if not isinstance(parsed, dict):
+        return ["응답이 JSON 객체가 아님"]
+    errors = []
+
+    scores = parsed.get("emotion_scores")
+    if not isinstance(scores, dict):
+        errors.append("emotion_scores 없음")
+    else:
+        for emo in EMOTION_KEYS:
+            value = scores.get(emo)
+            if not _is_number(value) or not 0 <= value <= 100:
+                errors.append(f"emotion_scores.{emo} 가 0~100 숫자가 아님: {value!r}")
+        if not errors and sum(scores[emo] for emo in EMOTION_KEYS) <= 0:
+            errors.append("emotion_scores 가 모두 0")
+
+    polarity = parsed.get("emotion_polarity", {})
+    if not isinstance(polarity, dict):
+        errors.append("emotion_polarity 가 객체가 아님")
+    else:
+        for emo in ("놀람", "부끄러움"):
+            if polarity.get(emo) not in _POLARITY_VALUES:
+                errors.append(f"emotion_polarity.{emo} 값이 잘못됨: {polarity.get(emo)!r}")
+
+    dialogue = parsed.get("dialogue")
+    if not isinstance(dialogue, list):
+        errors.append("dialogue 목록 없음")
+        return errors
+    if not MIN_LINES <= len(dialogue) <= MAX_LINES:
+        errors.append(f"대사 수 {len(dialogue)}개 ({MIN_LINES}~{MAX_LINES}개여야 함)")
+    for i, line in enumerate(dialogue):
+        if not isinstance(line, dict):
+            errors.append(f"dialogue[{i}] 가 객체가 아님")
+            continue
+        if line.get("캐릭터") not in _CHARACTER_NAMES:
+            errors.append(f"dialogue[{i}].캐릭터 를 알 수 없음: {line.get('캐릭터')!r}")
+        if line.get("감정") not in EMOTION_KEYS:
+            errors.append(f"dialogue[{i}].감정 을 알 수 없음: {line.get('감정')!r}")
+        if not isinstance(line.get("대사"), str) or not line["대사"].strip():
+            errors.append(f"dialogue[{i}].대사 가 비어 있음")
+    return errors
+
+
+def format_dialogue(dialogue: List[Dict[str, Any]]) -> str:
+    """대사 목록 → generate_dialogue_with_gpt 반환값과 같은 형식 (프론트엔드 parseDialogue 가 그대로 파싱)"""
+    lines = [{"캐릭터": line["캐릭터"], "감정": line["감정"], "대사": line["대사"].strip()} for line in dialogue]
+    return "<BEGIN_JSON>\n" + json.dumps({"dialogue": lines}, ensure_ascii=False, indent=2) + "\n<END_JSON>"
+
+
+def _usage(resp: Any) -> Dict[str, int]:
+    usage = getattr(resp, "usage", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+
+
+# =========================================
+# 통계 (워커 프로세스 단위) → GET /health/gpt 의 "combined"
+# =========================================
+
+def _record(outcome: str, usage: Optional[Dict[str, int]] = None, elapsed_ms: float = 0.0) -> None:
+    with _stats_lock:
+        _stats["requests"] += 1
+        if outcome in _stats["fallbacks"]:
+            _stats["fallbacks"][outcome] += 1
+        else:
+            _stats[outcome] += 1
+        # 스키마 검사에 실패한 호출의 토큰도 실제로 쓴 것이므로 포함
+        if usage:
+            _stats["prompt_tokens"] += usage["prompt_tokens"]
+            _stats["completion_tokens"] += usage["completion_tokens"]
+        _stats["total_ms"] = round(_stats["total_ms"] + elapsed_ms, 1)
+
+
+def get_combined_stats() -> Dict[str, Any]:
+    """한 번 호출로 끝낸 요청 / 두 번 호출 경로로 대체한 요청(이유별) 수, 한 번 호출의 토큰 사용량"""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+        stats["fallbacks"] = dict(_stats["fallbacks"])
+    calls = stats["combined"] + stats["fallbacks"]["invalid_schema"]
+    stats.update({
+        "enabled": COMBINED_ENABLED,
+        "prompt_version": COMBINED_PROMPT_VERSION,
+        "temperature": COMBINED_TEMPERATURE,
+        "combined_rate": stats["combined"] / stats["requests"] if stats["requests"] else 0.0,
+        "avg_call_ms": stats["total_ms"] / calls if calls else 0.0,
+    })
+    return stats
+
+
+# =========================================
+# 감정 + 대화 분석
+# =========================================
+
+def _accept(diary_text: str, raw: str, meta: Optional[Dict[str, Any]], usage: Dict[str, int],
+            elapsed_ms: float) -> Optional[Tuple[Dict[str, Any], str]]:
+    """스키마 검사를 통과하면 (감정 결과, 대화 문자열), 아니면 None (meta / 통계 기록)"""
+    parsed = extract_json(raw)
+    errors = validate_combined(parsed)
+    info: Dict[str, Any] = {"used": not errors, "latency_ms": round(elapsed_ms, 1), "usage": usage}
+    if errors:
+        print(f"⚠️ [감정+대화] 응답 스키마 검사 실패 - 두 번 호출로 대체: {errors[:3]}")
+        info.update({"reason": "invalid_schema", "errors": errors[:5]})
+        _record("invalid_schema", usage, elapsed_ms)
+    else:
+        _record("combined", usage, elapsed_ms)
+    if meta is not None:
+        meta["combined"] = info
+    if errors:
+        return None
+    result = _build_result(diary_text, parsed["emotion_scores"], parsed.get("emotion_polarity", {}))
+    return result, format_dialogue(parsed["dialogue"])
+
+
+def _fallback_info(meta: Optional[Dict[str, Any]], reason: str) -> None:
+    _record(reason)
+    if meta is not None:
+        meta["combined"] = {"used": False, "reason": reason}
+
+
+def _two_calls(diary_text: str, meta: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], str]:
+    emo_result = analyze_emotions_with_gpt(diary_text, meta=meta)
+    dialogue = generate_dialogue_with_gpt(
+        diary_text,
+        emo_result.get("top_emotions", []),
+        emo_result.get("emotion_scores", {})
+    )
+    return emo_result, dialogue
+
+
+async def _two_calls_async(diary_text: str, meta: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], str]:
+    emo_result = await analyze_emotions_with_gpt_async(diary_text, meta=meta)
+    dialogue = await generate_dialogue_with_gpt_async(
+        diary_text,
+        emo_result.get("top_emotions", []),
+        emo_result.get("emotion_scores", {})
+    )
+    return emo_result, dialogue
+
+
+def analyze_with_dialogue_combined(diary_text: str, meta: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], str]:
+    """
+    (analyze_emotions_with_gpt 와 같은 형식의 감정 결과, generate_dialogue_with_gpt 와 같은 형식의 대화)
+    meta["cache"] 에 캐시 정보, meta["combined"] 에 한 번 호출 사용 여부 / 지연 시간 / 토큰 수 기록
+    """
+    text_hash = content_hash(diary_text)
+    cached, cache_info = _cache_lookup(text_hash, COMBINED_PROMPT_VERSION)
+    if meta is not None:
+        meta["cache"] = cache_info
+    if cached is not None:
+        # 감정은 캐시에 있으므로 대화만 생성 (어차피 호출 한 번)
+        _record("cache_hits")
+        if meta is not None:
+            meta["combined"] = {"used": False, "reason": "cache_hit"}
+        return cached, generate_dialogue_with_gpt(
+            diary_text, cached.get("top_emotions", []), cached.get("emotion_scores", {})
+        )
+
+    if llm_resilience.is_open():
+        _fallback_info(meta, "circuit_open")
+        return _two_calls(diary_text, meta)
+    started = time.perf_counter()
+    try:
+        resp = client.chat.completions.create(**_combined_kwargs(diary_text))
+        raw = resp.choices[0].message.content or ""
+    except CircuitOpenError:
+        _fallback_info(meta, "circuit_open")
+        return _two_calls(diary_text, meta)
+    except Exception as e:
+        print(f"⚠️ [감정+대화] 호출 실패 - 두 번 호출로 대체: {e}")
+        _fallback_info(meta, "gpt_error")
+        return _two_calls(diary_text, meta)
+
+    accepted = _accept(diary_text, raw, meta, _usage(resp), (time.perf_counter() - started) * 1000)
+    if accepted is None:
+        return _two_calls(diary_text, meta)
+    _cache_store(text_hash, accepted[0], COMBINED_PROMPT_VERSION)
+    return accepted
+
+
+async def analyze_with_dialogue_combined_async(diary_text: str,
+                                               meta: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], str]:
+    """analyze_with_dialogue_combined 의 asyncio 버전 (ASGI 모드, asgi.py)"""
+    text_hash = content_hash(diary_text)
+    cached, cache_info = await asyncio.to_thread(_cache_lookup, text_hash, COMBINED_PROMPT_VERSION)
+    if meta is not None:
+        meta["cache"] = cache_info
+    if cached is not None:
+        _record("cache_hits")
+        if meta is not None:
+            meta["combined"] = {"used": False, "reason": "cache_hit"}
+        return cached, await generate_dialogue_with_gpt_async(
+            diary_text, cached.get("top_emotions", []), cached.get("emotion_scores", {})
+        )
+
+    if llm_resilience.is_open():
+        _fallback_info(meta, "circuit_open")
+        return await _two_calls_async(diary_text, meta)
+    started = time.perf_counter()
+    try:
+        resp = await async_client.chat.completions.create(**_combined_kwargs(diary_text))
+        raw = resp.choices[0].message.content or ""
+    except CircuitOpenError:
+        _fallback_info(meta, "circuit_open")
+        return await _two_calls_async(diary_text, meta)
+    except Exception as e:
+        print(f"⚠️ [감정+대화] 호출 실패 - 두 번 호출로 대체: {e}")
+        _fallback_info(meta, "gpt_error")
+        return await _two_calls_async(diary_text, meta)
+
+    accepted = _accept(diary_text, raw, meta, _usage(resp), (time.perf_counter() - started) * 1000)
+    if accepted is None:
+        return await _two_calls_async(diary_text, meta)
+    await asyncio.to_thread(_cache_store, text_hash, accepted[0], COMBINED_PROMPT_VERSION)
+    return accepted
+
+
+# =========================================
+# 벤치마크 - 두 번 호출 vs 한 번 호출 (캐시 / 대체 경로 없이 OpenAI 직접 호출)
+# =========================================
+
+SAMPLE_DIARIES = [
+    "오늘 기다리던 합격 발표가 났다. 생각보다 점수가 높아서 깜짝 놀랐고 엄마랑 부둥켜안고 울었다.",
+    "발표 중에 말이 꼬여서 다들 웃었다. 너무 창피해서 얼굴이 빨개졌고 집에 와서도 계속 생각났다.",
+    "친구가 약속 시간에 한 시간이나 늦었는데 사과도 없었다. 화가 나는데 말도 못 하고 돌아왔다.",
+    "밤에 혼자 집에 오는데 누가 따라오는 것 같아서 무서웠다. 괜히 뛰어서 들어왔다.",
+    "오랜만에 할머니 댁에 갔다. 할머니가 해주신 밥을 먹으니 마음이 따뜻했는데 돌아올 때는 좀 쓸쓸했다.",
+]
+
+
+def _timed_create(**kwargs) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    resp = client.chat.completions.create(**kwargs)
+    return resp, (time.perf_counter() - started) * 1000
+
+
+def _bench_two_calls(diary_text: str) -> Dict[str, Any]:
+    emo_resp, emo_ms = _timed_create(**_emotion_completion_kwargs(diary_text))
+    result, gpt_ok = _postprocess(diary_text, emo_resp.choices[0].message.content or "")
+    # generate_dialogue_with_gpt 와 같은 인자
+    dlg_resp, dlg_ms = _timed_create(
+        model=DIALOGUE_MODEL,
+        messages=build_dialogue_messages(diary_text, result["top_emotions"], result["emotion_scores"]),
+        temperature=0.8,
+        max_tokens=800,
+    )
+    emo_usage, dlg_usage = _usage(emo_resp), _usage(dlg_resp)
+    dialogue = extract_json(dlg_resp.choices[0].message.content or "")
+    return {
+        "ms": emo_ms + dlg_ms,
+        "prompt_tokens": emo_usage["prompt_tokens"] + dlg_usage["prompt_tokens"],
+        "completion_tokens": emo_usage["completion_tokens"] + dlg_usage["completion_tokens"],
+        "valid": gpt_ok and isinstance(dialogue, dict) and isinstance(dialogue.get("dialogue"), list),
+    }
+
+
+def _bench_combined(diary_text: str) -> Dict[str, Any]:
+    resp, ms = _timed_create(**_combined_kwargs(diary_text))
+    usage = _usage(resp)
+    return {
+        "ms": ms,
+        "prompt_tokens": usage["prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "valid": not validate_combined(extract_json(resp.choices[0].message.content or "")),
+    }
+
+
+def benchmark(texts: List[str], runs: int = 1) -> Dict[str, Dict[str, Any]]:
+    """경로별 일기 하나당 지연 시간(ms) / 토큰 수 / 정상 응답 비율 (순서 영향이 없도록 번갈아 먼저 실행)"""
+    samples: Dict[str, List[Dict[str, Any]]] = {"two_calls": [], "combined": []}
+    paths = [("two_calls", _bench_two_calls), ("combined", _bench_combined)]
+    for run in range(runs):
+        for i, text in enumerate(texts):
+            order = paths if (run + i) % 2 == 0 else paths[::-1]
+            for name, bench in order:
+                try:
+                    samples[name].append(bench(text))
+                except Exception as e:
+                    print(f"⚠️ [벤치마크] {name} 호출 실패: {e}")
+                    samples[name].append({"ms": None, "valid": False})
+
+    report = {}
+    for name, rows in samples.items():
+        ok = [row for row in rows if row["ms"] is not None]
+        latencies = sorted(row["ms"] for row in ok)
+        report[name] = {
+            "samples": len(rows),
+            "mean_ms": statistics.mean(latencies) if latencies else None,
+            "p50_ms": statistics.median(latencies) if latencies else None,
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+            "prompt_tokens": statistics.mean(row["prompt_tokens"] for row in ok) if ok else None,
+            "completion_tokens": statistics.mean(row["completion_tokens"] for row in ok) if ok else None,
+            "valid_rate": sum(row["valid"] for row in rows) / len(rows) if rows else 0.0,
+        }
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="감정 분석 + 대화: 두 번 호출 vs 한 번 호출 벤치마크 (실제 OpenAI 호출)")
+    parser.add_argument("--file", help="한 줄에 일기 하나인 텍스트 파일 (없으면 내장 샘플)")
+    parser.add_argument("--runs", type=int, default=1, help="일기마다 반복 횟수")
+    args = parser.parse_args(argv)
+
+    texts = SAMPLE_DIARIES
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    print(f"일기 {len(texts)}개 × {args.runs}번, 경로당 {len(texts) * args.runs}번 (모델 {GPT_MODEL})")
+    report = benchmark(texts, runs=args.runs)
+
+    def fmt(value, digits=0):
+        return "      -" if value is None else f"{value:7.{digits}f}"
+
+    print(f"{'path':>10} {'mean_ms':>7} {'p50_ms':>7} {'p95_ms':>7} {'prompt':>7} {'output':>7} {'valid':>6}")
+    for name, row in report.items():
+        print(f"{name:>10} {fmt(row['mean_ms'])} {fmt(row['p50_ms'])} {fmt(row['p95_ms'])} "
+              f"{fmt(row['prompt_tokens'])} {fmt(row['completion_tokens'])} {row['valid_rate']:6.1%}")
+
+    two, one = report["two_calls"], report["combined"]
+    if two["mean_ms"] and one["mean_ms"] and two["prompt_tokens"] and two["completion_tokens"]:
+        print(f"\n한 번 호출: 지연 시간 {one['mean_ms'] / two['mean_ms']:.0%}, "
+              f"입력 토큰 {one['prompt_tokens'] / two['prompt_tokens']:.0%}, "
+              f"출력 토큰 {one['completion_tokens'] / two['completion_tokens']:.0%} (두 번 호출 대비)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,119 @@
+"""
+대화 생성 스트리밍 파서
+
+GPT 가 <BEGIN_JSON> {"dialogue": [{...}, {...}]} <END_JSON> 형식으로 스트리밍하는 응답을
+조각(delta)마다 받아서, 대사 객체 하나가 닫힐 때마다 바로 돌려줌 (전체 응답을 기다리지 않음)
+
+    parser = DialogueStreamParser()
+    for delta in deltas:
+        for line in parser.feed(delta):
+            ...  # {"캐릭터": ..., "감정": ..., "대사": ...}
+    raw = parser.text  # 전체 응답 (기존 openai_dialogue 와 같은 문자열)
+"""
+import json
+from typing import Any, Dict, List
+
+BEGIN_MARKER = "<BEGIN_JSON>"
+END_MARKER = "<END_JSON>"
+
+
+class DialogueStreamParser:
+    """문자 단위 상태 기계 - 문자열/이스케이프 안의 괄호는 무시하고 dialogue 배열의 객체 경계만 추적"""
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._buffer = ""       # 아직 JSON 본문 시작을 못 찾았을 때 쌓아두는 앞부분
+        self._started = False   # <BEGIN_JSON> (또는 첫 '{') 이후인지
+        self._in_array = False  # "dialogue": [ 안인지
+        self._done = False      # 배열이 닫혔거나 <END_JSON> 을 만남
+        self._depth = 0         # 배열 안에서의 중괄호 깊이
+        self._in_string = False
+        self._escape = False
+        self._object: List[str] = []
+        self._key_window = ""   # 배열 시작 전 최근 문자 ("dialogue" 키 탐지용)
+        self.lines: List[Dict[str, Any]] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """새 조각을 넣고 이번에 완성된 대사 목록 반환"""
+        if not delta:
+            return []
+        self._chunks.append(delta)
+        if self._done:
+            return []
+
+        if not self._started:
+            self._buffer += delta
+            start = self._buffer.find(BEGIN_MARKER)
+            if start != -1:
+                delta = self._buffer[start + len(BEGIN_MARKER):]
+            else:
+                # 마커 없이 JSON 만 오는 경우도 허용
+                brace = self._buffer.find("{")
+                if brace == -1:
+                    return []
+                delta = self._buffer[brace:]
+            self._started = True
+            self._buffer = ""
+
+        completed: List[Dict[str, Any]] = []
+        for ch in delta:
+            if self._done:
+                break
+            if not self._in_array:
+                self._scan_for_array(ch)
+                continue
+            line = self._consume(ch)
+            if line is not None:
+                completed.append(line)
+        self.lines.extend(completed)
+        return completed
+
+    def _scan_for_array(self, ch: str) -> None:
+        self._key_window = (self._key_window + ch)[-64:]
+        if END_MARKER in self._key_window:
+            self._done = True
+            return
+        if ch == "[" and '"dialogue"' in self._key_window:
+            self._in_array = True
+            self._key_window = ""
+
+    def _consume(self, ch: str):
+        if self._in_string:
+            self._object.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+            return None
+
+        if self._depth == 0:
+            # 객체 사이 (쉼표/공백) 또는 배열 끝
+            if ch == "{":
+                self._depth = 1
+                self._object = [ch]
+            elif ch == "]" or ch == "<":
+                self._done = True
+            return None
+
+        self._object.append(ch)
+        if ch == '"':
+            self._in_string = True
+        elif ch == "{":
+            self._depth += 1
+        elif ch == "}":
+            self._depth -= 1
+            if self._depth == 0:
+                raw = "".join(self._object)
+                self._object = []
+                try:
+                    parsed = json.loads(raw)
+                except ValueError:
+                    return None
+                return parsed if isinstance(parsed, dict) else None
+        return None
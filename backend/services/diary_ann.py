@@ -0,0 +1,430 @@
+"""
+유사 일기 검색용 근사 최근접 이웃(ANN) 인덱스 - 사용자별 IVF (NumPy)
+
+- 사용자마다 디렉터리 하나: vectors.npy / assign.npy / centroids.npy (memory-map) + meta.json
+- 벡터는 단위 벡터(float32)라서 내적 = 코사인 유사도
+- 일기가 적을 때는 학습 없이 전체 탐색(flat), ANN_TRAIN_MIN 개를 넘으면 구면 k-means 로
+  nlist 개의 클러스터를 만들고, 검색 시 가까운 nprobe 개 클러스터의 벡터만 비교
+- 저장/삭제 시 증분 반영 (삭제는 슬롯을 비워 두었다가 재사용), 크기가 두 배가 되면 재학습
+- 원본은 DB 의 diary_embeddings - 인덱스 파일이 없거나 모델 버전이 다르면 DB 에서 다시 만듦
+- 여러 gunicorn 워커가 같은 파일을 쓰므로 쓰기는 파일 잠금(flock) 안에서, 파일 교체는 os.replace
+
+정확도/속도 비교: python -m services.diary_ann --n 20000 --dim 768
+"""
+import os
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl  # type: ignore
+    _HAS_FCNTL = True
+except ImportError:  # Windows 개발 환경 - 단일 프로세스이므로 잠금 생략
+    fcntl = None  # type: ignore
+    _HAS_FCNTL = False
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ANN_INDEX_DIR = os.environ.get("DIARY_ANN_DIR", os.path.join(BACKEND_DIR, "data", "ann"))
+# 이 개수 이상일 때부터 클러스터 학습 (그 전에는 전체 탐색이 더 빠름)
+ANN_TRAIN_MIN = int(os.environ.get("DIARY_ANN_TRAIN_MIN", "512"))
+# 검색 시 살펴볼 클러스터 수 (n=20000, dim=768 합성 벤치마크에서 recall@10 ≈ 0.96)
+ANN_NPROBE = int(os.environ.get("DIARY_ANN_NPROBE", "48"))
+ANN_MAX_NLIST = 1024
+KMEANS_ITERATIONS = 10
+INITIAL_CAPACITY = 64
+
+_VECTOR_DTYPE = np.float32
+_EMPTY = -1  # assign 값: 비어 있는(삭제된) 슬롯
+
+
+def _user_dir(user_id: int) -> str:
+    return os.path.join(ANN_INDEX_DIR, f"user_{int(user_id)}")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=_VECTOR_DTYPE)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if scores.shape[0] == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= scores.shape[0]:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def _atomic_save_npy(path: str, array: np.ndarray):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS,
+                    seed: int = 0) -> np.ndarray:
+    """구면 k-means (단위 벡터, 내적 기준). vectors: (N, dim) 정규화된 벡터"""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    nlist = max(1, min(nlist, n))
+    centroids = vectors[rng.choice(n, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign_to_centroids(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # 빈 클러스터는 임의의 벡터로 다시 시작
+            sums[empty] = vectors[rng.choice(n, int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    """각 벡터가 속할 클러스터 번호 (메모리를 아끼려고 chunk 단위로 계산)"""
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], chunk):
+        labels[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+    return labels
+
+
+class UserAnnIndex:
+    """한 사용자의 IVF 인덱스 (디렉터리 하나)"""
+
+    def __init__(self, user_id: int, model_name: str, model_version: str, directory: Optional[str] = None):
+        self.user_id = user_id
+        self.model_name = model_name
+        self.model_version = model_version
+        self.directory = directory or _user_dir(user_id)
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self._vectors_path = os.path.join(self.directory, "vectors.npy")
+        self._assign_path = os.path.join(self.directory, "assign.npy")
+        self._centroids_path = os.path.join(self.directory, "centroids.npy")
+        self._lock_path = os.path.join(self.directory, ".lock")
+        # 검색용 스냅샷 캐시 (meta.json 이 바뀌면 다시 읽음)
+        self._snapshot_key: Optional[Tuple[int, int]] = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+
+    # -----------------------------------------
+    # 파일 / 잠금
+    # -----------------------------------------
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._lock_path, "a+") as lock_file:
+            if _HAS_FCNTL:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if _HAS_FCNTL:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("model_name") != self.model_name or meta.get("model_version") != self.model_version:
+            return None
+        return meta
+
+    def _write_meta(self, meta: Dict[str, Any]):
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, self._meta_path)
+        self._snapshot_key, self._snapshot = None, None
+
+    def _new_meta(self, dim: int) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "model_version": self.model_version,
+            "dim": dim,
+            "ids": [],  # 슬롯 번호 → diary_id (비어 있으면 None)
+            "free": [],  # 재사용할 빈 슬롯
+            "nlist": 0,  # 0 이면 학습 전 (전체 탐색)
+            "trained_count": 0,
+        }
+
+    def _open_arrays(self, meta: Dict[str, Any], writable: bool):
+        mode = "r+" if writable else "r"
+        vectors = np.load(self._vectors_path, mmap_mode=mode)
+        assign = np.load(self._assign_path, mmap_mode=mode)
+        centroids = np.load(self._centroids_path) if meta["nlist"] else None
+        return vectors, assign, centroids
+
+    def _ensure_capacity(self, meta: Dict[str, Any], needed: int):
+        """슬롯이 부족하면 두 배로 늘린 파일을 새로 써서 교체 (다른 워커의 memory-map 은 meta.json 이 바뀌면 새 파일로 다시 열림)"""
+        dim = meta["dim"]
+        if os.path.exists(self._vectors_path):
+            vectors = np.load(self._vectors_path, mmap_mode="r")
+            assign = np.load(self._assign_path, mmap_mode="r")
+            capacity = vectors.shape[0]
+        else:
+            vectors = np.empty((0, dim), dtype=_VECTOR_DTYPE)
+            assign = np.empty(0, dtype=np.int32)
+            capacity = 0
+        if needed <= capacity and capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+        new_vectors = np.zeros((new_capacity, dim), dtype=_VECTOR_DTYPE)
+        new_vectors[:capacity] = vectors
+        new_assign = np.full(new_capacity, _EMPTY, dtype=np.int32)
+        new_assign[:capacity] = assign
+        del vectors, assign
+        _atomic_save_npy(self._vectors_path, new_vectors)
+        _atomic_save_npy(self._assign_path, new_assign)
+
+    # -----------------------------------------
+    # 공개 API
+    # -----------------------------------------
+
+    def exists(self) -> bool:
+        return self._read_meta() is not None and os.path.exists(self._vectors_path)
+
+    def ids(self) -> frozenset:
+        """인덱스에 들어 있는 diary_id 집합 (스냅샷과 함께 캐시 - 검색마다 다시 만들지 않음)"""
+        with self._locked(exclusive=False):
+            snapshot = self._load_snapshot()
+        return snapshot["id_set"] if snapshot is not None else frozenset()
+
+    def _remove_files(self):
+        for path in (self._vectors_path, self._assign_path, self._centroids_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def build(self, ids: List[str], vectors: np.ndarray):
+        """전체 다시 만들기 (DB 의 임베딩으로부터)"""
+        vectors = _normalize(vectors)
+        dim = int(vectors.shape[1]) if vectors.ndim == 2 and vectors.shape[0] else 0
+        with self._locked(exclusive=True):
+            meta = self._new_meta(dim)
+            self._remove_files()
+            if dim:
+                self._ensure_capacity(meta, len(ids))
+                stored, assign, _ = self._open_arrays(meta, writable=True)
+                stored[:len(ids)] = vectors
+                assign[:len(ids)] = 0
+                stored.flush()
+                assign.flush()
+                del stored, assign
+                meta["ids"] = list(ids)
+                self._maybe_train(meta)
+            self._write_meta(meta)
+
+    def upsert(self, diary_ids: List[str], vectors: np.ndarray):
+        """일기 추가 (이미 있으면 벡터 교체). 슬롯은 빈 자리부터 재사용"""
+        if not diary_ids:
+            return
+        vectors = _normalize(np.asarray(vectors).reshape(len(diary_ids), -1))
+        dim = int(vectors.shape[1])
+        with self._locked(exclusive=True):
+            meta = self._read_meta()
+            if meta is None or meta["dim"] != dim or not os.path.exists(self._vectors_path):
+                # 처음이거나 모델 차원이 바뀐 경우 - 새로 시작
+                meta = self._new_meta(dim)
+                self._remove_files()
+
+            ids: List[Optional[str]] = meta["ids"]
+            slot_of = {diary_id: slot for slot, diary_id in enumerate(ids) if diary_id is not None}
+            slots = []
+            for diary_id in diary_ids:
+                if diary_id in slot_of:
+                    slot = slot_of[diary_id]
+                elif meta["free"]:
+                    slot = meta["free"].pop()
+                else:
+                    slot = len(ids)
+                    ids.append(None)
+                ids[slot] = diary_id
+                slot_of[diary_id] = slot
+                slots.append(slot)
+            self._ensure_capacity(meta, len(ids))
+
+            stored, assign, centroids = self._open_arrays(meta, writable=True)
+            slots_array = np.asarray(slots, dtype=np.int64)
+            stored[slots_array] = vectors
+            assign[slots_array] = assign_to_centroids(vectors, centroids) if centroids is not None else 0
+            stored.flush()
+            assign.flush()
+            del stored, assign
+
+            self._maybe_train(meta)
+            self._write_meta(meta)
+
+    def remove(self, diary_ids: List[str]) -> int:
+        """일기 삭제 - 슬롯을 비워 두고 다음 추가 때 재사용"""
+        if not diary_ids:
+            return 0
+        with self._locked(exclusive=True):
+            meta = self._read_meta()
+            if not meta or not meta["ids"]:
+                return 0
+            slot_of = {diary_id: slot for slot, diary_id in enumerate(meta["ids"]) if diary_id is not None}
+            slots = [slot_of[diary_id] for diary_id in diary_ids if diary_id in slot_of]
+            if not slots:
+                return 0
+            _, assign, _ = self._open_arrays(meta, writable=True)
+            for slot in slots:
+                assign[slot] = _EMPTY
+                meta["ids"][slot] = None
+                meta["free"].append(slot)
+            assign.flush()
+            del assign
+            self._write_meta(meta)
+            return len(slots)
+
+    def _load_snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        meta + memory-map 을 프로세스 안에 캐시 (다른 워커가 meta.json 을 교체하면 다시 읽음, 공유 잠금 안에서 호출)
+        클러스터별 슬롯 목록(inverted list)과 id 집합도 여기서 한 번만 만들어서 검색 때 O(N) 스캔을 피함
+        """
+        try:
+            st = os.stat(self._meta_path)
+        except OSError:
+            return None
+        key = (st.st_ino, st.st_mtime_ns)
+        if self._snapshot_key != key:
+            meta = self._read_meta()
+            if not meta or not meta["ids"]:
+                self._snapshot_key, self._snapshot = key, None
+            else:
+                vectors, assign, centroids = self._open_arrays(meta, writable=False)
+                assign = np.asarray(assign[:len(meta["ids"])])
+                if centroids is not None:
+                    # 클러스터 번호순으로 정렬한 슬롯 + 클러스터 c 의 구간 [bounds[c], bounds[c + 1])
+                    order = np.argsort(assign, kind="stable")
+                    bounds = np.searchsorted(assign[order], np.arange(centroids.shape[0] + 1))
+                    lists = (order, bounds)
+                else:
+                    lists = None
+                id_set = frozenset(diary_id for diary_id in meta["ids"] if diary_id is not None)
+                self._snapshot_key = key
+                self._snapshot = {
+                    "meta": meta, "vectors": vectors, "assign": assign, "centroids": centroids,
+                    "lists": lists, "id_set": id_set,
+                }
+        return self._snapshot
+
+    def search(self, query: np.ndarray, k: int, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """query 와 가장 비슷한 일기 k개 [(diary_id, 코사인 유사도)]"""
+        query = _normalize(np.asarray(query)[None, :])[0]
+        with self._locked(exclusive=False):
+            snapshot = self._load_snapshot()
+            if snapshot is None or snapshot["meta"]["dim"] != query.shape[0]:
+                return []
+            centroids, vectors = snapshot["centroids"], snapshot["vectors"]
+            if centroids is not None:
+                order, bounds = snapshot["lists"]
+                probe = _top_k(centroids @ query, nprobe or ANN_NPROBE)
+                slots = np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probe])
+                # 가까운 슬롯끼리 읽도록 정렬 (memory-map 순차 접근)
+                slots.sort()
+            else:
+                slots = np.nonzero(snapshot["assign"] != _EMPTY)[0]
+            if slots.shape[0] == 0:
+                return []
+            # memory-map 에서 필요한 행만 읽어서 비교
+            scores = np.asarray(vectors[slots]) @ query
+            top = _top_k(scores, k)
+            ids = snapshot["meta"]["ids"]
+            return [(ids[int(slots[i])], float(scores[i])) for i in top]
+
+    def _maybe_train(self, meta: Dict[str, Any]):
+        """살아 있는 벡터 수가 ANN_TRAIN_MIN 이상이고 마지막 학습 때의 두 배가 되면 클러스터 재학습 (잠금 안에서 호출)"""
+        live = len(meta["ids"]) - len(meta["free"])
+        if live < ANN_TRAIN_MIN or (meta["nlist"] and live < 2 * meta["trained_count"]):
+            return
+        vectors = np.load(self._vectors_path, mmap_mode="r+")
+        assign = np.load(self._assign_path, mmap_mode="r+")
+        size = len(meta["ids"])
+        live_slots = np.nonzero(np.asarray(assign[:size]) != _EMPTY)[0]
+        live_vectors = np.asarray(vectors[live_slots])
+        nlist = min(ANN_MAX_NLIST, max(1, int(np.sqrt(live))))
+        centroids = train_centroids(live_vectors, nlist)
+        assign[live_slots] = assign_to_centroids(live_vectors, centroids)
+        assign.flush()
+        del vectors, assign
+        _atomic_save_npy(self._centroids_path, centroids)
+        meta["nlist"] = int(centroids.shape[0])
+        meta["trained_count"] = int(live)
+        print(f"[ANN] user {self.user_id}: {live}개 벡터로 {meta['nlist']}개 클러스터 학습")
+
+
+_indexes: Dict[Tuple[int, str, str], UserAnnIndex] = {}
+
+
+def get_user_index(user_id: int, model_name: str, model_version: str) -> UserAnnIndex:
+    """사용자별 인덱스 객체 (프로세스 안에서 재사용 → 검색 스냅샷 캐시 유지)"""
+    key = (int(user_id), model_name, model_version)
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = UserAnnIndex(user_id, model_name, model_version)
+    return index
+
+
+# =========================================
+# 정확도 / 속도 벤치마크 (전체 탐색 대비)
+# =========================================
+
+def benchmark(n: int = 20000, dim: int = 768, queries: int = 200, k: int = 10,
+              nprobes: Tuple[int, ...] = (1, 2, 4, 8, 16, 32), seed: int = 0,
+              directory: Optional[str] = None) -> List[Dict[str, float]]:
+    """
+    합성 데이터(클러스터 구조가 있는 단위 벡터)로 IVF 검색의 recall@k 와 지연 시간을 전체 탐색과 비교
+    반환: nprobe 별 {"nprobe", "recall", "latency_ms", "exact_latency_ms"}
+    """
+    import tempfile
+
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.normal(size=(max(1, n // 200), dim)))
+    noise = rng.normal(size=(n, dim)) / np.sqrt(dim)  # 벡터당 노름 ≈ 1
+    data = _normalize(centers[rng.integers(0, centers.shape[0], n)] + 3.0 * noise)
+    query_noise = rng.normal(size=(queries, dim)) / np.sqrt(dim)
+    query_vectors = _normalize(data[rng.choice(n, queries, replace=False)] + 1.0 * query_noise)
+    ids = [str(i) for i in range(n)]
+
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        index = UserAnnIndex(0, "benchmark", "1", directory=tmp)
+        started = time.perf_counter()
+        index.build(ids, data)
+        print(f"[ANN 벤치마크] n={n}, dim={dim}, 인덱스 생성 {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        exact = [set(np.argpartition(-(data @ q), k)[:k].tolist()) for q in query_vectors]
+        exact_ms = (time.perf_counter() - started) * 1000 / queries
+
+        results = []
+        for nprobe in nprobes:
+            started = time.perf_counter()
+            found = [index.search(q, k, nprobe=nprobe) for q in query_vectors]
+            latency_ms = (time.perf_counter() - started) * 1000 / queries
+            recall = float(np.mean([
+                len(truth & {int(diary_id) for diary_id, _ in hits}) / k for truth, hits in zip(exact, found)
+            ]))
+            results.append({"nprobe": nprobe, "recall": recall, "latency_ms": latency_ms, "exact_latency_ms": exact_ms})
+            print(f"  nprobe={nprobe:>3}  recall@{k}={recall:.3f}  {latency_ms:.2f}ms/query  (전체 탐색 {exact_ms:.2f}ms)")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="사용자별 IVF 인덱스 recall / latency 벤치마크")
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    benchmark(n=args.n, dim=args.dim, queries=args.queries, k=args.k)
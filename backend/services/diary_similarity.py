@@ -5,10 +5,13 @@ Sentence Transformer 모델을 사용하여 일기 간 텍스트 유사도를 
 """
 import os
 import json
+import hashlib
 from typing import List, Dict, Tuple, Optional, Any, TYPE_CHECKING
 import numpy as np
 from datetime import datetime
 
+from services import model_client, model_registry, inference_cache
+
 try:
     from sentence_transformers import SentenceTransformer
     _HAS_SENTENCE_TRANSFORMER = True
@@ -24,11 +27,40 @@ if TYPE_CHECKING:
 BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 # 한국어 문장 임베딩 모델 (jhgan/ko-sbert-sts 사용)
 MODEL_NAME = "jhgan/ko-sbert-sts"
+# 7개 감정 키 (감정 벡터 차원 순서)
+EMOTION_KEYS = ["기쁨", "사랑", "놀람", "두려움", "분노", "부끄러움", "슬픔"]
+# 저장된 임베딩의 버전 (모델 가중치나 전처리가 바뀌면 올려서 전체 재계산)
+MODEL_VERSION = os.environ.get("SIMILARITY_MODEL_VERSION", "1")
+# 저장 형식: float32 little-endian
+EMBEDDING_DTYPE = np.dtype("<f4")
+EMBEDDING_BATCH_SIZE = 32
+# 후보 일기가 이 개수 이상이면 사용자별 ANN 인덱스(services/diary_ann.py)로 텍스트 유사도 검색
+# 기본은 꺼 둠: 합성 벤치마크(python -m services.diary_ann)에서 recall 0.95 이상을 내는 nprobe 로는
+# 2만 개 안팎까지 전체 탐색보다 빠르지 않음 - 켤 때도 그 이상에서만 사용
+ANN_ENABLED = os.environ.get("DIARY_ANN_ENABLED", "false").lower() in ("1", "true", "yes")
+ANN_MIN_DIARIES = int(os.environ.get("DIARY_ANN_MIN_DIARIES", "20000"))
 
 _model: Optional[Any] = None
 
 
 def load_model() -> bool:
+    """
+    임베딩을 계산할 수 있는지 확인
+    공유 모델 서버(services/model_server.py)를 쓸 수 있으면 이 프로세스에는 모델을 올리지 않음
+    """
+    if model_client.available():
+        return True
+    return _load_local_model()
+
+
+def _load_local_model() -> bool:
+    """이 프로세스에 모델 로드 - 프로세스당 한 번만, 동시 호출은 잠금에서 대기 (services/model_registry.py)"""
+    if _model is not None:
+        return True
+    return model_registry.ensure_loaded("sentence_embedding")
+
+
+def _load_sentence_model() -> bool:
     """Sentence Transformer 모델 로드"""
     global _model
     
@@ -51,6 +83,41 @@ def load_model() -> bool:
         return False
 
 
+model_registry.register(
+    "sentence_embedding",
+    _load_sentence_model,
+    warmup=lambda: _model.encode(["오늘은 친구를 만나서 즐거웠다."], convert_to_numpy=True),
+    remote=model_client.available,
+)
+
+
+def encode_texts(texts: List[str]) -> Optional[np.ndarray]:
+    """
+    텍스트 목록 → 임베딩 행렬 (len(texts), dim)
+    캐시(services/inference_cache.py)에 없는 텍스트만 계산 - 공유 모델 서버를 먼저 쓰고,
+    서버가 없거나 실패하면 이 프로세스에서 모델을 로드해서 계산
+    """
+    model_version = f"{MODEL_NAME}@{MODEL_VERSION}"
+    keys = [inference_cache.text_key(text, model_version) for text in texts]
+    vectors: List[Optional[np.ndarray]] = [_embedding_cache.get(key) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    
+    if missing:
+        encoded = model_client.embed([texts[i] for i in missing])
+        if encoded is None:
+            if not _load_local_model():
+                return None
+            # sentence transformer는 토큰화 불필요, 직접 텍스트 입력
+            encoded = _model.encode([texts[i] for i in missing], batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True)
+        for i, vector in zip(missing, encoded):
+            vectors[i] = np.asarray(vector, dtype=EMBEDDING_DTYPE)
+            _embedding_cache.put(keys[i], vectors[i])
+    
+    if not vectors:
+        return np.zeros((0, 0), dtype=EMBEDDING_DTYPE)
+    return np.stack(vectors)
+
+
 def get_diary_vector(diary_text: str) -> Optional[np.ndarray]:
     """일기 텍스트를 벡터로 변환 (Sentence Transformer 사용)"""
     if not load_model():
@@ -60,14 +127,237 @@ def get_diary_vector(diary_text: str) -> Optional[np.ndarray]:
         return None
     
     try:
-        # sentence transformer는 토큰화 불필요, 직접 텍스트 입력
-        vector = _model.encode(diary_text, convert_to_numpy=True)
-        return vector
+        vectors = encode_texts([diary_text])
+        return None if vectors is None else vectors[0]
     except Exception as e:
         print(f"⚠️ 벡터 변환 실패: {e}")
         return None
 
 
+# =========================================
+# 임베딩 저장소 (diary_embeddings 테이블)
+# =========================================
+
+def content_hash(text: str) -> str:
+    """일기 본문 해시 - 저장된 임베딩이 현재 내용으로 계산된 것인지 확인용"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def vector_to_bytes(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def bytes_to_vector(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE)
+
+
+# 같은 텍스트는 다시 임베딩하지 않도록 결과 캐시 (키: 정규화 텍스트 해시 + 모델 버전)
+_embedding_cache = inference_cache.get_cache(
+    "embedding",
+    encode=vector_to_bytes,
+    decode=lambda data: bytes_to_vector(data).copy(),
+)
+
+
+def _store_embedding(diary_id: str, user_id: int, text_hash: str, vector: np.ndarray) -> bool:
+    from db import save_diary_embedding
+    # 코사인 유사도만 쓰므로 단위 벡터로 정규화해서 저장
+    vector = normalize_rows(np.asarray(vector, dtype=EMBEDDING_DTYPE)[None, :])[0]
+    saved = save_diary_embedding(
+        diary_id, user_id, MODEL_NAME, MODEL_VERSION, text_hash, int(vector.shape[0]), vector_to_bytes(vector)
+    )
+    if saved and ANN_ENABLED:
+        # 이미 인덱스가 있는 사용자만 증분 반영 (없으면 검색 시 필요할 때 만들어짐)
+        try:
+            index = _ann_index(user_id)
+            if index.exists():
+                index.upsert([diary_id], vector[None, :])
+        except Exception as e:
+            print(f"⚠️ ANN 인덱스 갱신 실패 (diary_id={diary_id}): {e}")
+    return saved
+
+
+def _ann_index(user_id: int):
+    from services.diary_ann import get_user_index
+    return get_user_index(user_id, MODEL_NAME, MODEL_VERSION)
+
+
+def forget_diary_embeddings(user_id: int, diary_ids: List[str]) -> None:
+    """삭제된 일기를 ANN 인덱스에서 제거 (DB 임베딩은 ON DELETE CASCADE 로 함께 삭제됨)"""
+    if not ANN_ENABLED or not diary_ids:
+        return
+    try:
+        _ann_index(user_id).remove(list(diary_ids))
+    except Exception as e:
+        print(f"⚠️ ANN 인덱스에서 일기 제거 실패: {e}")
+
+
+def _attach_contents(diaries: List[Dict[str, Any]], user_id: int) -> None:
+    """본문 없이 읽어 온 일기(fields="search")에 본문을 채움 - 필요한 일기만 id 로 조회"""
+    from db import get_diary_contents
+    pending = [diary for diary in diaries if "content" not in diary]
+    if not pending:
+        return
+    contents = get_diary_contents(user_id, [diary["id"] for diary in pending])
+    for diary in pending:
+        diary["content"] = contents.get(diary["id"], "")
+
+
+def _search_text_with_ann(user_id: int, target_vector: np.ndarray,
+                          diaries: List[Dict[str, Any]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ANN 인덱스로 텍스트 유사도 상위 k개 (diaries 기준 위치, 유사도)
+    diaries 는 본문 없이 id 만 있어도 됨. 인덱스에 빠진 일기(처음 검색, 예전 일기)는
+    저장된 임베딩으로 채우고, 임베딩도 없는 일기만 본문을 읽어서 계산
+    """
+    from db import get_diary_embeddings
+    index = _ann_index(user_id)
+    indexed = index.ids()
+    missing = [diary for diary in diaries if diary["id"] not in indexed]
+    if missing:
+        stored = get_diary_embeddings(user_id, MODEL_NAME, MODEL_VERSION, [diary["id"] for diary in missing])
+        vectors = {diary_id: bytes_to_vector(row["vector"]) for diary_id, row in stored.items()}
+        unembedded = [diary for diary in missing if diary["id"] not in vectors]
+        if unembedded:
+            _attach_contents(unembedded, user_id)
+            vectors.update(load_diary_embeddings(unembedded, user_id))
+        if vectors:
+            index.upsert(list(vectors.keys()), np.stack(list(vectors.values())))
+            indexed = index.ids()
+        print(f"[ANN] 인덱스에 {len(vectors)}개 추가")
+        covered = len(diaries) - len(missing) + len(vectors)
+    else:
+        covered = len(diaries)
+    
+    position = {diary["id"]: i for i, diary in enumerate(diaries)}
+    # 후보가 아닌 일기(기준 일기, 같은 날짜 일기 등)가 상위를 차지해도 k개가 남도록 그만큼 더 가져옴
+    extra = max(0, len(indexed) - covered)
+    hits = [(position[diary_id], score) for diary_id, score in index.search(target_vector, k + extra)
+            if diary_id in position]
+    return (np.array([i for i, _ in hits], dtype=np.int64),
+            np.array([score for _, score in hits], dtype=np.float32))
+
+
+def update_diary_embedding(diary_id: Optional[str], content: Optional[str], user_id: int) -> bool:
+    """
+    일기 저장/수정 시 호출 - 내용이 바뀐 경우에만 임베딩을 다시 계산해서 저장
+    모델이 없거나 실패해도 예외를 올리지 않음 (검색 시 다시 계산됨)
+    """
+    if not diary_id or not content or not content.strip():
+        return False
+    if not load_model():
+        return False
+    
+    try:
+        from db import get_diary_embeddings
+        text_hash = content_hash(content)
+        stored = get_diary_embeddings(user_id, MODEL_NAME, MODEL_VERSION, [diary_id]).get(diary_id)
+        if stored and stored["content_hash"] == text_hash:
+            return True
+        
+        vector = get_diary_vector(content)
+        if vector is None:
+            return False
+        return _store_embedding(diary_id, user_id, text_hash, vector)
+    except Exception as e:
+        print(f"⚠️ 일기 임베딩 저장 실패 (diary_id={diary_id}): {e}")
+        return False
+
+
+def load_diary_embeddings(diaries: List[Dict[str, Any]], user_id: int) -> Dict[str, np.ndarray]:
+    """
+    일기 목록의 임베딩을 저장소에서 한 번에 읽어옴 {diary_id: vector}
+    저장된 적이 없거나 내용이 바뀐 일기만 모아서 배치로 계산 후 저장 (기존 일기 백필)
+    """
+    from db import get_diary_embeddings
+    
+    stored = get_diary_embeddings(user_id, MODEL_NAME, MODEL_VERSION, [diary["id"] for diary in diaries])
+    vectors: Dict[str, np.ndarray] = {}
+    missing: List[Tuple[Dict[str, Any], str]] = []
+    
+    for diary in diaries:
+        content = diary.get("content") or ""
+        if not content.strip():
+            continue
+        text_hash = content_hash(content)
+        row = stored.get(diary["id"])
+        if row and row["content_hash"] == text_hash:
+            vectors[diary["id"]] = bytes_to_vector(row["vector"])
+        else:
+            missing.append((diary, text_hash))
+    
+    reused = len(vectors)
+    if missing and load_model():
+        try:
+            encoded = encode_texts([diary["content"] for diary, _ in missing])
+            if encoded is None:
+                raise RuntimeError("임베딩 모델을 사용할 수 없습니다.")
+            for (diary, text_hash), vector in zip(missing, encoded):
+                vector = np.asarray(vector, dtype=EMBEDDING_DTYPE)
+                vectors[diary["id"]] = vector
+                _store_embedding(diary["id"], diary.get("user_id", user_id), text_hash, vector)
+        except Exception as e:
+            print(f"⚠️ 임베딩 배치 계산 실패: {e}")
+    
+    print(f"[임베딩] 저장소에서 {reused}개 재사용, 새로 계산 {len(vectors) - reused}개")
+    return vectors
+
+
+# =========================================
+# 벡터화된 유사도 계산 (행렬곱 한 번 + argpartition)
+# =========================================
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """행 단위 L2 정규화 (영벡터는 그대로 0 → 유사도 0)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _to_score(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def emotion_vector(emotion_scores: Optional[Dict[str, Any]]) -> np.ndarray:
+    """감정 점수 dict → 7차원 벡터 (EMOTION_KEYS 순서, 숫자가 아닌 값은 0)"""
+    emotion_scores = emotion_scores or {}
+    return np.array([_to_score(emotion_scores.get(key, 0)) for key in EMOTION_KEYS], dtype=np.float32)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """점수가 높은 순서로 상위 k개 인덱스 (전체 정렬 없이 argpartition 사용)"""
+    n = scores.shape[0]
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def score_text_similarity(target_vector: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """기준 벡터와 (N, dim) 임베딩 행렬의 코사인 유사도 (N,)"""
+    if matrix.shape[0] == 0:
+        return np.empty(0, dtype=np.float32)
+    return normalize_rows(matrix) @ normalize_rows(target_vector[None, :])[0]
+
+
+def score_emotion_similarity(target_scores: Optional[Dict[str, Any]],
+                             emotion_matrix: np.ndarray, has_scores: np.ndarray) -> np.ndarray:
+    """
+    기준 감정 점수와 (N, 7) 감정 행렬의 코사인 유사도 (N,)
+    calculate_emotion_similarity 와 같은 규칙: 어느 한쪽이라도 감정 점수가 없으면 0.5
+    """
+    n = emotion_matrix.shape[0]
+    if not target_scores:
+        return np.full(n, 0.5, dtype=np.float32)
+    scores = normalize_rows(emotion_matrix) @ normalize_rows(emotion_vector(target_scores)[None, :])[0]
+    return np.where(has_scores, scores, np.float32(0.5)).astype(np.float32)
+
+
 def cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
     """코사인 유사도 계산"""
     dot_product = np.dot(vec1, vec2)
@@ -88,12 +378,9 @@ def calculate_emotion_similarity(emotion_scores1: Dict[str, Any], emotion_scores
     if not emotion_scores1 or not emotion_scores2:
         return 0.5  # 감정 점수가 없으면 중간값 반환
     
-    # 7개 감정 키
-    emotion_keys = ["기쁨", "사랑", "놀람", "두려움", "분노", "부끄러움", "슬픔"]
-    
     # 감정 벡터 생성
-    vec1 = np.array([float(emotion_scores1.get(key, 0)) for key in emotion_keys])
-    vec2 = np.array([float(emotion_scores2.get(key, 0)) for key in emotion_keys])
+    vec1 = emotion_vector(emotion_scores1)
+    vec2 = emotion_vector(emotion_scores2)
     
     # 정규화 (0~100 -> 0~1)
     if np.sum(vec1) > 0:
@@ -105,16 +392,44 @@ def calculate_emotion_similarity(emotion_scores1: Dict[str, Any], emotion_scores
     return cosine_similarity(vec1, vec2)
 
 
+def _parse_emotion_scores(emotion_scores_raw: Any) -> Dict[str, Any]:
+    """일기의 emotion_scores (dict 또는 JSON 문자열) → dict"""
+    try:
+        if isinstance(emotion_scores_raw, dict):
+            return emotion_scores_raw
+        if emotion_scores_raw:
+            return json.loads(emotion_scores_raw)
+    except Exception:
+        pass
+    return {}
+
+
+def _similar_item(diary: Dict[str, Any], similarity: float, emotion_scores: Dict[str, Any]) -> Dict[str, Any]:
+    content = diary.get("content", "")
+    return {
+        "id": diary.get("id"),
+        "date": diary.get("date", ""),
+        "title": diary.get("title", ""),
+        "content": content[:200] + "..." if len(content) > 200 else content,
+        "similarity": similarity,
+        "emotion_scores": emotion_scores
+    }
+
+
 def find_similar_diaries_separated(
     target_diary_id: Optional[str] = None,
     target_diary_text: Optional[str] = None,
     user_id: Optional[int] = None,
     min_text_similarity: float = 0.3,
     min_emotion_similarity: float = 0.3,
-    exclude_date: Optional[str] = None
+    exclude_date: Optional[str] = None,
+    text_top_k: int = 1,
+    emotion_top_k: int = 1,
+    hybrid_weight: Optional[float] = None,
+    hybrid_top_k: Optional[int] = None,
 ) -> Optional[Dict[str, Any]]:
     """
-    유사한 일기 찾기 - 텍스트 유사도와 감정 유사도를 분리해서 각각 1개씩 반환
+    유사한 일기 찾기 - 텍스트 유사도와 감정 유사도를 분리해서 각각 반환
     
     Args:
         target_diary_id: 기준 일기 ID (데이터베이스에서 조회)
@@ -123,12 +438,20 @@ def find_similar_diaries_separated(
         min_text_similarity: 최소 텍스트 유사도 임계값
         min_emotion_similarity: 최소 감정 유사도 임계값
         exclude_date: 제외할 날짜 (현재 일기와 같은 날짜 제외 등)
+        text_top_k: 텍스트 유사도 상위 몇 개를 반환할지
+        emotion_top_k: 감정 유사도 상위 몇 개를 반환할지
+        hybrid_weight: 주어지면 text * w + emotion * (1 - w) 가중 합산 순위도 반환 (0~1)
+        hybrid_top_k: 가중 합산 순위 개수 (기본: text_top_k)
     
     Returns:
         {
             "text_similar": {...},  # 텍스트가 가장 유사한 일기 1개
-            "emotion_similar": {...}  # 감정이 가장 유사한 일기 1개
+            "emotion_similar": {...},  # 감정이 가장 유사한 일기 1개
+            "text_similar_list": [...],  # 텍스트 유사도 상위 text_top_k개
+            "emotion_similar_list": [...],  # 감정 유사도 상위 emotion_top_k개
+            "hybrid_similar_list": [...]  # hybrid_weight 가 있을 때만
         }
+        임계값 이상인 일기가 없으면 전체 중 최상위 1개를 반환
         모델이 없으면 None 반환
     """
     if not load_model():
@@ -165,11 +488,16 @@ def find_similar_diaries_separated(
                     "emotion_scores": emotion_scores,
                     "user_id": target_diary.get("user_id")
                 }
-                target_vector = get_diary_vector(target_diary["content"])
-                
                 # user_id가 전달되지 않았으면 일기의 user_id 사용
                 if user_id is None and target_diary.get("user_id"):
                     user_id = target_diary["user_id"]
+                
+                # 저장된 임베딩이 있으면 재사용 (없으면 계산 후 저장)
+                owner_id = target_diary.get("user_id") if target_diary.get("user_id") is not None else user_id
+                if owner_id is not None:
+                    target_vector = load_diary_embeddings([target_diary], owner_id).get(target_diary["id"])
+                else:
+                    target_vector = get_diary_vector(target_diary["content"])
         except Exception as e:
             print(f"⚠️ 일기 조회 실패: {e}")
             import traceback
@@ -188,8 +516,10 @@ def find_similar_diaries_separated(
         return None
     
     # 모든 일기 가져오기 (해당 사용자의 일기만)
+    # ANN 을 쓸 수 있으면 본문 없이 id/날짜/감정 점수만 읽고, 본문은 결과로 나갈 일기만 나중에 읽음
+    ann_candidate = ANN_ENABLED and hybrid_weight is None
     try:
-        all_diaries = get_all_diaries(user_id=user_id)
+        all_diaries = get_all_diaries(user_id=user_id, fields="search" if ann_candidate else "full")
         
         # 필터링: 내용이 있는 일기만, 현재 일기 제외, 특정 날짜 제외
         filtered_diaries = []
@@ -199,7 +529,10 @@ def find_similar_diaries_separated(
                 continue
             
             # 내용이 없는 일기 제외
-            if not diary.get("content") or diary["content"].strip() == "":
+            if "has_content" in diary:
+                if not diary.pop("has_content"):
+                    continue
+            elif not diary.get("content") or diary["content"].strip() == "":
                 continue
             
             # 특정 날짜 제외
@@ -218,95 +551,81 @@ def find_similar_diaries_separated(
         traceback.print_exc()
         return None
     
-    # 각 일기와의 유사도 계산
-    text_similarities = []
-    emotion_similarities = []
     target_emotion_scores = target_diary.get("emotion_scores", {}) if target_diary else {}
     
     print(f"[유사일기검색] 필터링된 일기 개수: {len(filtered_diaries)}")
     print(f"[유사일기검색] 최소 텍스트 유사도: {min_text_similarity}, 최소 감정 유사도: {min_emotion_similarity}")
     
-    for diary in filtered_diaries:
-        diary_id = diary.get("id")
-        diary_content = diary.get("content", "")
-        
-        # 벡터 계산
-        diary_vector = get_diary_vector(diary_content)
-        if diary_vector is None:
-            continue
-        
-        # 텍스트 유사도 계산
-        text_sim = cosine_similarity(target_vector, diary_vector)
-        
-        # 감정 점수 가져오기
-        diary_emotion_scores = {}
+    target_vector = np.asarray(target_vector, dtype=np.float32)
+    candidate_scores = [_parse_emotion_scores(diary.get("emotion_scores")) for diary in filtered_diaries]
+    
+    # 감정 유사도: (N, 7) 감정 행렬과 행렬곱 한 번
+    if filtered_diaries:
+        emotion_matrix = np.stack([emotion_vector(scores) for scores in candidate_scores])
+    else:
+        emotion_matrix = np.empty((0, len(EMOTION_KEYS)), dtype=np.float32)
+    has_scores = np.array([bool(scores) for scores in candidate_scores], dtype=bool)
+    emotion_scores = score_emotion_similarity(target_emotion_scores, emotion_matrix, has_scores)
+    
+    # 텍스트 유사도: 일기가 많으면 ANN 인덱스에서 상위 후보만,
+    # 아니면 저장된 임베딩을 (N, dim) 행렬로 쌓아서 행렬곱 한 번 (가중 합산은 전체 점수가 필요하므로 항상 이쪽)
+    text_positions = None
+    if ann_candidate and len(filtered_diaries) >= ANN_MIN_DIARIES:
         try:
-            emotion_scores_raw = diary.get("emotion_scores")
-            if emotion_scores_raw:
-                if isinstance(emotion_scores_raw, dict):
-                    diary_emotion_scores = emotion_scores_raw
-                else:
-                    diary_emotion_scores = json.loads(emotion_scores_raw)
-        except Exception:
-            pass
-        
-        # 감정 유사도 계산
-        emotion_sim = calculate_emotion_similarity(target_emotion_scores, diary_emotion_scores)
-        
-        # 모든 유사도 저장 (임계값과 관계없이)
-        text_similarities.append({
-            "id": diary_id,
-            "date": diary.get("date", ""),
-            "title": diary.get("title", ""),
-            "content": diary_content[:200] + "..." if len(diary_content) > 200 else diary_content,
-            "similarity": float(text_sim),
-            "emotion_scores": diary_emotion_scores
-        })
-        
-        emotion_similarities.append({
-            "id": diary_id,
-            "date": diary.get("date", ""),
-            "title": diary.get("title", ""),
-            "content": diary_content[:200] + "..." if len(diary_content) > 200 else diary_content,
-            "similarity": float(emotion_sim),
-            "emotion_scores": diary_emotion_scores
-        })
-    
-    # 텍스트 유사도 순으로 정렬
-    text_similarities.sort(key=lambda x: x["similarity"], reverse=True)
-    # 감정 유사도 순으로 정렬
-    emotion_similarities.sort(key=lambda x: x["similarity"], reverse=True)
-    
-    print(f"[유사일기검색] 텍스트 유사도 후보: {len(text_similarities)}개")
-    print(f"[유사일기검색] 감정 유사도 후보: {len(emotion_similarities)}개")
-    
-    # 임계값을 만족하는 것 중 최상위 1개 선택, 없으면 전체 중 최상위 1개 선택
-    text_result = None
-    emotion_result = None
-    
-    # 텍스트 유사도: 임계값 이상인 것 중 최상위, 없으면 전체 중 최상위
-    for item in text_similarities:
-        if item["similarity"] >= min_text_similarity:
-            text_result = item
-            break
-    if text_result is None and text_similarities:
-        text_result = text_similarities[0]
-        print(f"[유사일기검색] 텍스트 유사도 임계값 미만이지만 최상위 결과 반환: {text_result['similarity']:.3f}")
-    
-    # 감정 유사도: 임계값 이상인 것 중 최상위, 없으면 전체 중 최상위
-    for item in emotion_similarities:
-        if item["similarity"] >= min_emotion_similarity:
-            emotion_result = item
-            break
-    if emotion_result is None and emotion_similarities:
-        emotion_result = emotion_similarities[0]
-        print(f"[유사일기검색] 감정 유사도 임계값 미만이지만 최상위 결과 반환: {emotion_result['similarity']:.3f}")
+            text_positions, text_scores = _search_text_with_ann(user_id, target_vector, filtered_diaries, max(1, text_top_k))
+            print(f"[유사일기검색] ANN 인덱스 사용 (후보 {len(filtered_diaries)}개)")
+        except Exception as e:
+            print(f"⚠️ ANN 검색 실패 - 전체 비교로 대체: {e}")
+            text_positions = None
+    if text_positions is None:
+        # 전체 비교는 본문 해시로 임베딩을 확인하므로 본문이 필요 (ANN 기준 미만이거나 ANN 실패)
+        _attach_contents(filtered_diaries, user_id)
+        # 저장된 임베딩 일괄 조회 (일기마다 모델을 돌리지 않음)
+        diary_vectors = load_diary_embeddings(filtered_diaries, user_id)
+        text_positions = np.array(
+            [i for i, diary in enumerate(filtered_diaries) if diary.get("id") in diary_vectors], dtype=np.int64
+        )
+        if text_positions.shape[0]:
+            text_matrix = np.stack([diary_vectors[filtered_diaries[i]["id"]] for i in text_positions])
+        else:
+            text_matrix = np.empty((0, target_vector.shape[-1]), dtype=np.float32)
+        text_scores = score_text_similarity(target_vector, text_matrix)
+    
+    print(f"[유사일기검색] 유사도 후보: 텍스트 {len(text_positions)}개, 감정 {len(filtered_diaries)}개")
+    
+    def build(positions: np.ndarray, scores: np.ndarray, k: int,
+              min_similarity: Optional[float], label: str) -> List[Dict[str, Any]]:
+        # 임계값 이상인 것 중 상위 k개, 없으면 전체 중 최상위 1개
+        order = top_k_indices(scores, max(1, k))
+        # 본문 없이 읽어 온 경우 결과로 나갈 일기만 본문 조회
+        _attach_contents([filtered_diaries[positions[i]] for i in order], user_id)
+        items = [
+            _similar_item(filtered_diaries[positions[i]], float(scores[i]), candidate_scores[positions[i]])
+            for i in order
+            if min_similarity is None or scores[i] >= min_similarity
+        ]
+        if not items and len(order):
+            top = order[0]
+            items = [_similar_item(filtered_diaries[positions[top]], float(scores[top]), candidate_scores[positions[top]])]
+            print(f"[유사일기검색] {label} 유사도 임계값 미만이지만 최상위 결과 반환: {items[0]['similarity']:.3f}")
+        return items
+    
+    all_positions = np.arange(len(filtered_diaries), dtype=np.int64)
+    text_list = build(text_positions, text_scores, text_top_k, min_text_similarity, "텍스트")
+    emotion_list = build(all_positions, emotion_scores, emotion_top_k, min_emotion_similarity, "감정")
     
     result = {
-        "text_similar": text_result,
-        "emotion_similar": emotion_result
+        "text_similar": text_list[0] if text_list else None,
+        "emotion_similar": emotion_list[0] if emotion_list else None,
+        "text_similar_list": text_list,
+        "emotion_similar_list": emotion_list,
     }
     
+    if hybrid_weight is not None:
+        weight = min(max(float(hybrid_weight), 0.0), 1.0)
+        hybrid_scores = weight * text_scores + (1.0 - weight) * emotion_scores[text_positions]
+        result["hybrid_similar_list"] = build(text_positions, hybrid_scores, hybrid_top_k or text_top_k, None, "가중 합산")
+    
     return result
 
 
@@ -0,0 +1,272 @@
+"""
+감정 분석 cascade - 로컬 감정 모델을 먼저 쓰고, 확신이 없을 때만 GPT 로 escalate
+
+- emotion_ml 결과(ml_batcher)의 1위 확률 ≥ EMOTION_CASCADE_MIN_PROB 이고
+  1위-2위 확률 차이 ≥ EMOTION_CASCADE_MIN_MARGIN 이면 GPT 를 부르지 않고 바로 반환
+- 아니면 analyze_emotions_with_gpt 로 escalate (휴리스틱 결과는 확률이 보정되지 않았으므로 항상 escalate)
+- escalate 된 요청은 ML 1위 감정과 GPT 1위 감정이 같은지 확률 구간별로 기록 → GET /health/gpt 의 "cascade"
+
+EMOTION_CASCADE_ENABLED=true 이면 /analyze 도 cascade 사용 (/analyze2 는 mode=cascade)
+
+라벨된 데이터로 임계값별 escalate 비율 / 정확도 비교 (JSONL, 한 줄에 {"text": ..., "label": "기쁨"}):
+    python -m services.emotion_cascade labeled.jsonl [--with-gpt] [--target-accuracy 0.85]
+"""
+import os
+import sys
+import json
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.common import ml_predict, EMOTION_KEYS
+from services.emotion_gpt import analyze_emotions_with_gpt, analyze_emotions_with_gpt_async, ml_to_emotion_result
+
+CASCADE_ENABLED = os.environ.get("EMOTION_CASCADE_ENABLED", "false").lower() in ("1", "true", "yes")
+MIN_PROB = float(os.environ.get("EMOTION_CASCADE_MIN_PROB", "0.7"))
+MIN_MARGIN = float(os.environ.get("EMOTION_CASCADE_MIN_MARGIN", "0.2"))
+
+# 확률 구간 (0.1 단위) 별 escalate / 일치 통계
+_BUCKETS = [f"{i / 10:.1f}-{(i + 1) / 10:.1f}" for i in range(10)]
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "requests": 0,
+    "accepted": 0,
+    "escalated": 0,
+    "escalated_heuristic": 0,
+    "compared": 0,
+    "agreed": 0,
+    "buckets": {bucket: {"accepted": 0, "escalated": 0, "compared": 0, "agreed": 0} for bucket in _BUCKETS},
+}
+
+
+def _bucket(prob: float) -> str:
+    return _BUCKETS[min(9, max(0, int(prob * 10)))]
+
+
+def confidence(ml_out: Dict[str, Any]) -> Tuple[Optional[str], float, float]:
+    """(1위 감정, 1위 확률, 1위-2위 확률 차이)"""
+    scores = ml_out.get("scores") or {}
+    ranked = sorted(((scores.get(emo, 0.0), emo) for emo in EMOTION_KEYS), reverse=True)
+    if not ranked or ranked[0][0] <= 0:
+        return None, 0.0, 0.0
+    top_prob, top_label = ranked[0]
+    second = ranked[1][0] if len(ranked) > 1 else 0.0
+    return top_label, float(top_prob), float(top_prob - second)
+
+
+def should_accept(ml_out: Dict[str, Any], min_prob: float = None, min_margin: float = None) -> bool:
+    """ML 결과를 그대로 써도 되는지 (Transformers 결과이고 확률 / 차이가 임계값 이상)"""
+    if ml_out.get("model_type") != "transformers":
+        return False
+    _, prob, margin = confidence(ml_out)
+    return prob >= (MIN_PROB if min_prob is None else min_prob) and margin >= (MIN_MARGIN if min_margin is None else min_margin)
+
+
+def _record(ml_out: Dict[str, Any], accepted: bool, gpt_label: Optional[str] = None) -> None:
+    label, prob, _ = confidence(ml_out)
+    bucket = _stats["buckets"][_bucket(prob)]
+    with _stats_lock:
+        _stats["requests"] += 1
+        if accepted:
+            _stats["accepted"] += 1
+            bucket["accepted"] += 1
+            return
+        _stats["escalated"] += 1
+        bucket["escalated"] += 1
+        if ml_out.get("model_type") != "transformers":
+            _stats["escalated_heuristic"] += 1
+            return
+        if gpt_label is not None:
+            agreed = int(gpt_label == label)
+            _stats["compared"] += 1
+            _stats["agreed"] += agreed
+            bucket["compared"] += 1
+            bucket["agreed"] += agreed
+
+
+def _predict_ml(diary_text: str) -> Optional[Dict[str, Any]]:
+    if ml_predict is None:
+        return None
+    try:
+        return ml_predict(diary_text)
+    except Exception as e:
+        print(f"⚠️ [감정 cascade] 로컬 모델 예측 실패 - GPT 로 escalate: {e}")
+        return None
+
+
+def _accept(diary_text: str, ml_out: Dict[str, Any], meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    _record(ml_out, accepted=True)
+    if meta is not None and "source" in meta:
+        meta["source"] = "transformers-ml"
+    return ml_to_emotion_result(diary_text, ml_out)
+
+
+def _after_escalation(ml_out: Optional[Dict[str, Any]], result: Dict[str, Any], gpt_meta: Dict[str, Any],
+                      meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if ml_out is not None:
+        # GPT 대신 로컬 모델 결과가 나온 경우(브레이커 open 등)는 비교하지 않음
+        gpt_label = None
+        if "fallback" not in gpt_meta and result.get("top_emotions"):
+            gpt_label = result["top_emotions"][0]
+        _record(ml_out, accepted=False, gpt_label=gpt_label)
+        if gpt_label is not None:
+            gpt_meta["cascade"]["agreed"] = gpt_label == confidence(ml_out)[0]
+    if meta is not None:
+        meta.update(gpt_meta)
+    return result
+
+
+def _cascade_meta(ml_out: Optional[Dict[str, Any]], escalated: bool) -> Dict[str, Any]:
+    if ml_out is None:
+        return {"escalated": escalated, "model_type": None}
+    label, prob, margin = confidence(ml_out)
+    return {
+        "escalated": escalated,
+        "model_type": ml_out.get("model_type"),
+        "ml_label": label,
+        "confidence": round(prob, 4),
+        "margin": round(margin, 4),
+        "min_prob": MIN_PROB,
+        "min_margin": MIN_MARGIN,
+    }
+
+
+def analyze_emotions_cascade(diary_text: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    analyze_emotions_with_gpt 와 같은 형식의 결과
+    meta["cascade"] 에 escalate 여부 / ML 확률 / 차이 기록 (meta["source"] 가 있으면 실제 출처로 바꿈)
+    """
+    ml_out = _predict_ml(diary_text)
+    if ml_out is not None and should_accept(ml_out):
+        if meta is not None:
+            meta["cascade"] = _cascade_meta(ml_out, escalated=False)
+        return _accept(diary_text, ml_out, meta)
+
+    gpt_meta: Dict[str, Any] = {"cascade": _cascade_meta(ml_out, escalated=True)}
+    if meta is not None and "source" in meta:
+        gpt_meta["source"] = "gpt"
+    result = analyze_emotions_with_gpt(diary_text, meta=gpt_meta)
+    return _after_escalation(ml_out, result, gpt_meta, meta)
+
+
+async def analyze_emotions_cascade_async(diary_text: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """analyze_emotions_cascade 의 asyncio 버전 (ASGI 모드, asgi.py) - 로컬 모델 추론은 스레드에서"""
+    ml_out = await asyncio.to_thread(_predict_ml, diary_text)
+    if ml_out is not None and should_accept(ml_out):
+        if meta is not None:
+            meta["cascade"] = _cascade_meta(ml_out, escalated=False)
+        return _accept(diary_text, ml_out, meta)
+
+    gpt_meta: Dict[str, Any] = {"cascade": _cascade_meta(ml_out, escalated=True)}
+    if meta is not None and "source" in meta:
+        gpt_meta["source"] = "gpt"
+    result = await analyze_emotions_with_gpt_async(diary_text, meta=gpt_meta)
+    return _after_escalation(ml_out, result, gpt_meta, meta)
+
+
+def get_cascade_stats() -> Dict[str, Any]:
+    """현재 워커 프로세스의 escalate 비율 / ML-GPT 1위 감정 일치율 (확률 구간별)"""
+    with _stats_lock:
+        stats = json.loads(json.dumps(_stats))
+    stats.update({
+        "enabled": CASCADE_ENABLED,
+        "min_prob": MIN_PROB,
+        "min_margin": MIN_MARGIN,
+        "escalation_rate": stats["escalated"] / stats["requests"] if stats["requests"] else 0.0,
+        "agreement_rate": stats["agreed"] / stats["compared"] if stats["compared"] else None,
+    })
+    return stats
+
+
+# =========================================
+# 라벨된 데이터로 임계값 조정
+# =========================================
+
+def _load_labeled(path: str) -> List[Dict[str, str]]:
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row.get("label") in EMOTION_KEYS and row.get("text"):
+                rows.append(row)
+    return rows
+
+
+def tune(rows: List[Dict[str, str]], with_gpt: bool = False) -> List[Dict[str, Any]]:
+    """
+    임계값 조합별 escalate 비율 / 바로 반환한 ML 결과의 정확도
+    with_gpt 면 모든 샘플을 GPT 로도 분석해서 cascade 전체 정확도(ML 반환 + GPT escalate)도 계산
+    """
+    from services import emotion_ml
+
+    ml_outs = emotion_ml.predict_batch([row["text"] for row in rows])
+    gpt_labels: List[Optional[str]] = [None] * len(rows)
+    if with_gpt:
+        for i, row in enumerate(rows):
+            result = analyze_emotions_with_gpt(row["text"])
+            gpt_labels[i] = (result.get("top_emotions") or [None])[0]
+
+    report = []
+    for min_prob in [round(0.3 + 0.05 * i, 2) for i in range(14)]:
+        for min_margin in (0.0, 0.05, 0.1, 0.15, 0.2, 0.3):
+            accepted = correct = cascade_correct = 0
+            for row, ml_out, gpt_label in zip(rows, ml_outs, gpt_labels):
+                if should_accept(ml_out, min_prob, min_margin):
+                    accepted += 1
+                    hit = confidence(ml_out)[0] == row["label"]
+                    correct += hit
+                    cascade_correct += hit
+                else:
+                    cascade_correct += gpt_label == row["label"]
+            report.append({
+                "min_prob": min_prob,
+                "min_margin": min_margin,
+                "escalation_rate": 1 - accepted / len(rows),
+                "accepted_accuracy": correct / accepted if accepted else None,
+                "cascade_accuracy": cascade_correct / len(rows) if with_gpt else None,
+            })
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="감정 분석 cascade 임계값 조정 (라벨된 JSONL)")
+    parser.add_argument("path", help='한 줄에 {"text": ..., "label": "기쁨"} 형식인 JSONL')
+    parser.add_argument("--with-gpt", action="store_true", help="GPT 로도 분석해서 cascade 전체 정확도 계산 (샘플 수만큼 호출)")
+    parser.add_argument("--target-accuracy", type=float, default=None,
+                        help="바로 반환한 ML 결과의 정확도가 이 값 이상인 조합 중 escalate 비율이 가장 낮은 것 추천")
+    args = parser.parse_args(argv)
+
+    rows = _load_labeled(args.path)
+    if not rows:
+        print("라벨된 샘플이 없습니다.")
+        return
+    print(f"샘플 {len(rows)}개")
+    report = tune(rows, with_gpt=args.with_gpt)
+
+    def fmt(value):
+        return "   -  " if value is None else f"{value:6.3f}"
+
+    print(f"{'min_prob':>8} {'margin':>6} {'escalate':>8} {'ml_acc':>6} {'cascade':>7}")
+    for row in report:
+        print(f"{row['min_prob']:>8.2f} {row['min_margin']:>6.2f} {row['escalation_rate']:>8.3f} "
+              f"{fmt(row['accepted_accuracy'])} {fmt(row['cascade_accuracy'])}")
+
+    if args.target_accuracy is not None:
+        candidates = [row for row in report
+                      if row["accepted_accuracy"] is not None and row["accepted_accuracy"] >= args.target_accuracy]
+        if candidates:
+            best = min(candidates, key=lambda row: (row["escalation_rate"], -row["accepted_accuracy"]))
+            print(f"\n추천: EMOTION_CASCADE_MIN_PROB={best['min_prob']} EMOTION_CASCADE_MIN_MARGIN={best['min_margin']} "
+                  f"(escalate {best['escalation_rate']:.1%}, ML 정확도 {best['accepted_accuracy']:.1%})")
+        else:
+            print(f"\n정확도 {args.target_accuracy:.0%} 이상인 조합이 없습니다.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,8 +1,47 @@
+import os
 import json
 import re
+import asyncio
+import time
+import hashlib
+import threading
 import traceback
-from typing import Dict, Any
-from core.common import client, EMOTION_KEYS
+from typing import Dict, Any, Optional, Tuple
+from core.common import client, async_client, EMOTION_KEYS, ml_predict
+from core import llm_resilience
+from core.llm_resilience import CircuitOpenError
+from services.inference_cache import normalize_text
+
+GPT_MODEL = "gpt-4o-mini"
+# 프롬프트나 결과 후처리를 바꾸면 올려서 기존 캐시를 쓰지 않도록
+PROMPT_VERSION = "1"
+
+# GPT 결과를 쓸 수 없을 때의 기본값
+DEFAULT_SCORES = {
+    "기쁨": 25, "사랑": 20, "놀람": 15,
+    "두려움": 10, "분노": 10, "부끄러움": 10, "슬픔": 10
+}
+DEFAULT_TOP = ["기쁨", "사랑", "놀람", "슬픔"]
+
+# 놀람 / 부끄러움 극성 판단 지침 (감정 분석 프롬프트, 감정+대화 한 번 호출 프롬프트 공용)
+POLARITY_GUIDE = """**중요: "놀람"과 "부끄러움" 감정의 극성(polarity)을 반드시 분석하세요.**
+- "놀람": 긍정적 놀람이면 "positive", 부정적 놀람이면 "negative", 판단 불가면 null
+- "부끄러움": 긍정적 부끄러움(설레, 좋아하는 사람에 대한 부끄러움)이면 "positive", 부정적 부끄러움(창피, 수치심)이면 "negative", 판단 불가면 null
+
+극성 분석 가이드:
+- 긍정적 놀람: 예상보다 좋은 일, 기쁜 소식, 대박, 좋은 결과
+- 부정적 놀람: 예상보다 나쁜 일, 충격적인 소식, 실망
+- 긍정적 부끄러움: 좋아하는 사람 때문에 얼굴 빨개짐, 설레는 부끄러움, 칭찬받아서 부끄러움
+- 부정적 부끄러움: 창피, 수치심, 실수해서 부끄러움, 망신"""
+
+# GPT 분석 결과 캐시 (gpt_analysis_cache 테이블) - 같은 내용을 다시 분석하면 저장된 결과 반환
+GPT_CACHE_ENABLED = os.environ.get("GPT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+GPT_CACHE_TTL_SECONDS = int(float(os.environ.get("GPT_CACHE_TTL_HOURS", "168")) * 3600)
+GPT_CACHE_MAX_ENTRIES = int(os.environ.get("GPT_CACHE_MAX_ENTRIES", "50000"))
+# 저장 이만큼마다 한 번 만료/초과 항목 정리
+GPT_CACHE_PRUNE_EVERY = int(os.environ.get("GPT_CACHE_PRUNE_EVERY", "200"))
+# 조회 시 hit_count / last_hit_at 은 항목마다 이 간격(초)에 한 번만 갱신 (읽기 경로에서 쓰기 줄이기)
+GPT_CACHE_TOUCH_SECONDS = float(os.environ.get("GPT_CACHE_TOUCH_SECONDS", "300"))
 
 # ---------------------------------------
 # JSON 추출
@@ -258,20 +297,182 @@ def hybrid_polarity(
     return final
 
 
+# ===============================================================
+#  GPT 분석 결과 캐시
+# ===============================================================
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0, "pruned": 0}
+
+
+def _count(key: str, amount: int = 1) -> None:
+    with _cache_lock:
+        _cache_stats[key] += amount
+
+
+def content_hash(diary_text: str) -> str:
+    """공백/유니코드 정규화한 일기 내용 해시 (캐시 키)"""
+    return hashlib.sha256(normalize_text(diary_text).encode("utf-8")).hexdigest()
+
+
+def _cache_lookup(text_hash: str, prompt_version: str = PROMPT_VERSION) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """(캐시된 결과 또는 None, 응답 meta 에 넣을 캐시 정보) - prompt_version 이 다른 프롬프트의 결과는 따로 저장"""
+    if not GPT_CACHE_ENABLED:
+        return None, {"enabled": False, "hit": False}
+    started = time.perf_counter()
+    try:
+        from db import get_gpt_analysis_cache
+        row = get_gpt_analysis_cache(text_hash, GPT_MODEL, prompt_version, GPT_CACHE_TOUCH_SECONDS)
+    except Exception as e:
+        _count("errors")
+        print(f"⚠️ [GPT 캐시] 조회 실패: {e}")
+        row = None
+    info: Dict[str, Any] = {
+        "enabled": True,
+        "hit": row is not None,
+        "lookup_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    if row is None:
+        _count("misses")
+        return None, info
+    _count("hits")
+    info["cached_at"] = row["created_at"].isoformat() if row["created_at"] else None
+    info["hit_count"] = row["hit_count"]
+    return row["result"], info
+
+
+def _cache_store(text_hash: str, result: Dict[str, Any], prompt_version: str = PROMPT_VERSION) -> None:
+    if not GPT_CACHE_ENABLED:
+        return
+    try:
+        from db import save_gpt_analysis_cache, prune_gpt_analysis_cache
+        save_gpt_analysis_cache(text_hash, GPT_MODEL, prompt_version, result, GPT_CACHE_TTL_SECONDS)
+        with _cache_lock:
+            _cache_stats["stores"] += 1
+            prune = _cache_stats["stores"] % GPT_CACHE_PRUNE_EVERY == 0
+        if prune:
+            _count("pruned", prune_gpt_analysis_cache(GPT_CACHE_MAX_ENTRIES))
+    except Exception as e:
+        _count("errors")
+        print(f"⚠️ [GPT 캐시] 저장 실패: {e}")
+
+
+def get_gpt_cache_stats() -> Dict[str, Any]:
+    """현재 워커 프로세스의 GPT 캐시 hit / miss 통계 (+ 테이블 전체 항목 수)"""
+    with _cache_lock:
+        stats: Dict[str, Any] = dict(_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats.update({
+        "enabled": GPT_CACHE_ENABLED,
+        "model": GPT_MODEL,
+        "prompt_version": PROMPT_VERSION,
+        "ttl_seconds": GPT_CACHE_TTL_SECONDS,
+        "max_entries": GPT_CACHE_MAX_ENTRIES,
+        "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+    })
+    try:
+        from db import get_gpt_analysis_cache_stats
+        stats["table"] = get_gpt_analysis_cache_stats()
+    except Exception as e:
+        stats["table"] = {"error": str(e)}
+    return stats
+
+
 # ===============================================================
 #  메인 감정 분석 함수
 # ===============================================================
-def analyze_emotions_with_gpt(diary_text: str) -> Dict[str, Any]:
+def analyze_emotions_with_gpt(diary_text: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     GPT + 규칙 기반 하이브리드 감정 분석기
+    
+    같은 내용을 최근에 분석했으면 GPT 를 호출하지 않고 캐시된 결과를 반환
+    meta 를 넘기면 meta["cache"] 에 캐시 hit 여부 / 조회 시간을 기록 (응답 meta 용)
+    
+    OpenAI 서킷 브레이커가 열려 있거나 GPT 호출이 실패하면 로컬 감정 모델(emotion_ml.predict) 결과를
+    같은 형식으로 반환하고 meta["fallback"] 에 이유를 기록 (이 결과는 캐시에 저장하지 않음)
     """
-    # 기본 fallback
-    default_scores = {
-        "기쁨": 25, "사랑": 20, "놀람": 15,
-        "두려움": 10, "분노": 10, "부끄러움": 10, "슬픔": 10
-    }
-    default_top = ["기쁨", "사랑", "놀람", "슬픔"]
+    text_hash = content_hash(diary_text)
+    cached, cache_info = _cache_lookup(text_hash)
+    if meta is not None:
+        meta["cache"] = cache_info
+    if cached is not None:
+        return cached
+    
+    if llm_resilience.is_open():
+        return _analyze_with_ml(diary_text, meta, "circuit_open")
+    try:
+        gpt_resp = client.chat.completions.create(**_completion_kwargs(diary_text))
+        raw = gpt_resp.choices[0].message.content or ""
+    except CircuitOpenError:
+        return _analyze_with_ml(diary_text, meta, "circuit_open")
+    except Exception as e:
+        print(f"⚠️ [GPT 감정 분석] 호출 실패 - 로컬 모델로 대체: {e}")
+        return _analyze_with_ml(diary_text, meta, "gpt_error")
+    
+    result, gpt_ok = _postprocess(diary_text, raw)
+    # GPT 응답 파싱에 실패해서 기본값이 나온 경우는 저장하지 않음
+    if gpt_ok:
+        _cache_store(text_hash, result)
+    return result
+
 
+async def analyze_emotions_with_gpt_async(diary_text: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    analyze_emotions_with_gpt 의 asyncio 버전 (ASGI 모드, asgi.py)
+    GPT 호출은 AsyncOpenAI 로 await, 캐시 테이블 조회/저장(psycopg2)과 로컬 모델 추론은 스레드에서 실행
+    """
+    text_hash = content_hash(diary_text)
+    cached, cache_info = await asyncio.to_thread(_cache_lookup, text_hash)
+    if meta is not None:
+        meta["cache"] = cache_info
+    if cached is not None:
+        return cached
+
+    if llm_resilience.is_open():
+        return await asyncio.to_thread(_analyze_with_ml, diary_text, meta, "circuit_open")
+    try:
+        gpt_resp = await async_client.chat.completions.create(**_completion_kwargs(diary_text))
+        raw = gpt_resp.choices[0].message.content or ""
+    except CircuitOpenError:
+        return await asyncio.to_thread(_analyze_with_ml, diary_text, meta, "circuit_open")
+    except Exception as e:
+        print(f"⚠️ [GPT 감정 분석] 호출 실패 - 로컬 모델로 대체: {e}")
+        return await asyncio.to_thread(_analyze_with_ml, diary_text, meta, "gpt_error")
+
+    result, gpt_ok = _postprocess(diary_text, raw)
+    if gpt_ok:
+        await asyncio.to_thread(_cache_store, text_hash, result)
+    return result
+
+
+def ml_to_emotion_result(diary_text: str, ml_out: Dict[str, Any]) -> Dict[str, Any]:
+    """emotion_ml.predict 결과(확률, 합=1) → analyze_emotions_with_gpt 와 같은 형식 (극성은 규칙 기반만)"""
+    scores = {emo: float(ml_out.get("scores", {}).get(emo, 0.0)) * 100 for emo in EMOTION_KEYS}
+    return _build_result(diary_text, scores, {})
+
+
+def _analyze_with_ml(diary_text: str, meta: Optional[Dict[str, Any]], reason: str) -> Dict[str, Any]:
+    """GPT 대신 로컬 감정 모델로 분석 (모델 모듈이 없거나 실패하면 기본값)"""
+    model_type = None
+    try:
+        if ml_predict is not None:
+            ml_out = ml_predict(diary_text)
+            model_type = ml_out.get("model_type")
+            result = ml_to_emotion_result(diary_text, ml_out)
+        else:
+            result, _ = _postprocess(diary_text, "")
+    except Exception as e:
+        print(f"⚠️ [GPT 감정 분석] 로컬 모델 대체 실패: {e}")
+        result, _ = _postprocess(diary_text, "")
+
+    if meta is not None:
+        meta["fallback"] = {"reason": reason, "model_type": model_type}
+        if "source" in meta:
+            meta["source"] = f"{model_type}-ml" if model_type else "default"
+    return result
+
+
+def _completion_kwargs(diary_text: str) -> Dict[str, Any]:
+    """감정 분석 chat.completions.create 인자 (동기 / 비동기 클라이언트 공용)"""
     # ---------------- GPT Prompt ----------------
     prompt = f"""
 당신은 감정 분석 전문가입니다.
@@ -279,15 +480,7 @@ def analyze_emotions_with_gpt(diary_text: str) -> Dict[str, Any]:
 다음 일기를 읽고 7가지 감정(기쁨, 사랑, 놀람, 두려움, 분노, 부끄러움, 슬픔)을
 0~100 정수로 분석하세요.
 
-**중요: "놀람"과 "부끄러움" 감정의 극성(polarity)을 반드시 분석하세요.**
-- "놀람": 긍정적 놀람이면 "positive", 부정적 놀람이면 "negative", 판단 불가면 null
-- "부끄러움": 긍정적 부끄러움(설레, 좋아하는 사람에 대한 부끄러움)이면 "positive", 부정적 부끄러움(창피, 수치심)이면 "negative", 판단 불가면 null
-
-극성 분석 가이드:
-- 긍정적 놀람: 예상보다 좋은 일, 기쁜 소식, 대박, 좋은 결과
-- 부정적 놀람: 예상보다 나쁜 일, 충격적인 소식, 실망
-- 긍정적 부끄러움: 좋아하는 사람 때문에 얼굴 빨개짐, 설레는 부끄러움, 칭찬받아서 부끄러움
-- 부정적 부끄러움: 창피, 수치심, 실수해서 부끄러움, 망신
+{POLARITY_GUIDE}
 
 <BEGIN_JSON>
 {{
@@ -313,29 +506,35 @@ def analyze_emotions_with_gpt(diary_text: str) -> Dict[str, Any]:
 JSON만 출력하세요. emotion_polarity는 반드시 "positive", "negative", 또는 null 중 하나로 설정하세요.
 """.strip()
 
-    try:
-        gpt_resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "감정 분석만 수행. JSON 이외 출력 금지."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.1,
-            max_tokens=400
-        )
-        raw = gpt_resp.choices[0].message.content or ""
-        parsed = extract_json(raw)
-    except:
-        parsed = None
+    return {
+        "model": GPT_MODEL,
+        "messages": [
+            {"role": "system", "content": "감정 분석만 수행. JSON 이외 출력 금지."},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.1,
+        "max_tokens": 400,
+    }
+
+
+def _postprocess(diary_text: str, raw: str) -> Tuple[Dict[str, Any], bool]:
+    """GPT 응답 원문 → 정규화한 점수 + 극성 + top emotions. (결과, GPT 결과를 정상적으로 받았는지)"""
+    parsed = extract_json(raw)
 
     # ---------------- 파싱 실패 → 기본값 ----------------
-    if not parsed or "emotion_scores" not in parsed:
-        scores = default_scores.copy()
+    gpt_ok = bool(parsed) and "emotion_scores" in parsed
+    if not gpt_ok:
+        scores = DEFAULT_SCORES.copy()
         gpt_polarity = {"놀람": None, "부끄러움": None}
     else:
         scores = parsed.get("emotion_scores", {})
         gpt_polarity = parsed.get("emotion_polarity", {})
 
+    return _build_result(diary_text, scores, gpt_polarity), gpt_ok
+
+
+def _build_result(diary_text: str, scores: Dict[str, Any], gpt_polarity: Dict[str, Any]) -> Dict[str, Any]:
+    """0~100 점수 → 합 100 으로 정규화 + Hybrid Polarity + top emotions"""
     # ---------------- 숫자 정제 ----------------
     final_scores = {}
     for emo in EMOTION_KEYS:
@@ -348,7 +547,7 @@ JSON만 출력하세요. emotion_polarity는 반드시 "positive", "negative", 
 
     # ---------------- 모두 0 → 기본값 ----------------
     if sum(final_scores.values()) == 0:
-        final_scores = default_scores.copy()
+        final_scores = DEFAULT_SCORES.copy()
 
     # ---------------- 정규화 (합=100%) ----------------
     total = sum(final_scores.values())
@@ -374,7 +573,7 @@ JSON만 출력하세요. emotion_polarity는 반드시 "positive", "negative", 
     top_emotions = [emo for emo, score in sorted_emotions if score > 0]
 
     if not top_emotions:
-        top_emotions = default_top
+        top_emotions = list(DEFAULT_TOP)
 
     return {
         "emotion_scores": norm,
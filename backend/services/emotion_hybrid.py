@@ -0,0 +1,172 @@
+"""
+감정 분석 hybrid 모드 - 로컬 감정 모델과 GPT 를 동시에 시작하고 요청별 마감 시간(deadline) 안에 답
+
+- GPT 분석(analyze_emotions_with_gpt)은 스레드 풀에서, 로컬 모델(ml_batcher → emotion_ml.predict)은 요청 스레드에서 동시에 실행
+- 마감 시간 안에 GPT 결과가 오면 GPT 결과, 아니면 로컬 모델 결과를 반환 (meta["source"] / meta["hybrid"] 에 출처 기록)
+- 마감 시간을 넘긴 GPT 호출은 취소하지 않고 끝까지 실행 → 결과가 GPT 캐시에 저장되어 같은 일기를 다시 분석하면 바로 GPT 결과
+- 스레드 풀이 밀려서 마감 시간이 지난 뒤에야 시작되는 GPT 호출은 건너뜀 (OpenAI 가 느릴 때 대기열이 끝없이 쌓이지 않도록)
+
+/analyze2 mode=hybrid (요청 본문 deadline_ms 로 마감 시간 지정 가능), 통계 → GET /health/gpt 의 "hybrid"
+"""
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Optional, Set, Tuple
+
+from core.common import ml_predict
+from services.emotion_gpt import analyze_emotions_with_gpt, analyze_emotions_with_gpt_async, ml_to_emotion_result
+
+DEADLINE_MS = float(os.environ.get("ANALYZE_HYBRID_DEADLINE_MS", "3000"))
+MAX_DEADLINE_MS = float(os.environ.get("ANALYZE_HYBRID_MAX_DEADLINE_MS", "30000"))
+# 워커 프로세스당 동시에 실행하는 GPT 분석 수 (sync 경로)
+THREADS = int(os.environ.get("ANALYZE_HYBRID_THREADS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="hybrid-gpt")
+# asyncio 경로에서 마감 시간이 지난 뒤에도 계속 실행 중인 GPT 태스크 (GC 되지 않도록 참조 유지)
+_background: Set[asyncio.Task] = set()
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "gpt": 0, "ml": 0, "deadline_exceeded": 0, "gpt_fallback": 0, "gpt_error": 0,
+          "skipped": 0, "ml_unavailable": 0}
+# GPT 쪽 결과 상태 → 통계 항목
+_STATUS_KEYS = {"timeout": "deadline_exceeded", "fallback": "gpt_fallback", "error": "gpt_error", "skipped": "skipped"}
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def deadline_seconds(deadline_ms: Any = None) -> float:
+    """요청에서 받은 마감 시간(ms) → 초 (없거나 잘못된 값이면 기본값, 최대값으로 제한)"""
+    try:
+        value = float(deadline_ms) if deadline_ms is not None else DEADLINE_MS
+    except (TypeError, ValueError):
+        value = DEADLINE_MS
+    return max(0.0, min(value, MAX_DEADLINE_MS)) / 1000
+
+
+def _predict_ml(diary_text: str) -> Tuple[Optional[Dict[str, Any]], float]:
+    started = time.perf_counter()
+    if ml_predict is None:
+        return None, 0.0
+    try:
+        ml_out = ml_predict(diary_text)
+    except Exception as e:
+        print(f"⚠️ [감정 hybrid] 로컬 모델 예측 실패: {e}")
+        ml_out = None
+    return ml_out, (time.perf_counter() - started) * 1000
+
+
+def _choose(diary_text: str, meta: Optional[Dict[str, Any]], started: float, deadline_s: float,
+            ml_out: Optional[Dict[str, Any]], ml_ms: float,
+            gpt_result: Optional[Dict[str, Any]], gpt_status: str, gpt_meta: Dict[str, Any]) -> Dict[str, Any]:
+    """GPT 결과가 제때 정상적으로 왔으면 GPT, 아니면 로컬 모델 결과"""
+    _count("requests")
+    if gpt_status in _STATUS_KEYS:
+        _count(_STATUS_KEYS[gpt_status])
+    if ml_out is None:
+        _count("ml_unavailable")
+
+    use_gpt = gpt_result is not None and (gpt_status == "ok" or ml_out is None)
+    if use_gpt:
+        _count("gpt")
+        result = gpt_result
+        source = "gpt" if gpt_status == "ok" else gpt_meta.get("source", "default")
+    else:
+        _count("ml")
+        result = ml_to_emotion_result(diary_text, ml_out) if ml_out is not None else None
+        source = f"{ml_out.get('model_type', 'unknown')}-ml" if ml_out is not None else "none"
+
+    if meta is not None:
+        if use_gpt:
+            meta.update({key: value for key, value in gpt_meta.items() if key in ("cache", "fallback")})
+        meta["source"] = source
+        meta["hybrid"] = {
+            "deadline_ms": round(deadline_s * 1000),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "ml_ms": round(ml_ms, 1),
+            "gpt_status": gpt_status,
+        }
+    if result is None:
+        raise RuntimeError("GPT 와 로컬 감정 모델 모두 결과를 내지 못했습니다.")
+    return result
+
+
+def _gpt_job(diary_text: str, gpt_meta: Dict[str, Any], start_by: float) -> Optional[Dict[str, Any]]:
+    # 풀에서 기다리는 동안 마감 시간이 지났으면 호출하지 않음
+    if time.perf_counter() > start_by:
+        return None
+    return analyze_emotions_with_gpt(diary_text, meta=gpt_meta)
+
+
+def analyze_emotions_hybrid(diary_text: str, meta: Optional[Dict[str, Any]] = None,
+                            deadline_ms: Any = None) -> Dict[str, Any]:
+    """
+    analyze_emotions_with_gpt 와 같은 형식의 결과
+    로컬 모델을 쓸 수 없으면 마감 시간과 관계없이 GPT 결과를 기다림
+    """
+    deadline_s = deadline_seconds(deadline_ms)
+    started = time.perf_counter()
+    gpt_meta: Dict[str, Any] = {}
+    gpt_future = _executor.submit(_gpt_job, diary_text, gpt_meta, started + deadline_s)
+
+    ml_out, ml_ms = _predict_ml(diary_text)
+    remaining = None if ml_out is None else max(0.0, deadline_s - (time.perf_counter() - started))
+
+    gpt_result = None
+    try:
+        gpt_result = gpt_future.result(timeout=remaining)
+        if gpt_result is None and ml_out is None:
+            # 풀이 밀려서 건너뛰었는데 대신할 로컬 결과도 없으면 요청 스레드에서 직접 호출
+            gpt_result = analyze_emotions_with_gpt(diary_text, meta=gpt_meta)
+        if gpt_result is None:
+            gpt_status = "skipped"
+        else:
+            gpt_status = "fallback" if "fallback" in gpt_meta else "ok"
+    except FutureTimeout:
+        gpt_status = "timeout"
+    except Exception as e:
+        print(f"⚠️ [감정 hybrid] GPT 분석 실패: {e}")
+        gpt_status = "error"
+    return _choose(diary_text, meta, started, deadline_s, ml_out, ml_ms, gpt_result, gpt_status, gpt_meta)
+
+
+async def analyze_emotions_hybrid_async(diary_text: str, meta: Optional[Dict[str, Any]] = None,
+                                        deadline_ms: Any = None) -> Dict[str, Any]:
+    """analyze_emotions_hybrid 의 asyncio 버전 (ASGI 모드, asgi.py) - GPT 는 태스크, 로컬 모델은 스레드"""
+    deadline_s = deadline_seconds(deadline_ms)
+    started = time.perf_counter()
+    gpt_meta: Dict[str, Any] = {}
+    gpt_task = asyncio.create_task(analyze_emotions_with_gpt_async(diary_text, meta=gpt_meta))
+    _background.add(gpt_task)
+    gpt_task.add_done_callback(_background.discard)
+
+    ml_out, ml_ms = await asyncio.to_thread(_predict_ml, diary_text)
+    remaining = None if ml_out is None else max(0.0, deadline_s - (time.perf_counter() - started))
+    done, _ = await asyncio.wait({gpt_task}, timeout=remaining)
+
+    gpt_result = None
+    if gpt_task not in done:
+        gpt_status = "timeout"
+    elif gpt_task.exception() is not None:
+        print(f"⚠️ [감정 hybrid] GPT 분석 실패: {gpt_task.exception()}")
+        gpt_status = "error"
+    else:
+        gpt_result = gpt_task.result()
+        gpt_status = "fallback" if "fallback" in gpt_meta else "ok"
+    return _choose(diary_text, meta, started, deadline_s, ml_out, ml_ms, gpt_result, gpt_status, gpt_meta)
+
+
+def get_hybrid_stats() -> Dict[str, Any]:
+    """현재 워커 프로세스에서 GPT / 로컬 모델 결과를 반환한 횟수 (마감 시간 초과, GPT 실패 포함)"""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    stats.update({
+        "deadline_ms": DEADLINE_MS,
+        "threads": THREADS,
+        "gpt_rate": stats["gpt"] / stats["requests"] if stats["requests"] else 0.0,
+    })
+    return stats
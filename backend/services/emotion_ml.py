@@ -1,11 +1,26 @@
 import os
 import json
+import time
 from typing import Dict, Tuple, List, Optional
 
+import numpy as np
+
+from services import model_client, model_registry, inference_cache
+
+# 추론 백엔드: torch (기본) | onnx (services/emotion_onnx.py, torch 없이 onnxruntime 으로 추론)
+EMOTION_ML_BACKEND = os.environ.get("EMOTION_ML_BACKEND", "torch").lower()
+EMOTION_ML_ONNX_INT8 = os.environ.get("EMOTION_ML_ONNX_INT8", "false").lower() in ("1", "true", "yes")
+
 # Transformers 모델 사용
+torch = None  # type: ignore
+AutoModelForSequenceClassification = None  # type: ignore
 try:
-    from transformers import AutoModelForSequenceClassification, AutoTokenizer
-    import torch
+    from transformers import AutoTokenizer
+    if EMOTION_ML_BACKEND != "onnx" and not model_client.ENABLED:
+        # ONNX 백엔드는 tokenizer 만 필요하고, 공유 모델 서버를 쓰면 워커에서는 모델을 올리지 않으므로
+        # torch 로딩(메모리)을 실제로 이 프로세스에서 로드할 때까지 미룸
+        from transformers import AutoModelForSequenceClassification
+        import torch
     TRANSFORMERS_AVAILABLE = True
     print("[Transformers] 라이브러리 import 성공")
 except Exception as e:
@@ -28,16 +43,100 @@ TRANSFORMERS_MODEL_PATH = os.environ.get(
 
 LABELS = ["분노", "슬픔", "불안", "상처", "당황", "기쁨"]  # 휴리스틱 fallback용 (모델 없을 때)
 
+# 라벨 매핑 (모델의 5개 라벨)
+MODEL_ID2LABEL = {
+    0: "기쁨",
+    1: "당황",
+    2: "분노",
+    3: "불안",
+    4: "슬픔"
+}
+
+# predict_batch 한 번의 forward pass 에 넣을 최대 텍스트 수
+PREDICT_BATCH_SIZE = int(os.environ.get("EMOTION_ML_BATCH_SIZE", "16"))
+# 모델 입력 최대 토큰 수 (특수 토큰 포함)
+MAX_SEQ_LENGTH = 512
+# 긴 일기: 앞부분만 자르지 않고 겹치는 구간(window)들로 나눠서 한 배치로 추론 → 본문 토큰 수로 가중 평균
+CHUNKING_ENABLED = os.environ.get("EMOTION_ML_CHUNKING", "true").lower() in ("1", "true", "yes")
+# window 시작 간격 (토큰) - window 크기(510)보다 작으면 그 차이만큼 겹침
+CHUNK_STRIDE = int(os.environ.get("EMOTION_ML_CHUNK_STRIDE", "384"))
+# 일기 하나당 최대 window 수 (지연 시간 상한) - 넘으면 처음부터 끝까지 고르게 골라서 사용
+MAX_CHUNKS = int(os.environ.get("EMOTION_ML_MAX_CHUNKS", "8"))
+
+# 예측 캐시 키에 들어가는 모델 버전 (같은 경로의 가중치를 바꾸면 올려서 캐시 무효화)
+MODEL_VERSION = os.environ.get("EMOTION_ML_MODEL_VERSION", "1")
+
+# 같은 내용은 다시 추론하지 않도록 결과 캐시 (services/inference_cache.py, 모델 결과만 저장)
+_prediction_cache = inference_cache.get_cache(
+    "emotion",
+    encode=lambda result: json.dumps(result, ensure_ascii=False).encode("utf-8"),
+    decode=lambda data: json.loads(data.decode("utf-8")),
+)
+
 # 전역 변수
 _model = None
 _tokenizer = None
+_onnx = None  # services.emotion_onnx.OnnxClassifier (ONNX 백엔드일 때)
+
+
+def _model_ready() -> bool:
+    return _tokenizer is not None and (_model is not None or _onnx is not None)
+
+
+def active_backend() -> Optional[str]:
+    """현재 로드된 추론 백엔드 (torch / onnx / onnx-int8, 로드 전이면 None)"""
+    if _onnx is not None:
+        return "onnx-int8" if EMOTION_ML_ONNX_INT8 else "onnx"
+    if _model is not None:
+        return "torch"
+    return None
+
+
+def _import_torch() -> bool:
+    """ONNX 백엔드로 시작했다가 PyTorch 로 대체할 때 torch 를 그때 import"""
+    global torch, AutoModelForSequenceClassification
+    if torch is not None and AutoModelForSequenceClassification is not None:
+        return True
+    try:
+        import torch as _torch
+        from transformers import AutoModelForSequenceClassification as _auto_model
+    except Exception as e:
+        print(f"[Transformers] torch import 실패: {e}")
+        return False
+    torch, AutoModelForSequenceClassification = _torch, _auto_model
+    return True
+
+
+def _load_onnx_model_if_available() -> bool:
+    """ONNX Runtime 세션 + tokenizer 로드 (실패하면 PyTorch 로 대체)"""
+    global _onnx, _tokenizer
+    try:
+        from services.emotion_onnx import load_classifier
+        _onnx = load_classifier(TRANSFORMERS_MODEL_PATH, int8=EMOTION_ML_ONNX_INT8)
+        _tokenizer = AutoTokenizer.from_pretrained(TRANSFORMERS_MODEL_PATH)
+        print(f"[ONNX] 모델 로드 성공: {_onnx.path}")
+        return True
+    except Exception as e:
+        _onnx = None
+        print(f"⚠️ [ONNX] 모델 로드 실패 - PyTorch 백엔드로 대체합니다: {e}")
+        return False
 
 
 def _load_transformers_model_if_available() -> bool:
-    """Transformers 모델 로드"""
+    """
+    모델이 없으면 로드 - 프로세스당 한 번만 (services/model_registry.py)
+    스레드 워커에서 첫 요청이 동시에 들어오면 나머지는 잠금에서 기다렸다가 같은 모델을 사용
+    """
+    if _model_ready():
+        return True
+    return model_registry.ensure_loaded("emotion")
+
+
+def _load_model() -> bool:
+    """Transformers 모델 로드 (EMOTION_ML_BACKEND=onnx 면 ONNX Runtime 세션을 먼저 시도)"""
     global _model, _tokenizer
     
-    if _model is not None and _tokenizer is not None:
+    if _model_ready():
         print("[Transformers] 모델이 이미 로드되어 있습니다.")
         return True
     
@@ -45,6 +144,11 @@ def _load_transformers_model_if_available() -> bool:
         print("[Transformers] Transformers 라이브러리를 사용할 수 없습니다.")
         return False
     
+    if EMOTION_ML_BACKEND == "onnx" and _load_onnx_model_if_available():
+        return True
+    if not _import_torch():
+        return False
+    
     # Hugging Face Hub 경로인지 확인 (슬래시가 있으면 Hub 경로)
     is_hub_path = "/" in TRANSFORMERS_MODEL_PATH and not os.path.isabs(TRANSFORMERS_MODEL_PATH) and not os.path.exists(TRANSFORMERS_MODEL_PATH)
     
@@ -105,49 +209,121 @@ def _load_transformers_model_if_available() -> bool:
         return False
 
 
+model_registry.register(
+    "emotion",
+    _load_model,
+    warmup=lambda: _predict_with_transformers("오늘은 친구를 만나서 즐거웠다."),
+    remote=model_client.available,
+)
+
+
 def _predict_with_transformers(text: str) -> Dict[str, float]:
     """Transformers 모델로 예측"""
-    global _model, _tokenizer
-    
-    if _model is None or _tokenizer is None:
+    if not _model_ready():
         return {}
     
     try:
-        # 토크나이징
-        inputs = _tokenizer(
-            text,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512,
-            padding=True
-        )
-        
-        # 예측
-        with torch.no_grad():
-            outputs = _model(**inputs)
-            logits = outputs.logits
-            probs = torch.softmax(logits, dim=-1)[0]
-        
-        # 라벨 매핑 (모델의 5개 라벨)
-        id2label = {
-            0: "기쁨",
-            1: "당황",
-            2: "분노",
-            3: "불안",
-            4: "슬픔"
-        }
-        
-        scores = {}
-        for idx, prob in enumerate(probs):
-            label = id2label.get(idx, f"label_{idx}")
-            scores[label] = float(prob)
-        
-        return scores
+        # 토크나이징 + 예측 (긴 일기는 window 들을 한 배치로)
+        return _predict_windows([text], max(1, MAX_CHUNKS))[0]
     except Exception as e:
         print(f"Transformers 예측 실패: {e}")
         return {}
 
 
+def _model_probs(encode):
+    """
+    softmax 확률 (batch, 5) - 백엔드 공통
+    encode(return_tensors) 는 tokenizer 출력을 만드는 함수 ("pt" → PyTorch, "np" → ONNX Runtime)
+    """
+    if _onnx is not None:
+        return _onnx.probs(encode("np"))
+    with torch.no_grad():
+        return torch.softmax(_model(**encode("pt")).logits, dim=-1).numpy()
+
+
+def _probs_to_scores(probs) -> Dict[str, float]:
+    """softmax 확률 (5,) → {모델 라벨: 확률}"""
+    scores = {}
+    for idx, prob in enumerate(probs):
+        label = MODEL_ID2LABEL.get(idx, f"label_{idx}")
+        scores[label] = float(prob)
+    return scores
+
+
+def _predict_batch_with_transformers(texts: List[str], batch_size: int) -> List[Dict[str, float]]:
+    """
+    여러 텍스트를 배치로 예측 (길이 버킷 + 동적 패딩)
+    
+    - 토큰 길이로 정렬한 뒤 batch_size 개씩 묶어서, 묶음마다 그 안의 최대 길이까지만 패딩
+      → 긴 일기 하나 때문에 짧은 일기들이 512 토큰까지 패딩되지 않음
+    - attention_mask 로 패딩 위치는 무시되므로 결과는 predict() 와 같음 (부동소수점 오차 범위)
+    - 결과는 입력 순서대로 반환
+    """
+    if not _model_ready():
+        return [{} for _ in texts]
+    return _predict_windows(texts, batch_size)
+
+
+def _window_starts(length: int, window: int) -> List[int]:
+    """본문 토큰 length 개를 window 크기 구간들로 나눌 때 각 구간의 시작 위치 (마지막 구간은 끝에 맞춤)"""
+    if length <= window:
+        return [0]
+    last = length - window
+    starts = list(range(0, last, max(1, CHUNK_STRIDE))) + [last]
+    if len(starts) > MAX_CHUNKS:
+        if MAX_CHUNKS <= 1:
+            return [0]
+        starts = [round(last * k / (MAX_CHUNKS - 1)) for k in range(MAX_CHUNKS)]
+    return starts
+
+
+def _text_windows(texts: List[str]) -> Tuple[List[Dict], List[int], List[int]]:
+    """
+    텍스트들 → 모델 입력 목록 (window 마다 하나), 각 입력이 속한 텍스트 index, 가중치(본문 토큰 수)
+    CHUNKING_ENABLED 가 아니면 텍스트마다 512 토큰에서 자른 입력 하나
+    """
+    if not CHUNKING_ENABLED:
+        encoded = _tokenizer(texts, truncation=True, max_length=MAX_SEQ_LENGTH, padding=False)
+        features = [{key: encoded[key][i] for key in encoded.keys()} for i in range(len(texts))]
+        return features, list(range(len(texts))), [1] * len(texts)
+    
+    window = MAX_SEQ_LENGTH - _tokenizer.num_special_tokens_to_add(pair=False)
+    token_ids = _tokenizer(texts, add_special_tokens=False, truncation=False, padding=False)["input_ids"]
+    features, owners, weights = [], [], []
+    for i, ids in enumerate(token_ids):
+        for start in _window_starts(len(ids), window):
+            chunk = ids[start:start + window]
+            features.append(dict(_tokenizer.prepare_for_model(chunk, add_special_tokens=True)))
+            owners.append(i)
+            weights.append(max(1, len(chunk)))
+    return features, owners, weights
+
+
+def _predict_windows(texts: List[str], batch_size: int) -> List[Dict[str, float]]:
+    """
+    모든 텍스트의 window 를 모아서 길이 버킷 + 동적 패딩으로 추론하고, 텍스트별로 길이 가중 평균
+    (window 가 하나뿐인 짧은 일기는 기존 512 토큰 입력과 같은 결과)
+    """
+    features, owners, weights = _text_windows(texts)
+    order = sorted(range(len(features)), key=lambda j: len(features[j]["input_ids"]))
+    
+    window_probs: List[Optional[np.ndarray]] = [None] * len(features)
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        batch_features = [features[j] for j in bucket]
+        probs = _model_probs(lambda tensors: _tokenizer.pad(batch_features, padding=True, return_tensors=tensors))
+        for row, j in enumerate(bucket):
+            window_probs[j] = np.asarray(probs[row], dtype=np.float64)
+    
+    # 길이 가중 평균 (본문 토큰이 많은 window 의 비중이 큼)
+    probs = np.stack(window_probs)
+    w = np.asarray(weights, dtype=np.float64)
+    totals = np.zeros((len(texts), probs.shape[1]))
+    np.add.at(totals, owners, probs * w[:, None])
+    averaged = totals / np.bincount(owners, weights=w, minlength=len(texts))[:, None]
+    return [_probs_to_scores(row) for row in averaged]
+
+
 def _heuristic_predict(text: str) -> Tuple[str, Dict[str, float]]:
     t = text.lower()
     scores = {k: 0.0 for k in LABELS}
@@ -183,130 +359,104 @@ def _heuristic_predict(text: str) -> Tuple[str, Dict[str, float]]:
     return label, probs
 
 
-def predict(text: str) -> Dict:
-    if not text or not text.strip():
-        # 빈 입력 → 균등 분포 (7개 감정)
-        base = 1.0 / 7
-        return {
-            "label": "기쁨", 
-            "scores": {
-                "기쁨": base, "사랑": base, "놀람": base, "두려움": base,
-                "분노": base, "부끄러움": base, "슬픔": base
-            },
-            "model_type": "heuristic"
-        }
-
-    # 1순위: Transformers 모델 사용
-    if _load_transformers_model_if_available():
-        try:
-            print("[Transformers] 예측 시작")
-            model_scores = _predict_with_transformers(text)
-            
-            if model_scores:
-                print(f"[Transformers] 예측 성공: {model_scores}")
-                # 모델 라벨 → 7개 감정 시스템 매핑
-                # 모델 라벨: ["기쁨", "당황", "분노", "불안", "슬픔"]
-                emotion_scores = {
-                    "기쁨": 0.0,
-                    "사랑": 0.0,
-                    "놀람": 0.0,
-                    "두려움": 0.0,
-                    "분노": 0.0,
-                    "부끄러움": 0.0,
-                    "슬픔": 0.0
-                }
-                
-                # 직접 매칭되는 감정
-                emotion_scores["기쁨"] = model_scores.get("기쁨", 0.0)
-                emotion_scores["분노"] = model_scores.get("분노", 0.0)
-                emotion_scores["슬픔"] = model_scores.get("슬픔", 0.0)
-                
-                # 매핑이 필요한 감정들
-                # "불안" → "두려움" (100% 그대로 사용)
-                fear_score = model_scores.get("불안", 0.0)
-                emotion_scores["두려움"] = fear_score
-                
-                # "당황" → "놀람" + "부끄러움" (키워드 기반 분산)
-                panic_score = model_scores.get("당황", 0.0)
-                if panic_score > 0:
-                    # 놀람 관련 키워드
-                    surprise_keywords = [
-                        "놀라", "놀랐", "놀람", "충격", "황당", "어이없", "신기", "대박",
-                        "기쁜 소식", "좋은 소식", "반가운", "합격", "성공", "축하",
-                        "실망", "문제 생겼", "사고", "망했", "나쁜 소식", "멘붕", "큰일"
-                    ]
-                    # 부끄러움 관련 키워드
-                    shy_keywords = [
-                        "부끄러", "부끄럽", "창피", "민망", "수치심", "망신", "무안",
-                        "머쓱", "당황", "난처", "설레", "두근", "얼굴 빨개졌",
-                        "좋아하는 사람", "썸", "욕먹었", "오해받", "실수해서", "잘못해서"
-                    ]
-                    
-                    text_lower = text.lower()
-                    surprise_count = sum(1 for keyword in surprise_keywords if keyword in text_lower)
-                    shy_count = sum(1 for keyword in shy_keywords if keyword in text_lower)
-                    
-                    # 키워드 기반 분산
-                    if surprise_count > 0 or shy_count > 0:
-                        total_count = surprise_count + shy_count
-                        if total_count > 0:
-                            # 키워드 비율에 따라 분산
-                            surprise_ratio = surprise_count / total_count
-                            shy_ratio = shy_count / total_count
-                        else:
-                            # 키워드가 둘 다 있으면 균등 분산
-                            surprise_ratio = 0.5
-                            shy_ratio = 0.5
-                    else:
-                        # 키워드가 없으면 기본적으로 놀람에 더 많이 할당 (당황의 본질)
-                        surprise_ratio = 0.7
-                        shy_ratio = 0.3
-                    
-                    emotion_scores["놀람"] += panic_score * surprise_ratio
-                    emotion_scores["부끄러움"] += panic_score * shy_ratio
-                else:
-                    # 당황 점수가 0이면 분산하지 않음
-                    pass
-                
-                # "기쁨" → "사랑" 매핑 (키워드 기반)
-                love_keywords = [
-                    "사랑", "좋아", "애정", "그리움", "보고싶", "그리워", "사랑해", "좋아해",
-                    "예뻐", "귀여워", "소중", "소중해", "사랑스러워", "고마워", "감사", "고마",
-                    "사랑한다", "좋아한다", "그리워해", "보고파", "보고싶어", "좋아하는", "사랑하는",
-                    "마음에 들어", "정들었", "애정", "애착", "사랑스럽"
-                ]
-                text_lower = text.lower()
-                love_count = sum(1 for keyword in love_keywords if keyword in text_lower)
-                
-                if love_count > 0 and emotion_scores["기쁨"] > 0:
-                    # "기쁨" 점수의 30%를 "사랑"으로 재분배
-                    love_portion = emotion_scores["기쁨"] * 0.3
-                    emotion_scores["기쁨"] -= love_portion
-                    emotion_scores["사랑"] += love_portion
-                
-                # 정규화 (합이 1이 되도록)
-                total = sum(emotion_scores.values())
-                if total > 0:
-                    emotion_scores = {k: v / total for k, v in emotion_scores.items()}
-                else:
-                    base = 1.0 / len(emotion_scores)
-                    emotion_scores = {k: base for k in emotion_scores}
-                
-                # 최종 라벨
-                label = max(emotion_scores.items(), key=lambda x: x[1])[0]
-                
-                print("[Transformers] 최종 결과 반환")
-                return {"label": label, "scores": emotion_scores, "model_type": "transformers"}
+def _map_transformers_scores(text: str, model_scores: Dict[str, float]) -> Dict:
+    """모델의 5개 라벨 확률 → 7개 감정 결과 (predict / predict_batch 공통)"""
+    # 모델 라벨 → 7개 감정 시스템 매핑
+    # 모델 라벨: ["기쁨", "당황", "분노", "불안", "슬픔"]
+    emotion_scores = {
+        "기쁨": 0.0,
+        "사랑": 0.0,
+        "놀람": 0.0,
+        "두려움": 0.0,
+        "분노": 0.0,
+        "부끄러움": 0.0,
+        "슬픔": 0.0
+    }
+    
+    # 직접 매칭되는 감정
+    emotion_scores["기쁨"] = model_scores.get("기쁨", 0.0)
+    emotion_scores["분노"] = model_scores.get("분노", 0.0)
+    emotion_scores["슬픔"] = model_scores.get("슬픔", 0.0)
+    
+    # 매핑이 필요한 감정들
+    # "불안" → "두려움" (100% 그대로 사용)
+    fear_score = model_scores.get("불안", 0.0)
+    emotion_scores["두려움"] = fear_score
+    
+    # "당황" → "놀람" + "부끄러움" (키워드 기반 분산)
+    panic_score = model_scores.get("당황", 0.0)
+    if panic_score > 0:
+        # 놀람 관련 키워드
+        surprise_keywords = [
+            "놀라", "놀랐", "놀람", "충격", "황당", "어이없", "신기", "대박",
+            "기쁜 소식", "좋은 소식", "반가운", "합격", "성공", "축하",
+            "실망", "문제 생겼", "사고", "망했", "나쁜 소식", "멘붕", "큰일"
+        ]
+        # 부끄러움 관련 키워드
+        shy_keywords = [
+            "부끄러", "부끄럽", "창피", "민망", "수치심", "망신", "무안",
+            "머쓱", "당황", "난처", "설레", "두근", "얼굴 빨개졌",
+            "좋아하는 사람", "썸", "욕먹었", "오해받", "실수해서", "잘못해서"
+        ]
+        
+        text_lower = text.lower()
+        surprise_count = sum(1 for keyword in surprise_keywords if keyword in text_lower)
+        shy_count = sum(1 for keyword in shy_keywords if keyword in text_lower)
+        
+        # 키워드 기반 분산
+        if surprise_count > 0 or shy_count > 0:
+            total_count = surprise_count + shy_count
+            if total_count > 0:
+                # 키워드 비율에 따라 분산
+                surprise_ratio = surprise_count / total_count
+                shy_ratio = shy_count / total_count
             else:
-                print("[Transformers] 예측 결과가 비어있습니다. fallback으로 진행")
-        except Exception as e:
-            import traceback
-            print(f"[Transformers] 모델 예측 중 오류: {e}")
-            print(f"[Transformers] 상세 에러:")
-            traceback.print_exc()
-            # fallback으로 계속 진행
+                # 키워드가 둘 다 있으면 균등 분산
+                surprise_ratio = 0.5
+                shy_ratio = 0.5
+        else:
+            # 키워드가 없으면 기본적으로 놀람에 더 많이 할당 (당황의 본질)
+            surprise_ratio = 0.7
+            shy_ratio = 0.3
+        
+        emotion_scores["놀람"] += panic_score * surprise_ratio
+        emotion_scores["부끄러움"] += panic_score * shy_ratio
+    else:
+        # 당황 점수가 0이면 분산하지 않음
+        pass
+    
+    # "기쁨" → "사랑" 매핑 (키워드 기반)
+    love_keywords = [
+        "사랑", "좋아", "애정", "그리움", "보고싶", "그리워", "사랑해", "좋아해",
+        "예뻐", "귀여워", "소중", "소중해", "사랑스러워", "고마워", "감사", "고마",
+        "사랑한다", "좋아한다", "그리워해", "보고파", "보고싶어", "좋아하는", "사랑하는",
+        "마음에 들어", "정들었", "애정", "애착", "사랑스럽"
+    ]
+    text_lower = text.lower()
+    love_count = sum(1 for keyword in love_keywords if keyword in text_lower)
+    
+    if love_count > 0 and emotion_scores["기쁨"] > 0:
+        # "기쁨" 점수의 30%를 "사랑"으로 재분배
+        love_portion = emotion_scores["기쁨"] * 0.3
+        emotion_scores["기쁨"] -= love_portion
+        emotion_scores["사랑"] += love_portion
+    
+    # 정규화 (합이 1이 되도록)
+    total = sum(emotion_scores.values())
+    if total > 0:
+        emotion_scores = {k: v / total for k, v in emotion_scores.items()}
+    else:
+        base = 1.0 / len(emotion_scores)
+        emotion_scores = {k: base for k in emotion_scores}
+    
+    # 최종 라벨
+    label = max(emotion_scores.items(), key=lambda x: x[1])[0]
+    
+    return {"label": label, "scores": emotion_scores, "model_type": "transformers"}
 
-    # fallback
+
+def _heuristic_result(text: str) -> Dict:
+    """키워드 휴리스틱 결과 → 7개 감정 결과 (모델이 없거나 실패했을 때)"""
     label, scores = _heuristic_predict(text)
     
     # heuristic 결과도 7개 감정으로 매핑
@@ -374,3 +524,184 @@ def predict(text: str) -> Dict:
     label = max(emotion_scores.items(), key=lambda x: x[1])[0]
     
     return {"label": label, "scores": emotion_scores, "model_type": "heuristic"}
+
+
+def _uniform_result() -> Dict:
+    """빈 입력 → 균등 분포 (7개 감정)"""
+    base = 1.0 / 7
+    return {
+        "label": "기쁨", 
+        "scores": {
+            "기쁨": base, "사랑": base, "놀람": base, "두려움": base,
+            "분노": base, "부끄러움": base, "슬픔": base
+        },
+        "model_type": "heuristic"
+    }
+
+
+def model_version() -> str:
+    """캐시 키용 모델 식별자 (모델 경로 + 버전 + 추론 백엔드)"""
+    backend = "torch"
+    if EMOTION_ML_BACKEND == "onnx":
+        backend = "onnx-int8" if EMOTION_ML_ONNX_INT8 else "onnx"
+    windows = f"w{MAX_CHUNKS}s{CHUNK_STRIDE}" if CHUNKING_ENABLED else "trunc"
+    return f"{TRANSFORMERS_MODEL_PATH}@{MODEL_VERSION}/{backend}/{windows}"
+
+
+def _cache_key(text: str) -> str:
+    return inference_cache.text_key(text, model_version())
+
+
+def _cache_result(key: str, result: Dict) -> None:
+    # 휴리스틱 결과는 모델이 다시 로드되면 바뀌어야 하므로 저장하지 않음
+    if result.get("model_type") == "transformers":
+        _prediction_cache.put(key, result)
+
+
+def get_cached_prediction(text: str) -> Optional[Dict]:
+    """캐시에 있는 예측 결과 (없으면 None)"""
+    if not text or not text.strip():
+        return None
+    return _prediction_cache.get(_cache_key(text))
+
+
+def predict(text: str, cache_lookup: bool = True) -> Dict:
+    if not text or not text.strip():
+        return _uniform_result()
+
+    cache_key = _cache_key(text)
+    if cache_lookup:
+        cached = _prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    # 0순위: 공유 모델 서버 (services/model_server.py)
+    remote = model_client.classify([text])
+    if remote is not None:
+        _cache_result(cache_key, remote[0])
+        return remote[0]
+
+    # 1순위: Transformers 모델 사용
+    if _load_transformers_model_if_available():
+        try:
+            print("[Transformers] 예측 시작")
+            model_scores = _predict_with_transformers(text)
+            
+            if model_scores:
+                print(f"[Transformers] 예측 성공: {model_scores}")
+                result = _map_transformers_scores(text, model_scores)
+                _cache_result(cache_key, result)
+                print("[Transformers] 최종 결과 반환")
+                return result
+            else:
+                print("[Transformers] 예측 결과가 비어있습니다. fallback으로 진행")
+        except Exception as e:
+            import traceback
+            print(f"[Transformers] 모델 예측 중 오류: {e}")
+            print(f"[Transformers] 상세 에러:")
+            traceback.print_exc()
+            # fallback으로 계속 진행
+
+    # fallback
+    return _heuristic_result(text)
+
+
+def predict_batch(texts: List[str], batch_size: Optional[int] = None, cache_lookup: bool = True) -> List[Dict]:
+    """
+    여러 텍스트의 감정을 한 번에 예측 (결과 형식/값은 텍스트마다 predict() 를 호출한 것과 같음)
+    
+    백필, 재분석 작업, 대량 조회 API 용 - 텍스트마다 forward pass 를 돌리지 않고 배치로 처리
+    캐시에 있는 텍스트는 빼고 나머지만 추론 (cache_lookup=False 면 조회 없이 추론 후 저장만)
+    """
+    batch_size = max(1, batch_size or PREDICT_BATCH_SIZE)
+    results: List[Optional[Dict]] = [None] * len(texts)
+    keys: Dict[int, str] = {}
+    pending = []
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            results[i] = _uniform_result()
+            continue
+        keys[i] = _cache_key(text)
+        cached = _prediction_cache.get(keys[i]) if cache_lookup else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+    
+    if pending:
+        remote = model_client.classify([texts[i] for i in pending])
+        if remote is not None:
+            for i, result in zip(pending, remote):
+                results[i] = result
+                _cache_result(keys[i], result)
+            return results
+    
+    if pending and _load_transformers_model_if_available():
+        try:
+            model_scores = _predict_batch_with_transformers([texts[i] for i in pending], batch_size)
+            for i, scores in zip(pending, model_scores):
+                if scores:
+                    results[i] = _map_transformers_scores(texts[i], scores)
+                    _cache_result(keys[i], results[i])
+            print(f"[Transformers] 배치 예측 완료: {len(pending)}개 (batch_size={batch_size})")
+        except Exception as e:
+            import traceback
+            print(f"[Transformers] 배치 예측 중 오류: {e}")
+            traceback.print_exc()
+    
+    # 모델이 없거나 실패한 텍스트는 predict() 와 같은 fallback
+    return [result if result is not None else _heuristic_result(texts[i]) for i, result in enumerate(results)]
+
+
+def compare_batch_with_single(texts: List[str], batch_size: Optional[int] = None) -> float:
+    """predict_batch 와 predict 결과의 최대 점수 차이 (동일성 확인용, 라벨이 다르면 1.0)"""
+    batch = predict_batch(texts, batch_size, cache_lookup=False)
+    max_diff = 0.0
+    for text, batched in zip(texts, batch):
+        single = predict(text, cache_lookup=False)
+        if single["label"] != batched["label"] or single["model_type"] != batched["model_type"]:
+            return 1.0
+        for key, value in single["scores"].items():
+            max_diff = max(max_diff, abs(value - batched["scores"].get(key, 0.0)))
+    return max_diff
+
+
+# =========================================
+# 긴 일기 벤치마크 (python -m services.emotion_ml)
+# =========================================
+
+def benchmark_lengths(lengths: Tuple[int, ...] = (200, 500, 1000, 2000, 4000, 8000), repeat: int = 5) -> List[Dict]:
+    """일기 길이(글자 수)별 window 방식 vs 512 토큰 자르기 - 지연 시간(중앙값)과 라벨"""
+    global CHUNKING_ENABLED
+    from services.emotion_onnx import SAMPLE_CORPUS
+    
+    if not _load_transformers_model_if_available():
+        raise RuntimeError("모델을 불러오지 못했습니다.")
+    
+    corpus = " ".join(SAMPLE_CORPUS)
+    chunking = CHUNKING_ENABLED
+    rows = []
+    try:
+        for length in lengths:
+            text = (corpus * (length // len(corpus) + 1))[:length]
+            row = {"chars": length, "tokens": len(_tokenizer(text, add_special_tokens=False)["input_ids"])}
+            for mode, enabled in (("window", True), ("truncate", False)):
+                CHUNKING_ENABLED = enabled
+                row[f"{mode}_inputs"] = len(_text_windows([text])[0])
+                _predict_windows([text], max(1, MAX_CHUNKS))  # 워밍업
+                latencies = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    scores = _predict_windows([text], max(1, MAX_CHUNKS))[0]
+                    latencies.append((time.perf_counter() - started) * 1000)
+                row[f"{mode}_ms"] = round(float(np.median(latencies)), 1)
+                row[f"{mode}_label"] = max(scores.items(), key=lambda x: x[1])[0]
+            rows.append(row)
+    finally:
+        CHUNKING_ENABLED = chunking
+    return rows
+
+
+if __name__ == "__main__":
+    for result in benchmark_lengths():
+        print(json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,321 @@
+"""
+감정 분석 모델 ONNX Runtime 백엔드
+
+- EMOTION_ML_BACKEND=onnx 이면 emotion_ml 이 PyTorch 대신 이 모듈의 세션으로 추론
+  (torch 없이 onnxruntime + tokenizer 만으로 동작, CPU 추론이 더 빠르고 메모리를 덜 씀)
+- EMOTION_ML_ONNX_INT8=true 이면 동적 int8 양자화 모델 사용 (더 작고 빠르지만 점수가 조금 달라짐)
+
+사용법 (backend 디렉터리에서):
+    python -m services.emotion_onnx export [--int8]     # 모델 폴더의 onnx/ 아래로 변환
+    python -m services.emotion_onnx parity [--int8] [--corpus 파일]   # PyTorch 결과와 비교
+    python -m services.emotion_onnx bench [--backend torch|onnx|onnx-int8|all]
+"""
+import os
+import sys
+import json
+import time
+import inspect
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.model_registry import rss_mb as _rss_mb
+
+try:
+    import onnxruntime as ort  # type: ignore
+    ONNX_AVAILABLE = True
+except Exception:
+    ort = None  # type: ignore
+    ONNX_AVAILABLE = False
+
+ONNX_OPSET = 14
+ONNX_FILENAME = "model.onnx"
+ONNX_INT8_FILENAME = "model.int8.onnx"
+
+# parity / 벤치마크용 기본 한국어 일기 문장 (--corpus 로 파일을 주면 그 파일의 줄 단위 텍스트 사용)
+SAMPLE_CORPUS = [
+    "오늘 친구들이랑 놀이공원에 가서 하루 종일 웃었다. 정말 행복한 하루였다.",
+    "시험 결과가 나왔는데 생각보다 점수가 낮아서 너무 속상하다.",
+    "회사에서 팀장님이 또 내 탓을 해서 화가 나서 참을 수가 없었다.",
+    "내일 발표가 있는데 잘할 수 있을지 걱정돼서 잠이 안 온다.",
+    "길에서 넘어졌는데 사람들이 다 쳐다봐서 너무 창피했다.",
+    "오랜만에 엄마가 해준 된장찌개를 먹으니 마음이 따뜻해졌다.",
+    "갑자기 합격 문자가 와서 깜짝 놀랐다! 믿기지가 않는다.",
+    "비가 오는 날이면 괜히 우울해지고 눈물이 난다.",
+    "강아지가 아파서 병원에 데려갔는데 별일 아니라서 다행이었다.",
+    "하루 종일 일만 해서 너무 피곤하고 지친다.",
+    "좋아하는 사람이 먼저 연락을 해줘서 설레서 잠이 안 온다.",
+    "친구가 약속을 또 어겨서 서운하고 짜증이 났다.",
+    "새로운 동아리에 들어갔는데 아는 사람이 없어서 조금 불안했다.",
+    "할머니가 보고 싶다. 어릴 때 같이 걷던 길을 지나니 그리워졌다.",
+    "프로젝트를 드디어 끝냈다. 뿌듯하고 홀가분하다!",
+    "지하철에서 지갑을 잃어버려서 멘붕이 왔다.",
+    "오늘은 특별한 일 없이 평범한 하루였다.",
+    "동생이랑 크게 싸웠다. 내가 너무 심하게 말한 것 같아 마음이 무겁다.",
+    "생일이라고 친구들이 깜짝 파티를 해줘서 감동받았다. 다들 고마워.",
+    "밤길을 혼자 걷는데 누가 따라오는 것 같아서 무서웠다.",
+]
+
+
+def onnx_model_path(model_dir: str, int8: bool = False) -> str:
+    """
+    EMOTION_ML_ONNX_PATH 가 있으면 그 경로(fp32 모델, int8 은 같은 폴더의 <이름>.int8.onnx),
+    없으면 <모델 폴더>/onnx/model(.int8).onnx
+    모델 경로가 Hugging Face Hub id(org/model)면 services/models/onnx/org__model/ 아래
+    """
+    explicit = os.environ.get("EMOTION_ML_ONNX_PATH")
+    if explicit:
+        if not int8:
+            return explicit
+        root, ext = os.path.splitext(explicit)
+        return f"{root}.int8{ext or '.onnx'}"
+    if os.path.isdir(model_dir):
+        onnx_dir = os.path.join(model_dir, "onnx")
+    else:
+        onnx_dir = os.path.join(os.path.dirname(__file__), "models", "onnx", model_dir.replace("/", "__"))
+    return os.path.join(onnx_dir, ONNX_INT8_FILENAME if int8 else ONNX_FILENAME)
+
+
+def _forward_inputs(model, sample: Dict[str, Any]) -> List[str]:
+    """
+    tokenizer 출력 중 forward() 의 앞쪽 인자와 순서대로 맞는 이름들 (forward 순서)
+    torch.onnx.export 는 입력을 위치 인자로 넘기고 input_names 도 그 순서로 붙이므로,
+    tokenizer 순서(input_ids, token_type_ids, attention_mask)를 그대로 쓰면 이름이 뒤바뀜
+    """
+    names = []
+    for name in inspect.signature(model.forward).parameters:
+        if name not in sample:
+            break
+        names.append(name)
+    skipped = [name for name in sample if name not in names]
+    if skipped:
+        print(f"⚠️ [ONNX] forward() 인자 순서상 넘길 수 없는 입력은 제외: {skipped}")
+    return names
+
+
+# =========================================
+# 변환 (PyTorch → ONNX → int8)
+# =========================================
+
+def export(model_dir: str, int8: bool = False) -> str:
+    """PyTorch 모델을 ONNX 로 변환 (int8=True 면 동적 양자화 모델도 생성). 생성된 파일 경로 반환"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    fp32_path = onnx_model_path(model_dir, int8=False)
+    os.makedirs(os.path.dirname(fp32_path), exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+
+    sample = tokenizer(["안녕하세요 오늘 하루는 어땠나요", "짧은 문장"], return_tensors="pt", padding=True)
+    input_names = _forward_inputs(model, sample)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    export_kwargs: Dict[str, Any] = {}
+    # torch 2.9+ 는 기본이 dynamo 변환기 (onnxscript 필요, dynamic_axes 대신 dynamic_shapes) → 기존 변환기 사용
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+
+    started = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            **export_kwargs,
+        )
+    print(f"✅ [ONNX] 변환 완료: {fp32_path} ({os.path.getsize(fp32_path) / 1024 / 1024:.1f}MB, {time.perf_counter() - started:.1f}s)")
+
+    if not int8:
+        return fp32_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+    int8_path = onnx_model_path(model_dir, int8=True)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"✅ [ONNX] int8 양자화 완료: {int8_path} ({os.path.getsize(int8_path) / 1024 / 1024:.1f}MB)")
+    return int8_path
+
+
+# =========================================
+# 추론 세션
+# =========================================
+
+class OnnxClassifier:
+    """onnxruntime 세션 + 입력 이름 (emotion_ml 이 tokenizer 출력을 그대로 넘김)"""
+
+    def __init__(self, path: str, threads: Optional[int] = None):
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("onnxruntime이 설치되지 않았습니다.")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"ONNX 모델 파일이 없습니다: {path} (python -m services.emotion_onnx export 로 생성)")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = threads or int(os.environ.get("EMOTION_ML_ONNX_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def probs(self, inputs: Dict[str, Any]) -> np.ndarray:
+        """tokenizer 출력 (return_tensors="np") → softmax 확률 (batch, 라벨 수)"""
+        feed = {name: np.asarray(inputs[name], dtype=np.int64) for name in self.input_names if name in inputs}
+        logits = self.session.run(["logits"], feed)[0].astype(np.float32)
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def load_classifier(model_dir: str, int8: bool = False) -> OnnxClassifier:
+    return OnnxClassifier(onnx_model_path(model_dir, int8=int8))
+
+
+# =========================================
+# PyTorch 결과와 비교 (parity)
+# =========================================
+
+def load_corpus(path: Optional[str]) -> List[str]:
+    if not path:
+        return list(SAMPLE_CORPUS)
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def parity(model_dir: str, texts: List[str], int8: bool = False, atol: float = 1e-4) -> Dict[str, Any]:
+    """
+    같은 텍스트를 PyTorch / ONNX 로 예측해서 비교
+    - max_abs_diff: 5개 라벨 확률의 최대 차이 (fp32 는 atol 이하여야 통과)
+    - label_agreement: 최상위 라벨 일치 비율 (int8 은 이 값으로 판단)
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+    classifier = load_classifier(model_dir, int8=int8)
+
+    diffs, agree = [], 0
+    for text in texts:
+        pt_inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+        with torch.no_grad():
+            torch_probs = torch.softmax(model(**pt_inputs).logits, dim=-1)[0].numpy()
+        onnx_probs = classifier.probs(tokenizer(text, return_tensors="np", truncation=True, max_length=512))[0]
+        diffs.append(float(np.max(np.abs(torch_probs - onnx_probs))))
+        agree += int(np.argmax(torch_probs) == np.argmax(onnx_probs))
+
+    result = {
+        "backend": "onnx-int8" if int8 else "onnx",
+        "texts": len(texts),
+        "max_abs_diff": max(diffs) if diffs else 0.0,
+        "mean_abs_diff": float(np.mean(diffs)) if diffs else 0.0,
+        "label_agreement": agree / len(texts) if texts else 1.0,
+    }
+    result["passed"] = result["label_agreement"] == 1.0 if int8 else result["max_abs_diff"] <= atol
+    return result
+
+
+# =========================================
+# 지연 시간 / 메모리 벤치마크
+# =========================================
+
+def benchmark(backend: str, texts: List[str], repeat: int = 3, batch_size: int = 16) -> Dict[str, Any]:
+    """
+    현재 프로세스에서 backend(torch | onnx | onnx-int8)로 모델을 올리고 측정
+    (메모리를 정확히 재려면 backend 마다 새 프로세스에서 실행 - bench --backend all)
+    """
+    os.environ["EMOTION_ML_BACKEND"] = "onnx" if backend.startswith("onnx") else "torch"
+    os.environ["EMOTION_ML_ONNX_INT8"] = "true" if backend == "onnx-int8" else "false"
+    rss_before = _rss_mb()
+
+    started = time.perf_counter()
+    from services import emotion_ml
+    # 이미 import 된 경우에도 요청한 백엔드로 로드되도록 모듈 설정을 맞춤
+    emotion_ml.EMOTION_ML_BACKEND = os.environ["EMOTION_ML_BACKEND"]
+    emotion_ml.EMOTION_ML_ONNX_INT8 = backend == "onnx-int8"
+    if not emotion_ml._load_transformers_model_if_available():
+        raise RuntimeError(f"{backend} 모델을 불러오지 못했습니다.")
+    load_s = time.perf_counter() - started
+    if emotion_ml.active_backend() != backend:
+        raise RuntimeError(f"{backend} 대신 {emotion_ml.active_backend()} 백엔드가 사용되었습니다.")
+    rss_loaded = _rss_mb()
+
+    emotion_ml._predict_with_transformers(texts[0])  # 워밍업
+    latencies = []
+    for _ in range(repeat):
+        for text in texts:
+            t0 = time.perf_counter()
+            emotion_ml._predict_with_transformers(text)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        emotion_ml._predict_batch_with_transformers(texts, batch_size)
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "rss_model_mb": round(rss_loaded - rss_before, 1),
+        "rss_peak_mb": round(max(rss_loaded, _rss_mb()), 1),
+        "single_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "single_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "batch_texts_per_s": round(len(texts) * repeat / batch_s, 1) if batch_s else 0.0,
+    }
+
+
+def _benchmark_in_subprocess(backend: str, corpus: Optional[str]) -> Dict[str, Any]:
+    cmd = [sys.executable, "-m", "services.emotion_onnx", "bench", "--backend", backend, "--json"]
+    if corpus:
+        cmd += ["--corpus", corpus]
+    backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    out = subprocess.run(cmd, cwd=backend_dir, capture_output=True, text=True)
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"backend": backend, "error": (out.stderr or out.stdout).strip().splitlines()[-1:]}
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="감정 분석 모델 ONNX 변환 / parity / 벤치마크")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export")
+    p_export.add_argument("--int8", action="store_true")
+    p_parity = sub.add_parser("parity")
+    p_parity.add_argument("--int8", action="store_true")
+    p_parity.add_argument("--corpus")
+    p_bench = sub.add_parser("bench")
+    p_bench.add_argument("--backend", default="all", choices=["torch", "onnx", "onnx-int8", "all"])
+    p_bench.add_argument("--corpus")
+    p_bench.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command in ("export", "parity"):
+        from services.emotion_ml import TRANSFORMERS_MODEL_PATH
+
+    if args.command == "export":
+        export(TRANSFORMERS_MODEL_PATH, int8=args.int8)
+    elif args.command == "parity":
+        result = parity(TRANSFORMERS_MODEL_PATH, load_corpus(args.corpus), int8=args.int8)
+        print(json.dumps(result, ensure_ascii=False))
+        sys.exit(0 if result["passed"] else 1)
+    elif args.backend == "all":
+        for backend in ("torch", "onnx", "onnx-int8"):
+            print(json.dumps(_benchmark_in_subprocess(backend, args.corpus), ensure_ascii=False))
+    else:
+        result = benchmark(args.backend, load_corpus(args.corpus))
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+추론 결과 캐시 (감정 분석 결과 / 문장 임베딩)
+
+같은 일기 내용을 /analyze2, 일기 교체, 유사 일기 검색 등에서 반복해서 추론하지 않도록
+정규화한 텍스트 해시 + 모델 버전을 키로 결과를 저장
+
+- 프로세스 안 LRU: 항목 수 / 바이트 크기 상한을 넘으면 오래 안 쓴 항목부터 제거
+- INFERENCE_CACHE_PATH 를 지정하면 SQLite 파일에도 저장 → 재시작 후에도 자주 쓰던 항목을 재사용
+  (메모리에 없으면 파일에서 읽어서 메모리로 올림, 파일은 namespace 마다 최근 사용 순으로 최대 개수 유지)
+- 캐시별 hit / miss / eviction 통계 → GET /health/ml
+"""
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+CACHE_ENABLED = os.environ.get("INFERENCE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+MAX_ENTRIES = int(os.environ.get("INFERENCE_CACHE_MAX_ENTRIES", "20000"))
+MAX_MB = float(os.environ.get("INFERENCE_CACHE_MAX_MB", "64"))
+PERSIST_PATH = os.environ.get("INFERENCE_CACHE_PATH", "")
+PERSIST_MAX_ENTRIES = int(os.environ.get("INFERENCE_CACHE_PERSIST_MAX", "100000"))
+# 파일 tier 는 쓰기 이만큼마다 한 번씩 오래된 항목 정리
+_PRUNE_EVERY = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """유니코드 정규화(NFC) + 공백 정리 - 공백/조합 방식만 다른 같은 내용은 같은 키"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def text_key(text: str, model_version: str) -> str:
+    digest = hashlib.sha256(model_version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# =========================================
+# 파일 tier (SQLite, 여러 워커 프로세스가 같이 사용)
+# =========================================
+
+class _PersistentStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # fork 된 워커에서는 부모의 연결을 쓰지 않고 새로 연결
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS inference_cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_inference_cache_accessed ON inference_cache (namespace, accessed_at)")
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value FROM inference_cache WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE inference_cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (time.time(), namespace, key),
+                )
+                return bytes(row[0])
+        except sqlite3.Error as e:
+            print(f"⚠️ [추론 캐시] 파일 캐시 읽기 실패: {e}")
+            return None
+
+    def put(self, namespace: str, key: str, value: bytes) -> None:
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    """
+                    INSERT INTO inference_cache (namespace, key, value, accessed_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, accessed_at = excluded.accessed_at
+                    """,
+                    (namespace, key, sqlite3.Binary(value), time.time()),
+                )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    conn.execute(
+                        """
+                        DELETE FROM inference_cache WHERE namespace = ? AND key IN (
+                            SELECT key FROM inference_cache WHERE namespace = ?
+                            ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                        )
+                        """,
+                        (namespace, namespace, PERSIST_MAX_ENTRIES),
+                    )
+        except sqlite3.Error as e:
+            print(f"⚠️ [추론 캐시] 파일 캐시 쓰기 실패: {e}")
+
+
+# =========================================
+# 메모리 LRU
+# =========================================
+
+class InferenceCache:
+    """namespace 하나(예: emotion, embedding)의 LRU - 값은 encode/decode 로 bytes 로 저장 (크기 계산 + 호출자별 사본)"""
+
+    def __init__(self, namespace: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+                 max_entries: int = MAX_ENTRIES, max_mb: float = MAX_MB,
+                 store: Optional[_PersistentStore] = None):
+        self.namespace = namespace
+        self._encode = encode
+        self._decode = decode
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._store = store
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0}
+
+    def _insert(self, key: str, data: bytes) -> None:
+        """lock 보유 상태에서 호출"""
+        if len(data) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._items[key] = data
+        self._bytes += len(data)
+        while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        if not CACHE_ENABLED:
+            return None
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self._stats["hits"] += 1
+        if data is None and self._store is not None:
+            data = self._store.get(self.namespace, key)
+            if data is not None:
+                with self._lock:
+                    self._insert(key, data)
+                    self._stats["persistent_hits"] += 1
+        if data is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        return self._decode(data)
+
+    def put(self, key: str, value: Any) -> None:
+        if not CACHE_ENABLED:
+            return
+        data = self._encode(value)
+        with self._lock:
+            self._insert(key, data)
+        if self._store is not None:
+            self._store.put(self.namespace, key, data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result: Dict[str, Any] = dict(self._stats)
+            result.update({
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            })
+        lookups = result["hits"] + result["persistent_hits"] + result["misses"]
+        result["hit_rate"] = (result["hits"] + result["persistent_hits"]) / lookups if lookups else 0.0
+        return result
+
+
+_store = _PersistentStore(PERSIST_PATH) if PERSIST_PATH else None
+_caches: Dict[str, InferenceCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any]) -> InferenceCache:
+    """namespace 별 캐시 (처음 호출 시 생성)"""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = InferenceCache(namespace, encode, decode, store=_store)
+            _caches[namespace] = cache
+        return cache
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """현재 워커 프로세스의 캐시 통계"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {
+        "enabled": CACHE_ENABLED,
+        "persist_path": PERSIST_PATH or None,
+        "caches": {cache.namespace: cache.stats() for cache in caches},
+    }
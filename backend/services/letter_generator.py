@@ -1,25 +1,18 @@
-from typing import Dict, Any, Optional
-from core.common import client, CHARACTERS
+import json
+import re
+from typing import Dict, Any, List, Optional
+from core.common import client, async_client, CHARACTERS
 
+LETTER_MODEL = "gpt-4o-mini"
 
-def generate_letter_with_gpt(
+
+def build_letter_messages(
     letter_type: str,
     emotion_scores: Optional[Dict[str, Any]] = None,
     diary_text: str = "",
     fruit_count: Optional[int] = None
-) -> Dict[str, str]:
-    """
-    GPT를 사용하여 편지 생성
-    
-    Args:
-        letter_type: 'emotion_high', 'celebration', 'comfort', 'cheer', 'well_overflow'
-        emotion_scores: 감정 점수 정보
-        diary_text: 일기 내용
-        fruit_count: 열매 개수
-    
-    Returns:
-        {'title': str, 'content': str, 'from': str}
-    """
+) -> List[Dict[str, str]]:
+    """편지 타입별 프롬프트 (동기 / 비동기 호출 공용)"""
     emotion_scores = emotion_scores or {}
     diary_text = diary_text or ""
     
@@ -140,54 +133,96 @@ def generate_letter_with_gpt(
   "content": "편지 내용",
   "from": "감정 마을"
 }}"""
+
+    return [
+        {
+            "role": "system",
+            "content": "당신은 감정 마을의 주민입니다. 사용자에게 따뜻하고 진심어린 편지를 작성해주세요. 반드시 JSON 형식으로만 출력하세요."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def _parse_letter(reply: str) -> Dict[str, str]:
+    """GPT 응답에서 편지 JSON 추출 (JSON 이 없으면 응답 전체를 내용으로 사용)"""
+    # JSON 부분 추출
+    json_match = re.search(r'\{[^{}]*\}', reply, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(0)
+        letter_data = json.loads(json_str)
+        
+        return {
+            'title': letter_data.get('title', '💌 주민들의 편지'),
+            'content': letter_data.get('content', ''),
+            'from': letter_data.get('from', '감정 마을')
+        }
+    else:
+        # JSON이 없으면 기본값 반환
+        return {
+            'title': '💌 주민들의 편지',
+            'content': reply.strip(),
+            'from': '감정 마을'
+        }
+
+
+def _fallback_letter() -> Dict[str, str]:
+    # 오류 발생 시 기본 편지
+    return {
+        'title': '💌 주민들의 편지',
+        'content': '안녕하세요. 오늘 하루 고생 많으셨어요. 내일도 화이팅!',
+        'from': '감정 마을'
+    }
+
+
+def generate_letter_with_gpt(
+    letter_type: str,
+    emotion_scores: Optional[Dict[str, Any]] = None,
+    diary_text: str = "",
+    fruit_count: Optional[int] = None
+) -> Dict[str, str]:
+    """
+    GPT를 사용하여 편지 생성
     
+    Args:
+        letter_type: 'emotion_high', 'celebration', 'comfort', 'cheer', 'well_overflow'
+        emotion_scores: 감정 점수 정보
+        diary_text: 일기 내용
+        fruit_count: 열매 개수
+    
+    Returns:
+        {'title': str, 'content': str, 'from': str}
+    """
     try:
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "당신은 감정 마을의 주민입니다. 사용자에게 따뜻하고 진심어린 편지를 작성해주세요. 반드시 JSON 형식으로만 출력하세요."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            model=LETTER_MODEL,
+            messages=build_letter_messages(letter_type, emotion_scores, diary_text, fruit_count),
             temperature=0.8,
             max_tokens=800
         )
-        
-        reply = response.choices[0].message.content or ""
-        
-        # JSON 추출
-        import json
-        import re
-        
-        # JSON 부분 추출
-        json_match = re.search(r'\{[^{}]*\}', reply, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            letter_data = json.loads(json_str)
-            
-            return {
-                'title': letter_data.get('title', '💌 주민들의 편지'),
-                'content': letter_data.get('content', ''),
-                'from': letter_data.get('from', '감정 마을')
-            }
-        else:
-            # JSON이 없으면 기본값 반환
-            return {
-                'title': '💌 주민들의 편지',
-                'content': reply.strip(),
-                'from': '감정 마을'
-            }
-            
+        return _parse_letter(response.choices[0].message.content or "")
     except Exception as e:
         print(f"[편지 생성 오류] {e}")
-        # 오류 발생 시 기본 편지 반환
-        return {
-            'title': '💌 주민들의 편지',
-            'content': '안녕하세요. 오늘 하루 고생 많으셨어요. 내일도 화이팅!',
-            'from': '감정 마을'
-        }
+        return _fallback_letter()
+
+
+async def generate_letter_with_gpt_async(
+    letter_type: str,
+    emotion_scores: Optional[Dict[str, Any]] = None,
+    diary_text: str = "",
+    fruit_count: Optional[int] = None
+) -> Dict[str, str]:
+    """generate_letter_with_gpt 의 asyncio 버전 (ASGI 모드, asgi.py)"""
+    try:
+        response = await async_client.chat.completions.create(
+            model=LETTER_MODEL,
+            messages=build_letter_messages(letter_type, emotion_scores, diary_text, fruit_count),
+            temperature=0.8,
+            max_tokens=800
+        )
+        return _parse_letter(response.choices[0].message.content or "")
+    except Exception as e:
+        print(f"[편지 생성 오류] {e}")
+        return _fallback_letter()
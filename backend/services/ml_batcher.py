@@ -0,0 +1,170 @@
+"""
+감정 분석(ML) 요청 마이크로 배칭
+
+동시에 들어온 /analyze2?mode=ml 요청을 몇 ms 동안 모아서 emotion_ml.predict_batch 로
+한 번의 forward pass 에 처리하고, 각 요청에 자기 결과를 돌려줌 (엔드포인트 응답 형식은 그대로)
+
+- 워커 프로세스마다 백그라운드 스레드 1개 (fork 이후 첫 요청 때 시작)
+- EMOTION_ML_BATCH_WAIT_MS 동안 또는 EMOTION_ML_BATCH_MAX 개가 모일 때까지 대기
+- 첫 요청을 꺼냈을 때 대기열이 비어 있으면(요청이 하나뿐이면) 기다리지 않고 바로 처리,
+  이미 다른 요청이 쌓여 있을 때만(앞 배치를 처리하는 동안 겹쳐 들어온 경우) 대기 시간을 적용
+- gunicorn 을 스레드 워커(--threads)로 띄워야 한 프로세스 안에서 요청이 겹침
+"""
+import os
+import time
+import queue
+import threading
+from functools import partial
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services import emotion_ml, model_client
+
+COALESCE_ENABLED = os.environ.get("EMOTION_ML_COALESCE", "true").lower() in ("1", "true", "yes")
+BATCH_WAIT_MS = float(os.environ.get("EMOTION_ML_BATCH_WAIT_MS", "5"))
+BATCH_MAX = int(os.environ.get("EMOTION_ML_BATCH_MAX", str(emotion_ml.PREDICT_BATCH_SIZE)))
+RESULT_TIMEOUT = float(os.environ.get("EMOTION_ML_BATCH_TIMEOUT", "60"))
+
+
+class MicroBatcher:
+    """submit() 호출을 모아서 batch_fn(items) 한 번으로 처리"""
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_wait_ms: float, max_batch: int, name: str = "batcher"):
+        self._batch_fn = batch_fn
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.name = name
+        self._queue: "queue.Queue[Tuple[Any, Future, float]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, float]:
+        return {
+            "submitted": 0,
+            "batches": 0,
+            "items": 0,
+            "errors": 0,
+            "max_batch_seen": 0,
+            "max_queue_depth": 0,
+            "queue_wait_ms_total": 0.0,
+            "queue_wait_ms_max": 0.0,
+            "batch_ms_total": 0.0,
+        }
+
+    def _ensure_worker(self):
+        # fork 된 워커 프로세스에는 부모의 스레드가 없으므로 pid 가 바뀌면 새로 시작
+        with self._lock:
+            pid = os.getpid()
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue()
+                self._stats = self._empty_stats()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-worker", daemon=True)
+            self._thread.start()
+
+    def submit(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """item 을 큐에 넣고 배치 처리 결과를 기다림 (batch_fn 이 실패하면 그 예외를 다시 던짐)"""
+        return self.submit_many([item], timeout)[0]
+
+    def submit_many(self, items: List[Any], timeout: Optional[float] = None) -> List[Any]:
+        """여러 item 을 한꺼번에 큐에 넣고 모든 결과를 순서대로 기다림 (다른 요청과 같은 배치로 묶일 수 있음)"""
+        self._ensure_worker()
+        enqueued = time.monotonic()
+        futures: List[Future] = []
+        for item in items:
+            future: Future = Future()
+            self._queue.put((item, future, enqueued))
+            futures.append(future)
+        with self._lock:
+            self._stats["submitted"] += len(items)
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+        deadline = enqueued + (RESULT_TIMEOUT if timeout is None else timeout)
+        return [future.result(timeout=max(0.0, deadline - time.monotonic())) for future in futures]
+
+    def _collect(self) -> List[Tuple[Any, Future, float]]:
+        batch = [self._queue.get()]
+        if self._queue.empty():
+            # 겹친 요청이 없으면 혼자 처리 (대기 시간만큼 지연시키지 않음)
+            return batch
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self._batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"배치 결과 개수 불일치: {len(results)} != {len(items)}")
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+                failed = False
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                failed = True
+
+            finished = time.monotonic()
+            with self._lock:
+                stats = self._stats
+                stats["batches"] += 1
+                stats["items"] += len(batch)
+                stats["errors"] += int(failed)
+                stats["max_batch_seen"] = max(stats["max_batch_seen"], len(batch))
+                stats["batch_ms_total"] += (finished - started) * 1000
+                for _, _, enqueued in batch:
+                    wait_ms = (started - enqueued) * 1000
+                    stats["queue_wait_ms_total"] += wait_ms
+                    stats["queue_wait_ms_max"] = max(stats["queue_wait_ms_max"], wait_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result: Dict[str, Any] = dict(self._stats)
+            result.update({
+                "pid": os.getpid(),
+                "queue_depth": self._queue.qsize(),
+                "max_wait_ms": self.max_wait * 1000,
+                "max_batch": self.max_batch,
+                "avg_batch_size": (result["items"] / result["batches"]) if result["batches"] else 0.0,
+            })
+        return result
+
+
+# 캐시 조회는 큐에 넣기 전에 하므로 배치 안에서는 다시 조회하지 않음
+_batcher = MicroBatcher(partial(emotion_ml.predict_batch, cache_lookup=False), BATCH_WAIT_MS, BATCH_MAX, name="emotion-ml")
+
+
+def predict(text: str) -> Dict:
+    """emotion_ml.predict 와 같은 결과 - 동시에 들어온 요청과 묶어서 한 번에 추론"""
+    # 모델을 쓸 수 없으면 휴리스틱이라 배칭 이점이 없음 (공유 모델 서버를 쓰면 서버 쪽에서 배칭)
+    if not COALESCE_ENABLED or not emotion_ml.TRANSFORMERS_AVAILABLE or model_client.available() or not text or not text.strip():
+        return emotion_ml.predict(text)
+    cached = emotion_ml.get_cached_prediction(text)
+    if cached is not None:
+        return cached
+    try:
+        return _batcher.submit(text)
+    except Exception as e:
+        print(f"⚠️ [ML 배칭] 배치 예측 실패 - 단건 예측으로 대체: {e}")
+        return emotion_ml.predict(text)
+
+
+def get_batcher_stats() -> Dict[str, Any]:
+    """현재 워커 프로세스의 배칭 통계 (큐 길이, 평균 배치 크기, 대기 시간)"""
+    stats = _batcher.stats()
+    stats["enabled"] = COALESCE_ENABLED and emotion_ml.TRANSFORMERS_AVAILABLE
+    stats["backend"] = emotion_ml.active_backend()
+    return stats
@@ -0,0 +1,170 @@
+"""
+공유 모델 서버(services/model_server.py) 클라이언트
+
+gunicorn 워커마다 감정 분류 모델 / 문장 임베딩 모델을 올리지 않고,
+Unix 소켓으로 모델 서버 하나에 classify / embed 요청을 보냄
+
+- MODEL_SERVER_ENABLED=true 일 때만 사용 (기본: 사용 안 함 → 기존처럼 프로세스 안에서 로드)
+- 서버가 없거나 실패하면 None 을 돌려주고, 호출하는 쪽(emotion_ml / diary_similarity)이
+  프로세스 안에서 직접 모델을 로드해서 처리
+- 연결/타임아웃/연결 끊김으로 실패하면 MODEL_SERVER_RETRY_AFTER 초 동안은 바로 로컬로 처리 (매 요청마다 연결 시도하지 않음)
+  서버가 {"error": ...} 로 답한 요청 오류는 그 요청만 로컬로 처리 (서버는 계속 사용)
+- 텍스트가 MAX_TEXTS 개를 넘으면 나눠서 요청
+
+메시지 형식: 4바이트 길이(big-endian) + UTF-8 JSON
+"""
+import os
+import json
+import time
+import base64
+import socket
+import struct
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+ENABLED = os.environ.get("MODEL_SERVER_ENABLED", "false").lower() in ("1", "true", "yes")
+SOCKET_PATH = os.environ.get("MODEL_SERVER_SOCKET", "/tmp/moodtown-models.sock")
+TIMEOUT = float(os.environ.get("MODEL_SERVER_TIMEOUT", "30"))
+RETRY_AFTER = float(os.environ.get("MODEL_SERVER_RETRY_AFTER", "30"))
+# 요청 하나에 담을 수 있는 최대 텍스트 수 (서버도 같은 값으로 검사)
+MAX_TEXTS = int(os.environ.get("MODEL_SERVER_MAX_TEXTS", "256"))
+
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+VECTOR_DTYPE = np.dtype("<f4")
+
+_HEADER = struct.Struct("!I")
+_lock = threading.Lock()
+_down_until = 0.0
+_stats = {"requests": 0, "failures": 0, "errors": 0, "last_error": None}
+
+
+# =========================================
+# 메시지 송수신 (서버와 공용)
+# =========================================
+
+def send_message(sock: socket.socket, payload: Dict[str, Any]) -> None:
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """메시지 하나 읽기 (상대가 연결을 닫았으면 None)"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"메시지가 너무 큽니다: {size} bytes")
+    data = _recv_exact(sock, size)
+    if data is None:
+        return None
+    return json.loads(data.decode("utf-8"))
+
+
+def encode_vectors(vectors: np.ndarray) -> Dict[str, Any]:
+    matrix = np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE)
+    return {"shape": list(matrix.shape), "vectors": base64.b64encode(matrix.tobytes()).decode("ascii")}
+
+
+def decode_vectors(payload: Dict[str, Any]) -> np.ndarray:
+    data = base64.b64decode(payload["vectors"])
+    return np.frombuffer(data, dtype=VECTOR_DTYPE).reshape(payload["shape"])
+
+
+# =========================================
+# 클라이언트
+# =========================================
+
+def available() -> bool:
+    """모델 서버를 쓸 수 있는 상태인지 (설정 + 소켓 존재 + 최근 실패 후 대기 시간 경과)"""
+    return ENABLED and time.monotonic() >= _down_until and os.path.exists(SOCKET_PATH)
+
+
+def _mark_down(error: Exception) -> None:
+    global _down_until
+    with _lock:
+        _down_until = time.monotonic() + RETRY_AFTER
+        _stats["failures"] += 1
+        _stats["last_error"] = str(error)
+    print(f"⚠️ [모델 서버] 요청 실패 - {RETRY_AFTER:.0f}초 동안 프로세스 안에서 처리합니다: {error}")
+
+
+def call(op: str, **payload: Any) -> Optional[Dict[str, Any]]:
+    """
+    모델 서버에 요청 (서버를 쓸 수 없거나 실패하면 None)
+    연결/송수신 실패만 서버 장애로 보고 잠시 사용 중단, 서버가 돌려준 오류는 이 요청만 실패
+    """
+    if not available():
+        return None
+    with _lock:
+        _stats["requests"] += 1
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(TIMEOUT)
+            sock.connect(SOCKET_PATH)
+            send_message(sock, {"op": op, **payload})
+            response = recv_message(sock)
+        if response is None:
+            raise ConnectionError("모델 서버가 응답 없이 연결을 닫았습니다.")
+    except (OSError, ValueError) as e:
+        # OSError: 연결 실패 / 타임아웃 / 끊김, ValueError: 잘못된 메시지 (길이 초과, JSON 오류)
+        _mark_down(e)
+        return None
+    if "error" in response:
+        with _lock:
+            _stats["errors"] += 1
+            _stats["last_error"] = response["error"]
+        print(f"⚠️ [모델 서버] {op} 요청 오류 - 이 요청만 프로세스 안에서 처리합니다: {response['error']}")
+        return None
+    return response
+
+
+def _chunks(texts: List[str]) -> List[List[str]]:
+    """MAX_TEXTS 개씩 나눈 목록 (빈 목록이어도 요청 하나)"""
+    return [texts[i:i + MAX_TEXTS] for i in range(0, max(len(texts), 1), MAX_TEXTS)]
+
+
+def classify(texts: List[str]) -> Optional[List[Dict]]:
+    """emotion_ml.predict_batch 와 같은 결과 목록 (실패하면 None)"""
+    results: List[Dict] = []
+    for chunk in _chunks(texts):
+        response = call("classify", texts=chunk)
+        if response is None:
+            return None
+        results.extend(response["results"])
+    return results
+
+
+def embed(texts: List[str]) -> Optional[np.ndarray]:
+    """문장 임베딩 행렬 (len(texts), dim) float32 (실패하면 None)"""
+    matrices = []
+    for chunk in _chunks(texts):
+        response = call("embed", texts=chunk)
+        if response is None:
+            return None
+        matrices.append(decode_vectors(response))
+    return matrices[0] if len(matrices) == 1 else np.concatenate(matrices)
+
+
+def get_client_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+    stats.update({
+        "enabled": ENABLED,
+        "socket": SOCKET_PATH,
+        "available": available(),
+    })
+    return stats
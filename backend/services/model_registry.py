@@ -0,0 +1,162 @@
+"""
+모델 레지스트리 - 프로세스당 한 번만, 잠금 안에서 모델 로드 (single-flight)
+
+- emotion_ml(감정 분류), diary_similarity(문장 임베딩)가 로더를 등록하고 ensure_loaded() 로 로드
+- 스레드 워커에서 첫 요청이 동시에 들어와도 한 스레드만 로드하고 나머지는 기다렸다가 결과를 같이 사용
+- 로드에 실패하면 MODEL_LOAD_RETRY_AFTER 초 동안은 다시 시도하지 않음 (요청마다 Hub 다운로드 재시도 방지)
+- 모델별 로드 시간 / RSS 증가량 / 워밍업 시간 기록 → GET /health/ml
+
+MODEL_WARMUP=true 이면 앱 import 시(트래픽을 받기 전) 모든 모델을 미리 로드하고,
+gunicorn 워커가 준비되면(gunicorn.conf.py post_worker_init) 추론을 한 번씩 돌려서 첫 요청 지연을 없앰
+공유 모델 서버가 처리 중인 모델(register 의 remote() 가 True)은 워밍업에서 건너뜀 - 쓰이지 않는 복사본을 올리지 않음
+GUNICORN_PRELOAD=true 와 같이 쓰면 마스터에서 한 번 로드 → gc.freeze() → fork 로 워커들이 가중치를 copy-on-write 공유
+"""
+import os
+import sys
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+WARMUP_ENABLED = os.environ.get("MODEL_WARMUP", "false").lower() in ("1", "true", "yes")
+RETRY_AFTER = float(os.environ.get("MODEL_LOAD_RETRY_AFTER", "60"))
+
+
+def rss_mb() -> float:
+    """현재 프로세스 RSS (MB). 측정할 수 없으면 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        try:
+            import resource
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+        except Exception:
+            return 0.0
+
+
+class _Entry:
+    def __init__(self, name: str, loader: Callable[[], bool], warmup: Optional[Callable[[], Any]],
+                 remote: Optional[Callable[[], bool]]):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.remote = remote
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.attempts = 0
+        self.failed_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.load_s: Optional[float] = None
+        self.rss_delta_mb: Optional[float] = None
+        self.loaded_pid: Optional[int] = None
+        self.warmup_s: Optional[float] = None
+        self.warmed_pid: Optional[int] = None
+
+
+_entries: Dict[str, _Entry] = {}
+_entries_lock = threading.Lock()
+
+
+def register(name: str, loader: Callable[[], bool], warmup: Optional[Callable[[], Any]] = None,
+             remote: Optional[Callable[[], bool]] = None) -> None:
+    """
+    로더 등록 (모듈 import 시 한 번)
+    loader() 는 성공하면 True, warmup() 은 로드된 모델로 짧은 추론 한 번
+    remote() 가 True 면 지금은 다른 프로세스(모델 서버)가 처리 중 → 워밍업에서 로드하지 않음
+    """
+    with _entries_lock:
+        if name not in _entries:
+            _entries[name] = _Entry(name, loader, warmup, remote)
+
+
+def _served_remotely(entry: _Entry) -> bool:
+    try:
+        return bool(entry.remote and entry.remote())
+    except Exception:
+        return False
+
+
+def ensure_loaded(name: str) -> bool:
+    """등록된 모델을 로드 (이미 로드됐으면 바로 True, 다른 스레드가 로드 중이면 끝날 때까지 대기)"""
+    entry = _entries[name]
+    if entry.loaded:
+        return True
+
+    with entry.lock:
+        if entry.loaded:
+            return True
+        if entry.failed_at is not None and time.monotonic() - entry.failed_at < RETRY_AFTER:
+            return False
+
+        entry.attempts += 1
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        try:
+            ok = bool(entry.loader())
+            entry.error = None if ok else "loader returned False"
+        except Exception as e:
+            ok = False
+            entry.error = str(e)
+            print(f"⚠️ [모델 레지스트리] {name} 로드 중 오류: {e}")
+
+        entry.load_s = time.perf_counter() - started
+        entry.rss_delta_mb = rss_mb() - rss_before
+        entry.loaded_pid = os.getpid()
+        entry.failed_at = None if ok else time.monotonic()
+        entry.loaded = ok
+
+    if ok:
+        print(f"✅ [모델 레지스트리] {name} 로드 완료: {entry.load_s:.2f}s, RSS +{entry.rss_delta_mb:.0f}MB")
+    else:
+        print(f"⚠️ [모델 레지스트리] {name} 로드 실패 ({RETRY_AFTER:.0f}초 후 다시 시도)")
+    return ok
+
+
+def warmup(names: Optional[List[str]] = None, run_inference: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    모델을 미리 로드하고 (run_inference 면) 추론을 한 번 실행
+    gunicorn preload 마스터에서는 run_inference=False 로 로드만 하고, 추론은 fork 된 워커에서 실행
+    (fork 전에 추론 스레드 풀을 만들면 워커에서 멈출 수 있음)
+    """
+    with _entries_lock:
+        targets = [_entries[name] for name in (names or list(_entries))]
+
+    for entry in targets:
+        if _served_remotely(entry):
+            print(f"[모델 레지스트리] {entry.name}: 모델 서버가 처리 중 - 워밍업 건너뜀")
+            continue
+        if not ensure_loaded(entry.name) or not run_inference or entry.warmup is None:
+            continue
+        if entry.warmed_pid == os.getpid():
+            continue
+        started = time.perf_counter()
+        try:
+            entry.warmup()
+            entry.warmup_s = time.perf_counter() - started
+            entry.warmed_pid = os.getpid()
+            print(f"✅ [모델 레지스트리] {entry.name} 워밍업 완료: {entry.warmup_s * 1000:.0f}ms")
+        except Exception as e:
+            print(f"⚠️ [모델 레지스트리] {entry.name} 워밍업 실패: {e}")
+    return get_registry_stats()
+
+
+def get_registry_stats() -> Dict[str, Dict[str, Any]]:
+    """모델별 로드 상태 / 로드 시간 / RSS 증가량 (loaded_pid 가 현재 pid 와 다르면 fork 전에 로드된 것)"""
+    with _entries_lock:
+        entries = list(_entries.values())
+    return {
+        entry.name: {
+            "loaded": entry.loaded,
+            "attempts": entry.attempts,
+            "error": entry.error,
+            "load_s": round(entry.load_s, 3) if entry.load_s is not None else None,
+            "rss_delta_mb": round(entry.rss_delta_mb, 1) if entry.rss_delta_mb is not None else None,
+            "loaded_pid": entry.loaded_pid,
+            "warmup_ms": round(entry.warmup_s * 1000, 1) if entry.warmup_s is not None else None,
+            "warmed": entry.warmed_pid == os.getpid(),
+            "served_remotely": _served_remotely(entry),
+        }
+        for entry in entries
+    }
@@ -0,0 +1,148 @@
+"""
+공유 모델 서버
+
+감정 분류 모델(emotion_ml)과 문장 임베딩 모델(diary_similarity)을 이 프로세스에만 한 번 올리고,
+gunicorn 워커들의 classify / embed 요청을 Unix 소켓으로 받아 처리 (워커 수만큼 모델 메모리가 늘지 않음)
+
+- 여러 워커에서 동시에 들어온 요청은 ml_batcher.MicroBatcher 로 묶어서 한 번에 추론
+- 워커 쪽은 services/model_client.py (MODEL_SERVER_ENABLED=true), 서버가 없으면 워커가 직접 로드
+
+실행 (gunicorn 보다 먼저):
+    python -m services.model_server [--socket /tmp/moodtown-models.sock]
+"""
+import os
+import sys
+import signal
+import socket
+import socketserver
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services import model_client
+
+# 서버 안에서는 자기 자신에게 다시 요청하지 않고 모델을 직접 로드
+model_client.ENABLED = False
+
+from services import emotion_ml, diary_similarity  # noqa: E402
+from services.ml_batcher import MicroBatcher, BATCH_WAIT_MS, BATCH_MAX  # noqa: E402
+
+# 요청 하나에 담을 수 있는 최대 텍스트 수 (클라이언트가 이 크기로 나눠서 보냄)
+MAX_TEXTS = model_client.MAX_TEXTS
+
+
+def _embed_batch(texts: List[str]) -> List[np.ndarray]:
+    vectors = diary_similarity.encode_texts(texts)
+    if vectors is None:
+        raise RuntimeError("임베딩 모델을 사용할 수 없습니다.")
+    return list(vectors)
+
+
+_classifier = MicroBatcher(emotion_ml.predict_batch, BATCH_WAIT_MS, BATCH_MAX, name="server-classify")
+_embedder = MicroBatcher(_embed_batch, BATCH_WAIT_MS, diary_similarity.EMBEDDING_BATCH_SIZE, name="server-embed")
+
+
+def _texts(request: Dict[str, Any]) -> List[str]:
+    texts = request.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise ValueError("texts 는 문자열 목록이어야 합니다.")
+    if len(texts) > MAX_TEXTS:
+        raise ValueError(f"texts 는 최대 {MAX_TEXTS}개까지 보낼 수 있습니다.")
+    return texts
+
+
+def handle_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    op = request.get("op")
+    if op == "ping":
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "emotion_backend": emotion_ml.active_backend(),
+            "embedding_loaded": diary_similarity._model is not None,
+        }
+    if op == "stats":
+        return {"classify": _classifier.stats(), "embed": _embedder.stats()}
+    if op == "classify":
+        return {"results": _classifier.submit_many(_texts(request))}
+    if op == "embed":
+        texts = _texts(request)
+        vectors = _embedder.submit_many(texts)
+        if not vectors:
+            return {"shape": [0, 0], "vectors": ""}
+        return model_client.encode_vectors(np.stack(vectors))
+    raise ValueError(f"알 수 없는 요청입니다: {op}")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # 한 연결에서 여러 요청을 순서대로 처리 (클라이언트는 보통 요청마다 새로 연결)
+        while True:
+            try:
+                request = model_client.recv_message(self.request)
+            except Exception as e:
+                print(f"⚠️ [모델 서버] 요청 읽기 실패: {e}")
+                return
+            if request is None:
+                return
+            try:
+                response = handle_request(request)
+            except Exception as e:
+                response = {"error": str(e)}
+            try:
+                model_client.send_message(self.request, response)
+            except OSError:
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _socket_in_use(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+            return True
+        except OSError:
+            return False
+
+
+def serve(path: Optional[str] = None) -> None:
+    path = path or model_client.SOCKET_PATH
+    if os.path.exists(path):
+        if _socket_in_use(path):
+            raise RuntimeError(f"모델 서버가 이미 실행 중입니다: {path}")
+        os.unlink(path)
+
+    print("🔧 [모델 서버] 모델 로딩 시작")
+    emotion_ml._load_transformers_model_if_available()
+    diary_similarity.load_model()
+    print(f"✅ [모델 서버] 감정 모델: {emotion_ml.active_backend() or '휴리스틱'}, "
+          f"임베딩 모델: {'로드됨' if diary_similarity._model is not None else '없음'}")
+
+    server = _Server(path, _Handler)
+    os.chmod(path, 0o600)
+    # 종료 시그널에도 소켓 파일을 지우고 끝나도록
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"🔌 [모델 서버] {path} 에서 대기 중 (pid={os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="감정 분류 / 문장 임베딩 공유 모델 서버")
+    parser.add_argument("--socket", default=model_client.SOCKET_PATH)
+    args = parser.parse_args(argv)
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])